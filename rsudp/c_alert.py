@@ -2,6 +2,7 @@ import sys
 from datetime import timedelta
 import rsudp.raspberryshake as rs
 from obspy.signal.trigger import recursive_sta_lta, trigger_onset
+from scipy.signal import lfilter
 from rsudp import printM, printW, printE
 from rsudp import COLOR, helpers
 from rsudp.test import TEST
@@ -11,26 +12,207 @@ import numpy as np
 COLOR['current'] = COLOR['green']
 
 
+class RecursiveSTALTA(object):
+	'''
+	.. versionadded:: 1.1.2
+
+	A streaming version of the recursive STA/LTA that :py:class:`rsudp.c_alert.Alert`
+	used to calculate over its whole window for every packet, for any number of
+	channels and STA/LTA lengths at once. New samples are passed to :py:func:`update`,
+	which keeps the STA and LTA between calls, so each packet costs the same
+	no matter how long the LTA is.
+
+	For each new sample, :py:func:`update` returns the ratio that
+	:py:func:`obspy.signal.trigger.recursive_sta_lta` gives for the last sample
+	of the window of ``nlta + 1`` samples that ends with it (``0`` until there
+	have been that many samples). The STA and LTA of that window are the running
+	STA and LTA, minus what they still hold of the samples from before the window,
+	which is the running value from ``nlta`` samples ago times
+	``(1 - 1/n)**nlta``. The ratios are the same as the windowed ones up to rounding.
+	Filter the samples first with a :py:class:`rsudp.helpers.StreamingFilter`.
+
+	``nsta`` and ``nlta`` may be lists of the same length, one entry per trigger
+	configuration. Each configuration's averages are calculated for all channels
+	in one call.
+
+	.. code-block:: python
+
+		>>> trig = RecursiveSTALTA(nsta=[500, 100], nlta=[3000, 1000], channels=4)
+		>>> ratios = trig.update(samples)	# samples.shape == (4, 25)
+		>>> ratios.shape
+		(4, 2, 25)
+
+	:param nsta: STA length in samples, for each configuration
+	:type nsta: int or list
+	:param nlta: LTA length in samples, for each configuration
+	:type nlta: int or list
+	:param int channels: number of channels
+	'''
+	def __init__(self, nsta, nlta, channels=1):
+		nsta, nlta = np.broadcast_arrays(np.atleast_1d(nsta), np.atleast_1d(nlta))
+		self.nsta = nsta.astype(int)
+		self.nlta = nlta.astype(int)
+		self.channels = int(channels)
+		self.csta = 1. / self.nsta
+		self.clta = 1. / self.nlta
+		self.qsta = (1. - self.csta) ** self.nlta	# how much of a value is left after nlta samples
+		self.qlta = (1. - self.clta) ** self.nlta
+		self.size = self.nlta.max()				# the history only has to reach back the longest LTA
+		self.reset()
+
+	def reset(self):
+		'''
+		Forgets all samples, as if starting again.
+		'''
+		shape = (self.channels, len(self.nlta))
+		self.sta = np.zeros(shape)
+		self.lta = np.zeros(shape)
+		self.hist = np.zeros((2,) + shape + (self.size,))	# running STA and LTA of the last samples
+		self.pos = 0							# where the next sample's values go in hist
+		self.count = 0							# samples since the last reset
+
+	def _average(self, sq, c, last):
+		'''
+		Runs the recursive average of each configuration over the squared samples.
+
+		:rtype: numpy.ndarray
+		:return: the running averages, with shape ``(channels, configurations, samples)``
+		'''
+		return np.stack([lfilter([c[k]], [1., c[k] - 1.], sq, axis=-1,
+								 zi=(1. - c[k]) * last[:, k:k+1])[0]
+						 for k in range(len(c))], axis=1)
+
+	def update(self, samples):
+		'''
+		Processes new samples.
+
+		:param numpy.ndarray samples: the samples that have arrived since the last call, with shape ``(channels, samples)`` (or ``(samples,)`` for one channel)
+		:rtype: numpy.ndarray
+		:return: the STA/LTA ratio at each new sample, with shape ``(channels, configurations, samples)``
+		'''
+		x = np.atleast_2d(np.asarray(samples, dtype=np.float64))
+		n = x.shape[-1]
+		step = self.nlta.min()		# no sample may need the history of another in the same call
+		if n > step:
+			return np.concatenate([self.update(x[:, i:i+step])
+								   for i in range(0, n, step)], axis=-1)
+		sq = x * x
+		sta = self._average(sq, self.csta, self.sta)
+		lta = self._average(sq, self.clta, self.lta)
+		if n:
+			self.sta, self.lta = sta[..., -1], lta[..., -1]
+
+		t = self.pos + np.arange(n)
+		back = (t[np.newaxis, :] - self.nlta[:, np.newaxis]) % self.size	# nlta samples before each new one
+		k = np.arange(len(self.nlta))[:, np.newaxis]
+		old_sta, old_lta = self.hist[0][:, k, back], self.hist[1][:, k, back]
+		self.hist[0][..., t % self.size], self.hist[1][..., t % self.size] = sta, lta
+		self.pos = (self.pos + n) % self.size
+
+		qsta, qlta = self.qsta[:, np.newaxis], self.qlta[:, np.newaxis]
+		ratio = (sta - qsta * old_sta) / (lta - qlta * old_lta + 1e-99 * qlta)
+		full = self.count + np.arange(n)[np.newaxis, :] >= self.nlta[:, np.newaxis]
+		ratio[:, ~full] = 0.	# the window is not full yet
+		self.count += n
+		return ratio
+
+
+class Coincidence(object):
+	'''
+	.. versionadded:: 1.1.2
+
+	Combines the STA/LTA ratios of several channels and trigger configurations
+	(see :py:class:`rsudp.c_alert.RecursiveSTALTA`) into one trigger.
+	Each channel and configuration pair votes from the sample its ratio goes above
+	its ``thresh`` until the sample it goes below its ``reset``. The trigger is on
+	while at least ``votes`` pairs are voting, so that, for example, an event has
+	to show on two of four channels before an alarm is raised.
+
+	.. code-block:: python
+
+		>>> vote = Coincidence(thresh=[3.5, 5], reset=[1.5, 2], votes=2, channels=4)
+		>>> on = vote.update(ratios)	# ratios.shape == (4, 2, 25)
+		>>> on.shape
+		(25,)
+
+	:param thresh: trigger threshold, for each configuration
+	:type thresh: float or list
+	:param reset: reset threshold, for each configuration
+	:type reset: float or list
+	:param int votes: number of channel and configuration pairs that must be triggered at once
+	:param int channels: number of channels
+	'''
+	def __init__(self, thresh, reset, votes=1, channels=1):
+		thresh, reset = np.broadcast_arrays(np.atleast_1d(thresh), np.atleast_1d(reset))
+		self.thresh = thresh.astype(float)[:, np.newaxis]
+		self.reset_at = reset.astype(float)[:, np.newaxis]
+		self.votes = int(votes)
+		self.channels = int(channels)
+		self.reset()
+
+	def reset(self):
+		'''
+		Sets every pair to not voting.
+		'''
+		self.state = np.zeros((self.channels, len(self.thresh)), dtype=bool)
+
+	def update(self, ratio):
+		'''
+		Updates the votes with new ratios.
+
+		:param numpy.ndarray ratio: the STA/LTA ratios, with shape ``(channels, configurations, samples)``
+		:rtype: numpy.ndarray
+		:return: whether the trigger is on at each sample
+		'''
+		n = ratio.shape[-1]
+		# +1 where a pair starts voting, -1 where it stops, 0 where it carries on as before
+		change = np.where(ratio > self.thresh, 1, np.where(ratio < self.reset_at, -1, 0))
+		change = np.concatenate([np.where(self.state, 1, -1)[..., np.newaxis], change], axis=-1)
+		# carry the last change forward to each sample
+		last = np.maximum.accumulate(np.where(change != 0, np.arange(n + 1), 0), axis=-1)
+		voting = np.take_along_axis(change, last, axis=-1)[..., 1:] > 0
+		if n:
+			self.state = voting[..., -1]
+		return voting.sum(axis=(0, 1)) >= self.votes
+
+
 class Alert(rs.ConsumerThread):
 	"""
-	A data consumer class that listens to a specific incoming data channel
+	A data consumer class that listens to one or more incoming data channels
 	and calculates a recursive STA/LTA (short term average over long term 
 	average). If a threshold of STA/LTA ratio is exceeded, the class
-	sets the :py:data:`alarm` flag to the alarm time as a
+	raises an alarm (:py:func:`rsudp.raspberryshake.ConsumerThread.raise_alarm`)
+	with the alarm time as a
 	:py:class:`obspy.core.utcdatetime.UTCDateTime` object.
-	The :py:class:`rsudp.p_producer.Producer` will see this flag
-	and send an :code:`ALARM` message to the queues with the time set here.
-	Likewise, when the :py:data:`alarm_reset` flag is set with a
-	:py:class:`obspy.core.utcdatetime.UTCDateTime`,
+	The :py:class:`rsudp.p_producer.Producer` will then
+	send an :code:`ALARM` message to the queues with the time set here.
+	Likewise, when the trigger resets
+	(:py:func:`rsudp.raspberryshake.ConsumerThread.raise_reset`),
 	the Producer will send a :code:`RESET` message to the queues.
 
-	:param float sta: short term average (STA) duration in seconds.
-	:param float lta: long term average (LTA) duration in seconds.
-	:param float thresh: threshold for STA/LTA trigger.
+	.. versionchanged:: 1.1.2
+
+		``cha`` may be a list of channels, and ``sta``, ``lta``, ``thresh``, and ``reset``
+		may be lists with one entry for each trigger configuration. Every channel is
+		checked with every configuration (see :py:class:`rsudp.c_alert.RecursiveSTALTA`),
+		and an alarm is raised when ``votes`` of these channel and configuration pairs
+		are triggered at once (see :py:class:`rsudp.c_alert.Coincidence`).
+		When deconvolving, only the first channel and configuration are used.
+
+	:param sta: short term average (STA) duration in seconds.
+	:type sta: float or list
+	:param lta: long term average (LTA) duration in seconds.
+	:type lta: float or list
+	:param thresh: threshold for STA/LTA trigger.
+	:type thresh: float or list
+	:param reset: threshold for the STA/LTA trigger to reset.
+	:type reset: float or list
 	:type bp: :py:class:`bool` or :py:class:`list`
 	:param bp: bandpass filter parameters. if set, should be in the format ``[highpass, lowpass]``
 	:param bool debug: whether or not to display max STA/LTA calculation live to the console.
-	:param str cha: listening channel (defaults to [S,E]HZ)
+	:param cha: listening channel or channels (defaults to [S,E]HZ)
+	:type cha: str or list
+	:param int votes: number of channel and configuration pairs that must be triggered to raise an alarm
 	:param queue.Queue q: queue of data and messages sent by :class:`rsudp.c_consumer.Consumer`
 
 	"""
@@ -60,6 +242,8 @@ class Alert(rs.ConsumerThread):
 				self.freq = bp[1]
 			else:
 				self.filt = 'bandpass'
+		self.filter = helpers.StreamingFilter(self.filt, freqmin=self.freqmin,
+							freqmax=self.freqmax) if self.filt else None
 
 
 	def _set_deconv(self, deconv):
@@ -87,13 +271,18 @@ class Alert(rs.ConsumerThread):
 		printM('Alert stream units are %s' % (self.units.strip(' ').lower()), self.sender)
 
 
-	def _find_chn(self):
+	def _find_chn(self, cha):
 		'''
 		Finds channel match in list of channels.
+
+		:param str cha: the channel name or part of it
+		:rtype: str
+		:return: the matching channel
 		'''
 		for chn in rs.chns:
-			if self.cha in chn:
-				self.cha = chn
+			if cha in chn:
+				match = chn
+		return match
 
 
 	def _set_channel(self, cha):
@@ -105,17 +294,22 @@ class Alert(rs.ConsumerThread):
 		- ``"HDF"`` - pressure transducer channel
 		- ``"all"`` - resolves to either ``"EHZ"`` or ``"SHZ"`` if available
 
-		:param cha: the channel to listen to
-		:type cha: str
+		A list of these listens to each of them. The first one is kept in
+		:py:data:`self.cha`, and all of them in :py:data:`self.channels`.
+
+		:param cha: the channel or channels to listen to
+		:type cha: str or list
 		'''
 		cha = self.default_ch if (cha == 'all') else cha
-		self.cha = cha if isinstance(cha, str) else cha[0]
-
-		if self.cha in str(rs.chns):
-			self._find_chn()
-		else:
-			printE('Could not find channel %s in list of channels! Please correct and restart.' % self.cha, self.sender)
-			sys.exit(2)
+		self.channels = []
+		for c in ([cha] if isinstance(cha, str) else cha):
+			if c not in str(rs.chns):
+				printE('Could not find channel %s in list of channels! Please correct and restart.' % c, self.sender)
+				sys.exit(2)
+			c = self._find_chn(c)
+			if c not in self.channels:
+				self.channels.append(c)
+		self.cha = self.channels[0]
 
 
 	def _print_filt(self):
@@ -133,7 +327,7 @@ class Alert(rs.ConsumerThread):
 
 	def __init__(self, q, sta=5, lta=30, thresh=1.6, reset=1.55, bp=False,
 				 debug=True, cha='HZ', sound=False, deconv=False, testing=False,
-				 *args, **kwargs):
+				 votes=1, *args, **kwargs):
 		"""
 		Initializing the alert thread with parameters to set up the recursive
 		STA-LTA trigger, filtering, and the channel used for listening.
@@ -153,18 +347,38 @@ class Alert(rs.ConsumerThread):
 		self.debug = debug
 		self.args = args
 		self.kwargs = kwargs
+		try:	# one entry per trigger configuration
+			self.stas, self.ltas, self.threshs, self.resets = np.broadcast_arrays(
+				*[np.atleast_1d(v).astype(float) for v in (sta, lta, thresh, reset)])
+		except ValueError:
+			printE('Lists of sta, lta, threshold, and reset values must be the same length. Please correct and restart.',
+				   self.sender)
+			sys.exit(2)
+		self.ring = rs.RingStream(seconds=self.ltas.max(), fill_value='latest')
 		self.raw = rs.Stream()
 		self.stream = rs.Stream()
+		self.data = np.ndarray(1)
+		self.starttime = rs.UTCDateTime(0)
 
 		self._set_channel(cha)
 
 		self.sps = rs.sps
+		self.tf = rs.tf
 		self.inv = rs.inv
 		self.stalta = np.ndarray(1)
 		self.maxstalta = 0
 		self.units = 'counts'
 		
 		self._set_deconv(deconv)
+		if self.deconv and (len(self.channels) > 1 or len(self.stas) > 1):
+			printW('Deconvolved alerts only use the first channel and trigger configuration (%s, sta=%ss, lta=%ss).'
+				   % (self.cha, self.stas[0], self.ltas[0]), self.sender)
+			self.channels = [self.cha]
+		self.votes = votes
+		if not 0 < votes <= len(self.channels) * len(self.stas):
+			printE('Cannot require %s votes from %s channels and %s trigger configurations. Please correct and restart.'
+				   % (votes, len(self.channels), len(self.stas)), self.sender)
+			sys.exit(2)
 
 		self.exceed = False
 		self.sound = sound
@@ -172,6 +386,18 @@ class Alert(rs.ConsumerThread):
 		self._set_filt(bp)
 		self._print_filt()
 
+		# without deconvolution, the ratio is updated as samples arrive rather than per window
+		self.engine, self.vote = None, None
+		if not self.deconv:
+			self.engine = RecursiveSTALTA((self.stas * self.sps).astype(int),
+								(self.ltas * self.sps).astype(int), channels=len(self.channels))
+			self.vote = Coincidence(self.threshs, self.resets, votes=votes,
+									channels=len(self.channels))
+		self.on = np.zeros(0, dtype=bool)		# whether the trigger was on at each new sample
+		self._marks = [None] * len(self.channels)	# where in the ring buffer the engine has read up to
+		self._pending = [np.zeros(0)] * len(self.channels)	# filtered samples waiting for the other channels
+		self._skip = [0] * len(self.channels)		# samples to skip on each channel to line it up with the others
+
 
 	def _getq(self):
 		'''
@@ -182,10 +408,21 @@ class Alert(rs.ConsumerThread):
 		'''
 		d = self.queue.get(True, timeout=None)
 		self.queue.task_done()
-		if self.cha in str(d):
-			self.raw = rs.update_stream(stream=self.raw, d=d, fill_value='latest')
+		return self._update(d)
+
+
+	def _update(self, d):
+		'''
+		Updates the stream with a queue item.
+
+		:param d: the data packet or message
+		:rtype: bool
+		:return: Returns ``True`` if stream is updated, otherwise ``False``.
+		'''
+		if rs.getCHN(d) in self.channels:
+			self.ring.append(d)
 			return True
-		elif 'TERM' in str(d):
+		elif helpers.msg_type(d) == 'TERM':
 			self.alive = False
 			printM('Exiting.', self.sender)
 			sys.exit()
@@ -201,80 +438,166 @@ class Alert(rs.ConsumerThread):
 			helpers.deconvolve(self)
 
 
+	def _window(self):
+		'''
+		Gets the last :py:data:`lta` seconds of data from the ring buffer.
+		If deconvolving, this goes through an ObsPy stream; otherwise
+		:py:data:`self.data` is a view of the buffer.
+		'''
+		if self.deconv:
+			self.raw = self.ring.to_stream(seconds=self.ltas[0], channels=[self.cha])
+			self._deconvolve()
+			self.data = self.stream[0].data
+			self.starttime = self.stream[0].stats.starttime
+		else:
+			self.data = self.ring.last(self.cha, self.ltas[0])
+			self.starttime = self.ring.starttime(self.cha, self.ltas[0])
+
+
 	def _subloop(self):
 		'''
-		Gets the queue and figures out whether or not the specified channel is in the packet.
+		Reads everything that has arrived on the queue, waiting for more
+		until a packet from one of the specified channels has been read.
 		'''
 		while True:
-			if self.queue.qsize() > 0:
-				self._getq()			# get recent packets
-			else:
-				if self._getq():		# is this the specified channel? if so break
-					break
+			updated = False
+			for d in self.get_batch():
+				updated = self._update(d) or updated
+			if updated:		# was a specified channel in the batch? if so break
+				break
 
 
 	def _filter(self):
 		'''
 		Filters the stream associated with this class.
 		'''
-		if self.filt:
-			if self.filt in 'bandpass':
-				self.stalta = recursive_sta_lta(
-							self.stream[0].copy().filter(type=self.filt,
-							freqmin=self.freqmin, freqmax=self.freqmax),
-							int(self.sta * self.sps), int(self.lta * self.sps))
-			else:
-				self.stalta = recursive_sta_lta(
-							self.stream[0].copy().filter(type=self.filt,
-							freq=self.freq),
-							int(self.sta * self.sps), int(self.lta * self.sps))
+		if self.filter:
+			data = self.filter.apply(self.data, self.sps)	# the design is reused from packet to packet
 		else:
-			self.stalta = recursive_sta_lta(self.stream[0],
-					int(self.sta * self.sps), int(self.lta * self.sps))
+			data = self.data.astype(np.float64)		# same as obspy.core.trace.Trace.filter()
+		self.stalta = recursive_sta_lta(data,
+				int(self.stas[0] * self.sps), int(self.ltas[0] * self.sps))
+
+
+	def _stream(self):
+		'''
+		.. versionadded:: 1.1.2
+
+		Filters the samples that have arrived on each channel since the last call,
+		passes those that all channels have to the :py:class:`rsudp.c_alert.RecursiveSTALTA`
+		engine and the :py:class:`rsudp.c_alert.Coincidence` vote, and sets
+		:py:data:`self.stalta` to the highest ratio at each of them and
+		:py:data:`self.on` to whether the trigger is on.
+		If the samples on any channel do not follow on from the last ones
+		(after a long gap, for example), everything starts again with the
+		samples in the buffer from the latest time that all channels have data for.
+		Channels are lined up by the times of their samples
+		(see :py:func:`rsudp.raspberryshake.RingStream.align`), so that the
+		engine is always given samples taken at the same time.
+		If a channel stops sending while the others carry on, the others' samples
+		are only kept for as long as the buffer, after which they are thrown away
+		and the engine starts again, with a warning.
+		'''
+		self.on = self.on[:0]
+		if any(c not in self.ring.rings for c in self.channels):
+			return		# wait for data from every channel
+		new = [self.ring.since(c, m) for c, m in zip(self.channels, self._marks)]
+		if not all(contiguous for x, m, contiguous in new):
+			self.engine.reset()
+			self.vote.reset()
+			if self.filter:
+				self.filter.reset()
+			new = [self.ring.since(c) for c in self.channels]
+			self._skip = self.ring.align(self.channels, [len(x) for x, m, contiguous in new])
+			self._pending = [np.zeros(0)] * len(self.channels)
+		self._marks = [m for x, m, contiguous in new]
+		for i, (c, (x, m, contiguous)) in enumerate(zip(self.channels, new)):
+			k = min(self._skip[i], len(x))
+			self._skip[i] -= k
+			x = x[k:]
+			if len(x):
+				y = self.filter.filter(c, x, self.sps) if self.filter else x
+				self._pending[i] = np.concatenate([self._pending[i], y])
+
+		if max(len(p) for p in self._pending) > self.ring.rings[self.cha].cap:
+			# a channel has stopped sending while the others carry on
+			least = min(len(p) for p in self._pending)
+			stalled = [c for c, p in zip(self.channels, self._pending) if len(p) == least]
+			printW('No data from %s for %s seconds, starting the STA/LTA again'
+				   % (', '.join(stalled), round(self.ring.seconds, 1)), self.sender)
+			self.engine.reset()
+			self.vote.reset()
+			if self.filter:
+				self.filter.reset()
+			self._pending = [np.zeros(0)] * len(self.channels)
+			self._skip = self.ring.align(self.channels)	# start again from the latest channel's next sample
+
+		n = min(len(p) for p in self._pending)
+		if n:
+			x = np.stack([p[:n] for p in self._pending])
+			self._pending = [p[n:] for p in self._pending]
+			ratio = self.engine.update(x)
+			self.on = self.vote.update(ratio)
+			self.stalta = ratio.max(axis=(0, 1))
+			self.data = x[0]
+			self.starttime = self.ring.endtime(self.cha) - (len(self._pending[0]) + n - 1) / self.sps
+
+
+	def _onset(self):
+		'''
+		.. versionadded:: 1.1.2
+
+		Finds where the trigger went on and whether it is now off.
+
+		:rtype: tuple
+		:return: ``(onset, off)``, the index in :py:data:`self.stalta` of the sample the trigger went on at (or ``None``) and whether it is off at the last sample
+		'''
+		if self.engine:
+			if not len(self.on):
+				return None, False
+			return (np.argmax(self.on) if self.on.any() else None), not self.on[-1]
+		thresh, reset = self.threshs[0], self.resets[0]
+		if self.stalta.max() > thresh:
+			return trigger_onset(self.stalta, thresh, reset)[-1][0], False
+		return None, self.stalta[-1] < reset
 
 
 	def _is_trigger(self):
 		'''
 		Figures out it there's a trigger active.
 		'''
-		if self.stalta.max() > self.thresh:
-			if not self.exceed:
-				# raise a flag that the Producer can read and modify 
-				self.alarm = helpers.fsec(self.stream[0].stats.starttime + timedelta(seconds=
-										trigger_onset(self.stalta, self.thresh,
-										self.reset)[-1][0] * self.stream[0].stats.delta))
-				self.exceed = True	# the state machine; this one should not be touched from the outside, otherwise bad things will happen
-				print()
-				printM('Trigger threshold of %s exceeded at %s'
-						% (self.thresh, self.alarm.strftime('%Y-%m-%d %H:%M:%S.%f')[:22]), self.sender)
-				printM('Trigger will reset when STA/LTA goes below %s...' % self.reset, sender=self.sender)
-				COLOR['current'] = COLOR['purple']
-				if self.testing:
-					TEST['c_alerton'][1] = True
-			else:
-				pass
-
+		onset, off = self._onset()
+		if (onset is not None) and not self.exceed:
+			# tell the Producer to send an ALARM message
+			alarm = helpers.fsec(self.starttime + timedelta(seconds=onset / self.sps))
+			self.raise_alarm(alarm)
+			self.exceed = True	# the state machine; this one should not be touched from the outside, otherwise bad things will happen
+			print()
+			printM('Trigger threshold of %s exceeded at %s'
+					% (self.thresh, alarm.strftime('%Y-%m-%d %H:%M:%S.%f')[:22]), self.sender)
+			printM('Trigger will reset when STA/LTA goes below %s...' % self.reset, sender=self.sender)
+			COLOR['current'] = COLOR['purple']
+			if self.testing:
+				TEST['c_alerton'][1] = True
+
+		if self.exceed:
 			if self.stalta.max() > self.maxstalta:
 				self.maxstalta = self.stalta.max()
-		else:
-			if self.exceed:
-				if self.stalta[-1] < self.reset:
-					self.alarm_reset = helpers.fsec(self.stream[0].stats.endtime)	# lazy; effective
-					self.exceed = False
-					print()
-					printM('Max STA/LTA ratio reached in alarm state: %s' % (round(self.maxstalta, 3)),
-							self.sender)
-					printM('Earthquake trigger reset and active again at %s' % (
-							self.alarm_reset.strftime('%Y-%m-%d %H:%M:%S.%f')[:22]),
-							self.sender)
-					self.maxstalta = 0
-					COLOR['current'] = COLOR['green']
+			if off:
+				alarm_reset = helpers.fsec(self.ring.endtime(self.cha))	# lazy; effective
+				self.raise_reset(alarm_reset)
+				self.exceed = False
+				print()
+				printM('Max STA/LTA ratio reached in alarm state: %s' % (round(self.maxstalta, 3)),
+						self.sender)
+				printM('Earthquake trigger reset and active again at %s' % (
+						alarm_reset.strftime('%Y-%m-%d %H:%M:%S.%f')[:22]),
+						self.sender)
+				self.maxstalta = 0
+				COLOR['current'] = COLOR['green']
 				if self.testing:
 					TEST['c_alertoff'][1] = True
 
-			else:
-				pass
-
 
 	def _print_stalta(self):
 		'''
@@ -282,8 +605,8 @@ class Alert(rs.ConsumerThread):
 		'''
 		if self.debug:
 			msg = '\r%s [%s] Threshold: %s; Current max STA/LTA: %.4f' % (
-					(self.stream[0].stats.starttime + timedelta(seconds=
-					 len(self.stream[0].data) * self.stream[0].stats.delta)).strftime('%Y-%m-%d %H:%M:%S'),
+					(self.starttime + timedelta(seconds=
+					 len(self.data) / self.sps)).strftime('%Y-%m-%d %H:%M:%S'),
 					self.sender,
 					self.thresh,
 					round(np.max(self.stalta[-50:]), 4)
@@ -293,14 +616,22 @@ class Alert(rs.ConsumerThread):
 
 	def run(self):
 		"""
-		Reads data from the queue into a :class:`obspy.core.stream.Stream` object,
-		then runs a :func:`obspy.signal.trigger.recursive_sta_lta` function to
-		determine whether to raise an alert flag (:py:data:`rsudp.c_alert.Alert.alarm`).
-		The producer reads this flag and uses it to notify other consumers.
+		Reads data from the queue into a :class:`rsudp.raspberryshake.RingStream` object,
+		then updates the STA/LTA ratio to determine whether to raise an alarm
+		(:py:func:`rsudp.raspberryshake.ConsumerThread.raise_alarm`).
+		The producer uses the alarm to notify other consumers.
+
+		.. versionchanged:: 1.1.2
+
+			Unless deconvolving, new samples are passed to a
+			:py:class:`rsudp.c_alert.RecursiveSTALTA` as they arrive, instead of running
+			:func:`obspy.signal.trigger.recursive_sta_lta` over the last
+			:py:data:`lta` seconds for every packet, and the trigger is decided by a
+			:py:class:`rsudp.c_alert.Coincidence` vote across channels and configurations.
 		"""
 		n = 0
 
-		wait_pkts = (self.lta) / (rs.tf / 1000)
+		wait_pkts = self.ltas.max() / (self.tf / 1000)
 
 		while n > 3:
 			self.getq()
@@ -309,33 +640,31 @@ class Alert(rs.ConsumerThread):
 		n = 0
 		while True:
 			self._subloop()
-
-			self.raw = rs.copy(self.raw)	# necessary to avoid memory leak
-			self.stream = self.raw.copy()
-			self._deconvolve()
+			if self.engine:
+				# keep the engine up to date, warming up or not
+				self._stream()
 
 			if n > wait_pkts:
-				# if the trigger is activated
-				obstart = self.stream[0].stats.endtime - timedelta(seconds=self.lta)	# obspy time
-				self.raw = self.raw.slice(starttime=obstart)		# slice the stream to the specified length (seconds variable)
-				self.stream = self.stream.slice(starttime=obstart)	# slice the stream to the specified length (seconds variable)
+				if not self.engine:
+					# get the last lta seconds of data and deconvolve it
+					self._window()
 
-				# filter
-				self._filter()
+					# filter
+					self._filter()
 				# figure out if the trigger has gone off
 				self._is_trigger()
 
-				# copy the stream (necessary to avoid memory leak)
-				self.stream = rs.copy(self.stream)
-
 				# print the current STA/LTA calculation
 				self._print_stalta()
 
 			elif n == 0:
 				printM('Starting Alert trigger with sta=%ss, lta=%ss, and threshold=%s on channel=%s'
-					   % (self.sta, self.lta, self.thresh, self.cha), self.sender)
+					   % (self.sta, self.lta, self.thresh, ', '.join(self.channels)), self.sender)
+				if self.engine and (self.vote.state.size > 1):
+					printM('Alarm will be raised when %s of %s channel and trigger pairs exceed their thresholds'
+						   % (self.votes, self.vote.state.size), self.sender)
 				printM('Earthquake trigger warmup time of %s seconds...'
-					   % (self.lta), self.sender)
+					   % (self.ltas.max()), self.sender)
 			elif n == wait_pkts:
 				printM('Earthquake trigger up and running normally.',
 					   self.sender)
@@ -1,6 +1,6 @@
 import sys, os
 from rsudp.raspberryshake import ConsumerThread
-from rsudp import printM, printW, printE
+from rsudp import printM, printW, printE, helpers
 from rsudp.test import TEST
 import subprocess
 try:
@@ -124,6 +124,19 @@ class AlertSound(ConsumerThread):
 		if self.testing:
 			TEST['c_play'][1] = True
 
+	def handle(self, d):
+		"""
+		.. versionadded:: 1.1.2
+
+		Plays self.sound if ``d`` is an ``ALARM`` message
+		(see :py:data:`rsudp.raspberryshake.ConsumerThread.handle`).
+
+		:param bytes d: the queue message
+		"""
+		if helpers.msg_type(d) == 'ALARM':
+			if self.sound and pydub_exists:
+				self._play()
+
 	def run(self):
 		"""
 		Reads data from the queue and plays self.sound if it sees an ``ALARM`` message.
@@ -132,11 +145,9 @@ class AlertSound(ConsumerThread):
 		while True:
 			d = self.queue.get()
 			self.queue.task_done()
-			if 'TERM' in str(d):
+			if helpers.msg_type(d) == 'TERM':
 				self.alive = False
 				self.devnull.close()
 				printM('Exiting.', self.sender)
 				sys.exit()
-			elif 'ALARM' in str(d):
-				if self.sound and pydub_exists:
-					self._play()
+			self.handle(d)
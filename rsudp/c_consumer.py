@@ -1,9 +1,443 @@
 import sys
-from threading import Thread
-from rsudp import printM, printW, printE
+from time import monotonic
+from collections import deque
+from threading import Thread, Condition
+from queue import Queue, Empty, Full
+from rsudp import printM, printW, printE, helpers
+import rsudp.raspberryshake as rs
 from rsudp.test import TEST
 
 
+class Subscriber(object):
+	'''
+	.. versionadded:: 1.1.2
+
+	A sub-consumer queue's subscription, which tells the
+	:py:class:`rsudp.c_consumer.Consumer` which data packets and messages to
+	deliver, so that a sub-consumer is not woken up for items it would throw away.
+	Both :py:class:`rsudp.c_consumer.PolicyQueue` and
+	:py:class:`rsudp.c_consumer.BroadcastReader` are subscribers.
+	New subscribers receive everything.
+
+	.. code-block:: python
+
+		>>> q = PolicyQueue(name='alertsound')
+		>>> q.subscribe(channels=[], messages=['ALARM'])
+		>>> q.accepts('DATA', 'EHZ'), q.accepts('ALARM'), q.accepts('TERM')
+		(False, True, True)
+	'''
+	channels = None
+	messages = None
+
+	def subscribe(self, channels=None, messages=None):
+		'''
+		Sets the subscription.
+		``TERM`` messages are always delivered, so that every sub-consumer can exit.
+
+		:param list channels: channels to receive data packets for (``None`` for all, ``[]`` for none)
+		:param list messages: message types to receive, such as ``'ALARM'`` or ``'IMGPATH'`` (``None`` for all)
+		'''
+		self.channels = None if channels is None else frozenset(channels)
+		self.messages = None if messages is None else frozenset(messages) | {'TERM'}
+
+	@property
+	def subscribed(self):
+		'''
+		``True`` if this subscriber does not receive everything.
+		'''
+		return (self.channels is not None) or (self.messages is not None)
+
+	def accepts(self, kind, chn=None):
+		'''
+		Whether the subscription includes an item.
+
+		:param str kind: the item's type, from :py:func:`rsudp.helpers.msg_type`
+		:param str chn: the channel of a data packet, from :py:func:`rsudp.raspberryshake.getCHN`
+		:rtype: bool
+		'''
+		if kind == 'DATA':
+			return (self.channels is None) or (chn in self.channels)
+		return (self.messages is None) or (kind in self.messages)
+
+
+class BroadcastRing(object):
+	'''
+	.. versionadded:: 1.1.2
+
+	A single-writer, multi-reader broadcast buffer that can stand in for
+	the list of sub-consumer queues. Instead of putting every message on one
+	:py:class:`queue.Queue` per sub-consumer, the :py:class:`rsudp.c_consumer.Consumer`
+	puts it in the ring once, and each sub-consumer reads it through its own
+	:py:class:`rsudp.c_consumer.BroadcastReader`. Messages are shared, not copied.
+	The cost of distributing a message is one slot assignment and,
+	only if a reader is waiting for data, one notify, no matter how many
+	sub-consumers there are.
+
+	Readers have the same ``get``/``qsize``/``task_done`` methods as a queue,
+	so sub-consumers do not need to know which one they were given:
+
+	.. code-block:: python
+
+		>>> ring = BroadcastRing(size=2048)
+		>>> q = ring.reader()
+		>>> cons = Consumer(queue, [ring])
+		>>> alrt = Alert(q=q, cha='EHZ')
+
+	Each reader keeps its own read position. Its ``policy`` decides what happens
+	when it falls ``size`` messages behind:
+
+	- ``'block'`` (like a full :py:class:`queue.Queue`) makes the writer wait for the reader
+	- ``'drop'`` lets the writer overwrite old messages; the reader skips ahead to the
+	  oldest message still in the ring and counts the ones it missed in
+	  :py:data:`rsudp.c_consumer.BroadcastReader.dropped`
+
+	:param int size: number of messages the ring holds
+	'''
+	def __init__(self, size=rs.qsize):
+		self.size = int(size)
+		self.slots = [None] * (self.size + 1)	# one spare slot so a reader can check that its slot was not overwritten
+		self.seq = 0				# number of messages written so far
+		self.cond = Condition()		# readers wait on this for data, the writer for space
+		self.readers = []
+		self.sleepers = 0			# readers waiting for data
+		self.writer_waiting = False
+		self.floor = 0				# lowest read position of the blocking readers at last check
+
+	def reader(self, policy='block', name=''):
+		'''
+		Makes a new reader, which starts at the next message written.
+
+		:param str policy: ``'block'`` or ``'drop'`` (see above)
+		:param str name: name to use when reporting dropped messages
+		:rtype: rsudp.c_consumer.BroadcastReader
+		:return: the reader to pass to a sub-consumer in place of a queue
+		'''
+		r = BroadcastReader(self, policy, name)
+		with self.cond:
+			self.readers.append(r)
+		return r
+
+	def remove(self, reader):
+		'''
+		Removes a reader that will not be read, so that the writer does not wait for it.
+
+		:param rsudp.c_consumer.BroadcastReader reader: the reader to remove
+		'''
+		with self.cond:
+			self.readers.remove(reader)
+			self.cond.notify_all()
+
+	def _wait_for_space(self):
+		'''
+		Waits until every blocking reader is less than :py:data:`size` messages behind.
+		'''
+		with self.cond:
+			self.writer_waiting = True
+			while True:
+				self.floor = min([r.cursor for r in self.readers if r.policy == 'block'] + [self.seq])
+				if self.seq - self.floor < self.size:
+					break
+				self.cond.wait(0.5)
+			self.writer_waiting = False
+
+	def put(self, item):
+		'''
+		Writes a message to the ring. Only one thread may call this.
+
+		:param item: the message to broadcast
+		'''
+		if self.seq - self.floor >= self.size:
+			self._wait_for_space()		# only recounts readers once the last known floor is a full ring behind
+		self.slots[self.seq % (self.size + 1)] = item
+		self.seq += 1
+		if self.sleepers:
+			with self.cond:
+				self.cond.notify_all()
+
+
+class BroadcastReader(Subscriber):
+	'''
+	.. versionadded:: 1.1.2
+
+	One sub-consumer's view of a :py:class:`rsudp.c_consumer.BroadcastRing`,
+	with the parts of the :py:class:`queue.Queue` interface that sub-consumers use.
+	Made by :py:func:`rsudp.c_consumer.BroadcastRing.reader`.
+
+	Since all readers share the ring, a reader's subscription
+	(see :py:class:`rsudp.c_consumer.Subscriber`) is applied when it reads,
+	by skipping the items it did not subscribe to.
+
+	:param rsudp.c_consumer.BroadcastRing ring: the ring to read
+	:param str policy: ``'block'`` or ``'drop'``
+	:param str name: name to use when reporting dropped messages
+	'''
+	def __init__(self, ring, policy='block', name=''):
+		if policy not in ('block', 'drop'):
+			raise ValueError('Unknown broadcast reader policy: %s' % policy)
+		self.ring = ring
+		self.policy = policy
+		self.name = name
+		self.cursor = ring.seq		# the next message to read
+		self.dropped = 0			# messages overwritten before this reader got to them
+
+	@property
+	def lag(self):
+		'''
+		The number of messages written that this reader has not read yet.
+		'''
+		return self.ring.seq - self.cursor
+
+	def qsize(self):
+		return min(self.lag, self.ring.size)
+
+	def empty(self):
+		return self.lag <= 0
+
+	def get(self, block=True, timeout=None):
+		'''
+		Reads the next message.
+
+		:param bool block: whether to wait for a message if there is none
+		:param float timeout: seconds to wait (``None`` waits forever)
+		:raise queue.Empty: if there is no message to read
+		'''
+		r = self.ring
+		end = None if timeout is None else monotonic() + timeout	# skipped items do not restart the wait
+		while True:
+			behind = r.seq - self.cursor
+			if behind > 0:
+				if behind > r.size:
+					# the writer has lapped this reader (only possible with the 'drop' policy)
+					skip = behind - r.size
+					self.dropped += skip
+					self.cursor += skip
+				item = r.slots[self.cursor % (r.size + 1)]
+				if r.seq - self.cursor <= r.size:	# the slot was not overwritten while we read it
+					self.cursor += 1
+					if r.writer_waiting:
+						with r.cond:
+							r.cond.notify_all()
+					if self.subscribed:
+						t = helpers.msg_type(item)
+						if not self.accepts(t, rs.getCHN(item) if t == 'DATA' else None):
+							continue
+					return item
+				continue
+			if not block:
+				raise Empty
+			remaining = None if end is None else end - monotonic()
+			if (remaining is not None) and (remaining <= 0):
+				raise Empty
+			with r.cond:
+				r.sleepers += 1
+				try:
+					if r.seq == self.cursor:
+						if not r.cond.wait(remaining) and (r.seq == self.cursor):
+							raise Empty
+				finally:
+					r.sleepers -= 1
+
+	def get_nowait(self):
+		return self.get(False)
+
+	def task_done(self):
+		pass
+
+
+class DualLaneQueue(Queue):
+	'''
+	.. versionadded:: 1.1.2
+
+	A :py:class:`queue.Queue` with two lanes: one for messages
+	(``ALARM``, ``RESET``, ``IMGPATH``, ``TERM``...) and one for data.
+	Messages are always read before data, so an ``ALARM`` does not have to
+	wait behind hundreds of packets when a slow reader (the plot, during a redraw,
+	for example) has fallen behind. Each lane keeps its own order.
+
+	Putting a message never blocks, even if the queue is full.
+	:py:class:`rsudp.raspberryshake.Batch` objects count as data.
+
+	.. versionadded:: 1.1.2
+
+		Items can be put and read in batches with :py:func:`put_many` and
+		:py:func:`get_many`, which take the queue's lock once per batch
+		rather than once per item.
+		Nothing waits for these queues to be emptied, so they do not track tasks:
+		:py:func:`task_done` does nothing and :py:func:`join` does not wait.
+
+	:param int maxsize: size of the queue
+	'''
+	def _init(self, maxsize):
+		super()._init(maxsize)
+		self.control = deque()		# the message lane; self.queue is the data lane
+
+	def _qsize(self):
+		return len(self.queue) + len(self.control)
+
+	def _get(self):
+		return self.control.popleft() if self.control else self.queue.popleft()
+
+	@staticmethod
+	def is_control(item):
+		'''
+		Whether an item goes in the message lane.
+
+		:param item: a queue item
+		:rtype: bool
+		'''
+		return (not isinstance(item, rs.Batch)) and (helpers.msg_type(item) != 'DATA')
+
+	def put(self, item, block=True, timeout=None):
+		'''
+		Puts a message in the message lane, or puts a data packet
+		in the data lane like :py:func:`queue.Queue.put`.
+
+		:param item: the data packet or message to queue
+		'''
+		if not self.is_control(item):
+			return super().put(item, block, timeout)
+		with self.mutex:
+			self.control.append(item)
+			self.not_empty.notify()
+
+	def put_many(self, items, block=True, timeout=None):
+		'''
+		Puts several items on the queue in order, as :py:func:`put` would.
+
+		:param list items: the data packets and messages to queue
+		:param bool block: whether to wait for space for data packets if the queue is full
+		:param float timeout: seconds to wait each time the queue is full (``None`` waits forever)
+		:raise queue.Full: if there was no space for a data packet in time (the items before it have been queued)
+		'''
+		with self.not_full:
+			try:
+				for item in items:
+					if self.is_control(item):
+						self.control.append(item)
+						continue
+					while 0 < self.maxsize <= self._qsize():
+						if not block:
+							raise Full
+						self.not_empty.notify()		# let the reader make room
+						if not self.not_full.wait(timeout):
+							raise Full
+					self._put(item)
+			finally:
+				self.not_empty.notify()
+
+	def get_many(self, max_items=None, timeout=None):
+		'''
+		Waits for the queue to have something on it, then takes everything
+		(or up to ``max_items`` items) off it at once, messages first.
+
+		:param int max_items: the most items to return (``None`` for no limit)
+		:param float timeout: seconds to wait if the queue is empty (``None`` waits forever, ``0`` does not wait)
+		:rtype: list
+		:return: the items, or an empty list if nothing arrived before the timeout
+		'''
+		with self.not_empty:
+			if timeout is None:
+				while not self._qsize():
+					self.not_empty.wait()
+			else:
+				end = monotonic() + timeout
+				while not self._qsize():
+					remaining = end - monotonic()
+					if remaining <= 0:
+						return []
+					self.not_empty.wait(remaining)
+			n = self._qsize() if max_items is None else min(max_items, self._qsize())
+			items = [self._get() for i in range(n)]
+			self.not_full.notify()
+			return items
+
+	def task_done(self):
+		pass
+
+	def join(self):
+		pass
+
+
+class PolicyQueue(Subscriber, DualLaneQueue):
+	'''
+	.. versionadded:: 1.1.2
+
+	A :py:class:`rsudp.c_consumer.DualLaneQueue` that decides what to do when
+	its data lane is full instead of always making the :py:class:`rsudp.c_consumer.Consumer` wait,
+	so that one slow sub-consumer (a notifier waiting on a web service, for example)
+	cannot hold up data for all of the others.
+
+	The ``policy`` decides what happens when a data packet is put on a full queue:
+
+	- ``'block'`` waits for space, like a plain :py:class:`queue.Queue` (no data is lost)
+	- ``'drop-oldest'`` throws away the oldest data packet in the queue to make room
+	- ``'drop-newest'`` throws away the incoming data packet
+	- ``'coalesce'`` throws away all data packets in the queue, keeping only the
+	  incoming one, for sub-consumers that mostly care about messages
+
+	Messages (``ALARM``, ``RESET``, ``IMGPATH``, ``TERM``...) have their own lane
+	and are never thrown away.
+	Packets thrown away are counted in :py:data:`dropped`.
+
+	:param int maxsize: size of the queue
+	:param str policy: ``'block'``, ``'drop-oldest'``, ``'drop-newest'``, or ``'coalesce'``
+	:param str name: name to use when reporting dropped packets
+	'''
+	POLICIES = ('block', 'drop-oldest', 'drop-newest', 'coalesce')
+
+	def __init__(self, maxsize=rs.qsize, policy='block', name=''):
+		if policy not in self.POLICIES:
+			raise ValueError('Unknown queue policy: %s' % policy)
+		super().__init__(maxsize)
+		self.policy = policy
+		self.name = name
+		self.dropped = 0			# data packets thrown away because the queue was full
+
+	def put(self, item, block=True, timeout=None):
+		'''
+		Puts an item on the queue, applying the policy if the queue is full.
+		Only the ``'block'`` policy uses ``block`` and ``timeout``.
+
+		:param item: the data packet or message to queue
+		'''
+		if (self.policy == 'block') or self.is_control(item):
+			return super().put(item, block, timeout)
+		with self.mutex:
+			self._offer(item)
+			self.not_empty.notify()
+
+	def _offer(self, item):
+		'''
+		Applies the policy and queues a data packet. The caller must hold the lock.
+		'''
+		if 0 < self.maxsize <= self._qsize():
+			if self.policy == 'drop-newest':
+				self.dropped += 1
+				return
+			n = min(1, len(self.queue)) if self.policy == 'drop-oldest' else len(self.queue)
+			for i in range(n):
+				self.queue.popleft()
+			self.dropped += n
+		self.queue.append(item)
+
+	def put_many(self, items, block=True, timeout=None):
+		'''
+		Puts several items on the queue in order, applying the policy to each.
+		Only the ``'block'`` policy uses ``block`` and ``timeout``.
+
+		:param list items: the data packets and messages to queue
+		'''
+		if self.policy == 'block':
+			return super().put_many(items, block, timeout)
+		with self.mutex:
+			for item in items:
+				if self.is_control(item):
+					self.control.append(item)
+				else:
+					self._offer(item)
+			self.not_empty.notify()
+
+
 class Consumer(Thread):
 	"""
 	The main consumer process. This consumer reads
@@ -11,11 +445,27 @@ class Consumer(Thread):
 	and distributes those messages to each sub-consumer in ``destinations``.
 
 	:param queue.Queue queue: queue of data and messages sent by :class:`rsudp.p_producer.Producer`
-	:param list destinations: list of :py:class:`queue.Queue` objects to pass data to
+	:param list destinations: list of :py:class:`queue.Queue` objects to pass data to (or a single :py:class:`rsudp.c_consumer.BroadcastRing` in a list, see below)
+	:param bool parse: whether the producer is parsing packets (see :py:class:`rsudp.p_producer.Producer`). if so, messages put on the master queue as bytes by other threads are parsed here before distribution.
+
+	.. versionadded:: 1.1.2
+
+		:py:class:`rsudp.raspberryshake.Batch` objects from the Producer's burst
+		mode are unpacked here, so each sub-consumer still receives one item at a time.
+		Each destination that has a ``put_many`` method (see
+		:py:class:`rsudp.c_consumer.DualLaneQueue`) is given its share of a batch in one call.
+
+		Destinations that are :py:class:`rsudp.c_consumer.Subscriber` objects
+		only receive the data packets and messages they subscribed to.
+
+		Anything with a ``put`` method can be a destination. Passing
+		``[ring]``, where ``ring`` is a :py:class:`rsudp.c_consumer.BroadcastRing`
+		whose readers are the sub-consumer queues, distributes each message with one
+		write instead of one :py:func:`queue.Queue.put` per sub-consumer.
 	"""
 
 
-	def __init__(self, queue, destinations, testing=False):
+	def __init__(self, queue, destinations, testing=False, parse=False):
 		"""
 		Initializes the main consumer. 
 		
@@ -27,6 +477,7 @@ class Consumer(Thread):
 		self.destinations = destinations
 		self.running = True
 		self.testing = testing
+		self.parse = parse
 
 		printM('Starting.', self.sender)
 
@@ -36,15 +487,46 @@ class Consumer(Thread):
 		it may be used to populate ObsPy streams for various things like
 		plotting, alert triggers, and ground motion calculation.
 		"""
+		# destinations with no subscription get everything
+		routes = [(q, q.accepts if getattr(q, 'subscribed', False) else None)
+				  for q in self.destinations]
+		by_channel = any(getattr(q, 'channels', None) is not None for q in self.destinations)
 		try:
 			while self.running:
-				p = self.queue.get()
+				b = self.queue.get()
 				self.queue.task_done()
 
-				for q in self.destinations:
-					q.put(p)
+				batch = isinstance(b, rs.Batch)
+				out = [[] for r in routes] if batch else None
+				for p in (b if batch else (b,)):
+					if self.parse and isinstance(p, bytes):
+						p = rs.parse_message(p)
+
+					t = helpers.msg_type(p)
+					chn = rs.getCHN(p) if (by_channel and t == 'DATA') else None
+					for k, (q, accepts) in enumerate(routes):
+						if (accepts is None) or accepts(t, chn):
+							if batch:
+								out[k].append(p)
+							else:
+								q.put(p)
+
+					if t == 'TERM':
+						self.running = False
+						break
+
+				if batch:
+					# hand each destination its share of the batch at once
+					for (q, accepts), items in zip(routes, out):
+						if not items:
+							continue
+						if hasattr(q, 'put_many'):
+							q.put_many(items)
+						else:
+							for p in items:
+								q.put(p)
 
-				if 'TERM' in str(p):
+				if not self.running:
 					printM('Exiting.', self.sender)
 					break
 
@@ -1,5 +1,5 @@
 import sys, os
-from rsudp import printM, printW, printE
+from rsudp import printM, printW, printE, helpers
 from rsudp.raspberryshake import ConsumerThread
 from rsudp.test import TEST
 
@@ -101,6 +101,20 @@ class Custom(ConsumerThread):
 			printW('No code to run, codefile variable not set correctly.', sender=self.sender)
 
 
+	def handle(self, d):
+		"""
+		.. versionadded:: 1.1.2
+
+		Executes self.codefile if ``d`` is an ``ALARM`` message
+		(see :py:data:`rsudp.raspberryshake.ConsumerThread.handle`).
+
+		:param bytes d: the queue message
+		"""
+		if helpers.msg_type(d) == 'ALARM':
+			printM('Got ALARM message...', sender=self.sender)
+			self.exec_code()
+
+
 	def run(self):
 		"""
 		Reads data from the queue and executes self.codefile if it sees an ``ALARM`` message.
@@ -109,12 +123,10 @@ class Custom(ConsumerThread):
 		while True:
 			d = self.queue.get()
 			self.queue.task_done()
-			if 'TERM' in str(d):
+			if helpers.msg_type(d) == 'TERM':
 				self.alive = False
 				printM('Exiting.', self.sender)
 				sys.exit()
-			elif 'ALARM' in str(d):
-				printM('Got ALARM message...', sender=self.sender)
-				self.exec_code()
+			self.handle(d)
 
 		self.alive = False
@@ -1,6 +1,6 @@
 import os, sys
 import socket as s
-from rsudp import printM, printW, printE
+from rsudp import printM, printW, printE, helpers
 import rsudp.raspberryshake as rs
 from rsudp.test import TEST
 
@@ -27,6 +27,7 @@ class Forward(rs.ConsumerThread):
 	:type cha: str or list
 	:param queue.Queue q: queue of data and messages sent by :class:`rsudp.c_consumer.Consumer`
 	"""
+	handle_blocks = False	# sending a datagram does not block, so this can run on the event loop
 
 	def __init__(self, num, addr, port, fwd_data, fwd_alarms, cha, q, testing=False):
 		"""
@@ -38,6 +39,7 @@ class Forward(rs.ConsumerThread):
 		self.sender = 'Forward #%s (%s:%s)' % (num, addr, port)
 		self.queue = q
 		self.testing = testing
+		self.sock = None
 		self.addr = addr
 		self.port = port
 		self.fwd_data = fwd_data
@@ -69,13 +71,13 @@ class Forward(rs.ConsumerThread):
 		sys.exit()
 
 
-	def run(self):
+	def _open(self):
 		"""
-		Gets and distributes queue objects to another address and port on the network.
+		Opens the socket to forward with.
 		"""
 		printM('Opening socket...', sender=self.sender)
 		socket_type = s.SOCK_DGRAM if os.name in 'nt' else s.SOCK_DGRAM | s.SO_REUSEADDR
-		sock = s.socket(s.AF_INET, socket_type)
+		self.sock = s.socket(s.AF_INET, socket_type)
 
 		msg_data = '%s data' % (self.chans) if self.fwd_data else ''
 		msg_and = ' and ' if (self.fwd_data and self.fwd_alarms) else ''
@@ -84,28 +86,45 @@ class Forward(rs.ConsumerThread):
 		printM('Forwarding %s%s%s to %s:%s' % (msg_data, msg_and, msg_alarms, self.addr,
 											   self.port), sender=self.sender)
 
-		try:
-			while self.running:
-				p = self.queue.get()	# get a packet
-				self.queue.task_done()	# close the queue
 
-				if 'TERM' in str(p):	# shutdown if there's a TERM message on the queue
-					self._exit()
+	def handle(self, p):
+		"""
+		.. versionadded:: 1.1.2
+
+		Forwards one data packet or ``ALARM``/``RESET`` message, if this
+		forwarder is set to forward it (see :py:data:`rsudp.raspberryshake.ConsumerThread.handle`).
+
+		:param p: the data packet or message
+		"""
+		if self.sock is None:
+			self._open()
+		t = helpers.msg_type(p)
+
+		if (t == 'ALARM') or (t == 'RESET'):
+			if self.fwd_alarms:
+				self.sock.sendto(bytes(p), (self.addr, self.port))
 
-				if 'IMGPATH' in str(p):
-					continue
+		elif t == 'DATA':
+			if (self.fwd_data) and (rs.getCHN(p) in self.chans):
+				self.sock.sendto(bytes(p), (self.addr, self.port))
+
+			if self.testing:
+				TEST['c_forward'][1] = True
 
-				if ('ALARM' in str(p)) or ('RESET' in str(p)):
-					if self.fwd_alarms:
-						sock.sendto(p, (self.addr, self.port))
-					continue
 
-				if "{'" in str(p):
-					if (self.fwd_data) and (rs.getCHN(p) in self.chans):
-						sock.sendto(p, (self.addr, self.port))
+	def run(self):
+		"""
+		Gets and distributes queue objects to another address and port on the network.
+		"""
+		self._open()
+
+		try:
+			while self.running:
+				for p in self.get_batch():	# get everything that has arrived
+					if helpers.msg_type(p) == 'TERM':	# shutdown if there's a TERM message on the queue
+						self._exit()
 
-				if self.testing:
-					TEST['c_forward'][1] = True
+					self.handle(p)
 
 		except Exception as e:
 			self.alive = False
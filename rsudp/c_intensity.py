@@ -0,0 +1,411 @@
+import sys, os
+import socket as s
+import numpy as np
+from rsudp import printM, printW, printE
+from rsudp import helpers
+import rsudp.raspberryshake as rs
+from rsudp.test import TEST
+
+
+def jma_filter(f):
+	'''
+	.. versionadded:: 1.1.2
+
+	The amplitude response of the filter used to calculate the Japan Meteorological
+	Agency (JMA) instrumental seismic intensity: the period-effect filter
+	:math:`\\sqrt{1/f}`, times the high-cut filter
+
+	.. math::
+
+		(1 + 0.694y^2 + 0.241y^4 + 0.0557y^6 + 0.009664y^8 + 0.00134y^{10} + 0.000155y^{12})^{-1/2},\\ y = f/10
+
+	times the low-cut filter :math:`\\sqrt{1 - e^{-(f/0.5)^3}}`.
+
+	:param numpy.ndarray f: frequencies in Hz
+	:rtype: numpy.ndarray
+	:return: the filter's gain at each frequency (``0`` at 0 Hz)
+	'''
+	f = np.asarray(f, dtype=np.float64)
+	gain = np.zeros_like(f)
+	ff = f[f > 0]
+	y = ff / 10.
+	gain[f > 0] = (np.sqrt(1. / ff)
+				   * (1 + 0.694*y**2 + 0.241*y**4 + 0.0557*y**6 + 0.009664*y**8
+					  + 0.00134*y**10 + 0.000155*y**12) ** -0.5
+				   * np.sqrt(1. - np.exp(-(ff / 0.5)**3)))
+	return gain
+
+
+def jma_class(intensity):
+	'''
+	.. versionadded:: 1.1.2
+
+	Returns the JMA seismic intensity class (shindo) for an instrumental intensity.
+
+	.. code-block:: python
+
+		>>> jma_class(5.2)
+		'5+'
+
+	:param float intensity: JMA instrumental seismic intensity
+	:rtype: str
+	:return: ``'0'`` to ``'4'``, ``'5-'``, ``'5+'``, ``'6-'``, ``'6+'``, or ``'7'``
+	'''
+	for limit, shindo in ((0.5, '0'), (1.5, '1'), (2.5, '2'), (3.5, '3'), (4.5, '4'),
+						  (5.0, '5-'), (5.5, '5+'), (6.0, '6-'), (6.5, '6+')):
+		if intensity < limit:
+			return shindo
+	return '7'
+
+
+class Intensity(rs.ConsumerThread):
+	"""
+	.. versionadded:: 1.1.2
+
+	A consumer class that calculates the Japan Meteorological Agency (JMA)
+	instrumental seismic intensity, peak ground acceleration (PGA), and
+	peak ground velocity (PGV) from the three accelerometer channels
+	(``ENE``, ``ENN``, and ``ENZ``) as data arrives.
+
+	Every ``interval`` seconds of data, the three channels are converted to gal
+	(cm/s\\ :sup:`2`) with the station's accelerometer sensitivity and
+	filtered with the JMA filter (see :py:func:`rsudp.c_intensity.jma_filter`),
+	and the intensity is calculated from the vector sum of the last ``window`` seconds:
+	if :math:`a_0` is the value that the vector sum is above for 0.3 seconds in all,
+	the intensity is :math:`2 \\log_{10} a_0 + 0.94`, rounded down to one decimal place.
+	PGA and PGV are the largest vector sums of the (0.1 Hz highpassed) acceleration
+	and velocity in the same window.
+
+	The JMA filter is applied with overlap-save: its impulse response
+	(about 10 seconds long) is transformed once, and each block of new samples
+	costs one FFT and one inverse FFT of about twice the filter's length for the
+	three channels together, instead of transforming the whole window. The filter
+	is symmetric, so intensities lag the data by half its length.
+
+	Each result is sent to the other modules as an ``INTENSITY`` message
+	(see :py:func:`rsudp.helpers.msg_intensity`), printed unless ``quiet``, and
+	optionally forwarded to an IP address and port specified by ``"fwaddr"`` and
+	``"fwport"`` with packets formatted as either JSON, "lite", or CSV,
+	as in :py:class:`rsudp.c_rsam.RSAM`.
+
+	:param queue.Queue q: queue of data and messages sent by :class:`rsudp.c_consumer.Consumer`.
+	:param float interval: seconds of data between results
+	:param float window: seconds of data each result covers
+	:param float sensitivity: accelerometer sensitivity in counts per m/s\\ :sup:`2`, used if the station's instrument response is not available
+	:param str fwaddr: Specify a forwarding address to send results in a UDP packet
+	:param str fwport: Specify a forwarding port to send results in a UDP packet
+	:param str fwformat: Specify a format for the forwarded packet: ``'LITE'``, ``'JSON'``, or ``'CSV'``
+	:param bool quiet: ``True`` to suppress printing of results live to the console, ``False`` otherwise.
+	"""
+	CHANNELS = ('ENE', 'ENN', 'ENZ')
+
+	def __init__(self, q=False, interval=1, window=60, sensitivity=False,
+				 fwaddr=False, fwport=False, fwformat='LITE', quiet=False,
+				 testing=False, *args, **kwargs):
+		"""
+		Initializes the intensity thread.
+		"""
+		super().__init__()
+		self.sender = 'Intensity'
+		self.alive = True
+		self.testing = testing
+		self.quiet = quiet
+		self.stn = rs.stn
+		self.sps = rs.sps
+		self.fwaddr = fwaddr
+		self.fwport = fwport
+		self.fwformat = fwformat.upper()
+		self.sock = False
+		self.args = args
+		self.kwargs = kwargs
+
+		self._set_channels()
+		self.station = rs.current_station()
+		self.inv = self.station.inv		# the inventory the gains are from
+		self.gain = 100. / np.array([self._sensitivity(c, sensitivity) for c in self.channels])	# counts to gal
+
+		self.interval = interval
+		self.window = window
+		self.block = int(round(interval * self.sps))			# samples per result
+		self.taps = 1 << int(np.ceil(np.log2(10 * self.sps)))	# about 10 s of JMA filter
+		self.nfft = 1 << int(np.ceil(np.log2(self.block + self.taps - 1)))
+		self.spectrum = np.fft.rfft(self._impulse(), self.nfft)
+		self.top = max(int(round(0.3 * self.sps)), 1)			# samples in 0.3 seconds
+		self.ring = rs.RingStream(seconds=max(window, 2 * interval), fill_value='latest')
+		self.hp_acc = helpers.StreamingFilter('highpass', freqmin=0.1, corners=2)
+		self.hp_vel = helpers.StreamingFilter('highpass', freqmin=0.1, corners=2)
+		self.history = np.zeros((3, int(round(window * self.sps))))	# vector sums: JMA, acceleration, velocity
+		self._restart()
+
+		self.intensity = 0.
+		self.pga = 0.
+		self.pgv = 0.
+
+		if q:
+			self.queue = q
+		else:
+			printE('no queue passed to the consumer thread! We will exit now!',
+				   self.sender)
+			sys.stdout.flush()
+			self.alive = False
+			sys.exit()
+
+		printM('Starting.', self.sender)
+
+
+	def _set_channels(self):
+		'''
+		Checks that the station has the three accelerometer channels.
+		'''
+		self.channels = [c for c in self.CHANNELS if c in rs.chns]
+		if len(self.channels) < 3:
+			printE('Intensity needs the %s channels, but this station has %s. Please correct and restart.'
+				   % (', '.join(self.CHANNELS), ', '.join(rs.chns)), self.sender)
+			sys.exit(2)
+
+
+	def _sensitivity(self, cha, default):
+		'''
+		Gets a channel's sensitivity from the station's instrument response,
+		or if there is none, uses ``default``.
+
+		:param str cha: the channel
+		:param float default: the sensitivity to use if there is no response
+		:rtype: float
+		:return: the sensitivity in counts per m/s\\ :sup:`2`
+		'''
+		if self.inv:
+			try:
+				resp = rs.get_response('%s.%s.00.%s' % (self.station.net, self.station.stn, cha),
+									   rs.UTCDateTime.now(), self.station)
+				return resp.instrument_sensitivity.value
+			except Exception as e:
+				printW('Could not get the response for %s: %s' % (cha, e), self.sender)
+		if not default:
+			printE('No instrument response or "sensitivity" setting for %s. Please correct and restart.' % (cha),
+				   self.sender)
+			sys.exit(2)
+		return float(default)
+
+
+	def _update_gain(self):
+		'''
+		Takes the sensitivities from the station's inventory again after it has been
+		refreshed in the background (see :py:func:`rsudp.raspberryshake.Station.refresh_inventory`),
+		keeping the current ones for channels it has no response for.
+		'''
+		self.inv = self.station.inv
+		self.gain = 100. / np.array([self._sensitivity(c, 100. / g) for c, g in zip(self.channels, self.gain)])
+		printM('Using the sensitivities from the refreshed inventory.', self.sender)
+
+
+	def _impulse(self):
+		'''
+		Makes a finite impulse response that approximates the JMA filter,
+		delayed by half its length and tapered with a Hann window.
+
+		:rtype: numpy.ndarray
+		'''
+		n = 8 * self.taps
+		h = np.fft.irfft(jma_filter(np.fft.rfftfreq(n, 1. / self.sps)), n)
+		return np.roll(h, self.taps // 2)[:self.taps] * np.hanning(self.taps)
+
+
+	def _restart(self):
+		'''
+		Forgets all samples, as if starting again. Used at startup and
+		when the data does not follow on from the last samples (after a long gap, for example).
+		'''
+		self.tail = np.zeros((3, self.taps - 1))	# the last samples, for overlap-save
+		self.offset = np.full(3, np.nan)			# each channel's first sample, taken off all its samples
+		self.vel = np.zeros(3)
+		self.hp_acc.reset()
+		self.hp_vel.reset()
+		self.history[:] = 0.
+		self.count = 0								# samples processed since the restart
+		self._marks = [None] * 3
+		self._pending = [np.zeros(0)] * 3
+		self._skip = [0] * 3						# samples to skip on each channel to line it up with the others
+
+
+	def _getq(self):
+		"""
+		Reads data from the queue and updates the stream.
+
+		:rtype: bool
+		:return: Returns ``True`` if stream is updated, otherwise ``False``.
+		"""
+		d = self.queue.get(True, timeout=None)
+		self.queue.task_done()
+		return self._update(d)
+
+
+	def _update(self, d):
+		'''
+		Updates the stream with a queue item.
+
+		:param d: the data packet or message
+		:rtype: bool
+		:return: Returns ``True`` if stream is updated, otherwise ``False``.
+		'''
+		if rs.getCHN(d) in self.channels:
+			self.ring.append(d)
+			return True
+		elif helpers.msg_type(d) == 'TERM':
+			self.alive = False
+			printM('Exiting.', self.sender)
+			sys.exit()
+		else:
+			return False
+
+
+	def _stream(self):
+		'''
+		Reads the samples that have arrived since the last call, converted to gal,
+		into :py:data:`self._pending`, restarting if they do not follow on.
+		Channels are lined up by the times of their samples
+		(see :py:func:`rsudp.raspberryshake.RingStream.align`), so that each
+		vector sum is of samples taken at the same time.
+		If a channel stops sending while the others carry on, their samples are
+		only kept for as long as the buffer holds, after which the analysis
+		starts again with a warning.
+		'''
+		if any(c not in self.ring.rings for c in self.channels):
+			return		# wait for data from every channel
+		if self.station.inv is not self.inv:
+			self._update_gain()
+		new = [self.ring.since(c, m) for c, m in zip(self.channels, self._marks)]
+		if not all(contiguous for x, m, contiguous in new):
+			self._restart()
+			new = [self.ring.since(c) for c in self.channels]
+			self._skip = self.ring.align(self.channels, [len(x) for x, m, contiguous in new])
+		self._marks = [m for x, m, contiguous in new]
+		for i, (x, m, contiguous) in enumerate(new):
+			k = min(self._skip[i], len(x))
+			self._skip[i] -= k
+			x = x[k:]
+			if len(x):
+				if np.isnan(self.offset[i]):
+					self.offset[i] = float(x[0])
+				x = (x - self.offset[i]) * self.gain[i]
+				self._pending[i] = np.concatenate([self._pending[i], x])
+
+		if max(len(p) for p in self._pending) > self.ring.rings[self.channels[0]].cap:
+			# a channel has stopped sending while the others carry on
+			least = min(len(p) for p in self._pending)
+			stalled = [c for c, p in zip(self.channels, self._pending) if len(p) == least]
+			printW('No data from %s for %s seconds, starting again'
+				   % (', '.join(stalled), round(self.ring.seconds, 1)), self.sender)
+			marks = self._marks
+			self._restart()
+			self._marks = marks		# carry on from the samples already read,
+			self._skip = self.ring.align(self.channels)	# from the latest channel's next sample
+
+
+	def _filter(self, x):
+		'''
+		Filters a block of samples, updating the window of vector sums.
+
+		:param numpy.ndarray x: acceleration in gal, with shape ``(3, block)``
+		'''
+		n = x.shape[-1]
+		# JMA filter by overlap-save
+		seg = np.concatenate([self.tail, x], axis=-1)
+		y = np.fft.irfft(np.fft.rfft(seg, self.nfft, axis=-1) * self.spectrum, self.nfft,
+						 axis=-1)[:, self.taps - 1:self.taps - 1 + n]
+		self.tail = seg[:, n:]
+
+		# acceleration and velocity for PGA and PGV
+		acc = np.stack([self.hp_acc.filter(c, x[i], self.sps) for i, c in enumerate(self.channels)])
+		vel = self.vel[:, np.newaxis] + np.cumsum(acc, axis=-1) / self.sps
+		self.vel = vel[:, -1]
+		vel = np.stack([self.hp_vel.filter(c, vel[i], self.sps) for i, c in enumerate(self.channels)])
+
+		self.history = np.roll(self.history, -n, axis=-1)
+		self.history[:, -n:] = np.sqrt(np.stack([(y * y).sum(axis=0), (acc * acc).sum(axis=0),
+												 (vel * vel).sum(axis=0)]))
+		self.count += n
+
+
+	def _measure(self):
+		'''
+		Calculates the intensity, PGA, and PGV of the window.
+		'''
+		have = min(self.count, self.history.shape[-1])
+		jma = self.history[0, -have:]
+		a0 = np.partition(jma, -self.top)[-self.top] if have >= self.top else 0.
+		intensity = 2 * np.log10(a0) + 0.94 if a0 > 0 else 0.
+		# JMA rounds to two decimal places, then cuts off the second
+		self.intensity = np.floor(round(intensity, 2) * 10) / 10
+		self.pga = round(float(self.history[1, -have:].max()), 3)
+		self.pgv = round(float(self.history[2, -have:].max()), 4)
+
+
+	def _print_intensity(self, time):
+		'''
+		Prints the current results.
+		'''
+		if not self.quiet:
+			printM('%s JMA intensity %.1f (shindo %s), PGA %s gal, PGV %s cm/s' % (
+				   time.strftime('%Y-%m-%d %H:%M:%S'), self.intensity, jma_class(self.intensity),
+				   self.pga, self.pgv), self.sender)
+
+
+	def _forward_intensity(self):
+		"""
+		Send the results via UDP to another destination in a lightweight format
+		"""
+		if self.sock:
+			msg = 'stn:%s|int:%s|shindo:%s|pga:%s|pgv:%s' % (self.stn, self.intensity,
+					jma_class(self.intensity), self.pga, self.pgv)
+			if self.fwformat == 'JSON':
+				msg = '{"station":"%s","intensity":%s,"shindo":"%s","pga":%s,"pgv":%s}' \
+					  % (self.stn, self.intensity, jma_class(self.intensity), self.pga, self.pgv)
+			elif self.fwformat == 'CSV':
+				msg = '%s,%s,%s,%s,%s' \
+					  % (self.stn, self.intensity, jma_class(self.intensity), self.pga, self.pgv)
+			packet = bytes(msg, 'utf-8')
+			self.sock.sendto(packet, (self.fwaddr, self.fwport))
+
+
+	def _results(self):
+		'''
+		Filters each full block of pending samples, then measures,
+		publishes, forwards, and prints the results.
+		'''
+		while min(len(p) for p in self._pending) >= self.block:
+			x = np.stack([p[:self.block] for p in self._pending])
+			self._pending = [p[self.block:] for p in self._pending]
+			self._filter(x)
+			if self.count < self.taps:
+				continue	# still filling the JMA filter
+			time = helpers.fsec(self.ring.endtime(self.channels[0])
+								- len(self._pending[0]) / self.sps)
+			self._measure()
+			self.publish(helpers.msg_intensity(time, self.intensity, self.pga, self.pgv))
+			self._forward_intensity()
+			self._print_intensity(time)
+			if self.testing:
+				TEST['c_intensity'][1] = True
+
+
+	def run(self):
+		"""
+		Reads data from the queue and calculates intensity every ``interval`` seconds of data.
+		Quits if it sees a ``TERM`` message.
+		"""
+		if self.fwaddr and self.fwport:
+			printM('Opening socket...', sender=self.sender)
+			socket_type = s.SOCK_DGRAM if os.name in 'nt' else s.SOCK_DGRAM | s.SO_REUSEADDR
+			self.sock = s.socket(s.AF_INET, socket_type)
+
+		printM('Starting intensity analysis with interval=%s and window=%s on station=%s channels=%s forward=%s'
+			   % (self.interval, self.window, self.stn, ', '.join(self.channels), self.fwaddr), self.sender)
+		while True:
+			updated = False
+			for d in self.get_batch():
+				updated = self._update(d) or updated
+			if updated:
+				self._stream()
+				self._results()
+			sys.stdout.flush()
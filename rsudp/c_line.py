@@ -59,7 +59,7 @@ class LINE(rs.ConsumerThread):
 		d = self.queue.get()
 		self.queue.task_done()
 
-		if 'TERM' in str(d):
+		if helpers.msg_type(d) == 'TERM':
 			self.alive = False
 			printM('Exiting.', self.sender)
 			sys.exit()
@@ -124,15 +124,26 @@ class LINE(rs.ConsumerThread):
 				printM('Could not find image: %s' % (imgpath), sender=self.sender)
 
 
+	def handle(self, d):
+		'''
+		.. versionadded:: 1.1.2
+
+		Acts on one ``ALARM`` or ``IMGPATH`` message
+		(see :py:data:`rsudp.raspberryshake.ConsumerThread.handle`).
+
+		:param bytes d: the queue message
+		'''
+		if helpers.msg_type(d) == 'ALARM':
+			self._when_alarm(d)
+
+		elif helpers.msg_type(d) == 'IMGPATH':
+			self._when_img(d)
+
+
 	def run(self):
 		"""
 		Reads data from the queue and sends a message if it sees an IMGPATH message
 		"""
 		while True:
 			d = self.getq()
-
-			if 'ALARM' in str(d):
-				self._when_alarm(d)
-
-			if 'IMGPATH' in str(d):
-				self._when_img(d)
+			self.handle(d)
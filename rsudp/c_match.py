@@ -0,0 +1,379 @@
+import sys, os
+import numpy as np
+from rsudp import printM, printW, printE
+from rsudp import helpers
+import rsudp.raspberryshake as rs
+from rsudp import COLOR
+from rsudp.test import TEST
+
+
+class Match(rs.ConsumerThread):
+	"""
+	.. versionadded:: 1.1.2
+
+	A consumer class that detects events by matching the live data against a library
+	of recorded events (templates), which is less easily fooled by local noise
+	(traffic, machinery, footsteps...) than an STA/LTA trigger.
+
+	Templates are read from the miniSEED files in the ``templates`` directory
+	(for example, files written by :py:class:`rsudp.c_write.Write`, or cut from them).
+	Each trace of the listening channel becomes a template. Traces longer than
+	``duration`` seconds are cut to the ``duration`` seconds around their largest
+	(filtered) amplitude, starting a quarter of the way before it.
+
+	As data arrives, it is filtered and correlated with every template, and the
+	normalized cross-correlation coefficient (from -1 to 1) is calculated for each
+	template at each sample. When any template's coefficient reaches ``threshold``,
+	this raises an alarm (:py:func:`rsudp.raspberryshake.ConsumerThread.raise_alarm`),
+	and once no template has reached it for the length of the longest template,
+	the alarm is reset (:py:func:`rsudp.raspberryshake.ConsumerThread.raise_reset`).
+
+	The correlation is done with overlap-save: the templates' spectra are calculated
+	once for each transform length and kept. Each block of new samples is transformed
+	once for all the templates, so that each template only costs a multiplication
+	and its share of one batched inverse transform. Window energies for the
+	normalization come from cumulative sums, one per distinct template length.
+
+	.. code-block:: python
+
+		>>> q = mk_q(name='match')
+		>>> match = Match(q=q, templates='/home/pi/rsudp/templates', cha='EHZ', threshold=0.7)
+
+	:param queue.Queue q: queue of data and messages sent by :class:`rsudp.c_consumer.Consumer`.
+	:param str templates: directory of miniSEED template files
+	:param str cha: listening channel (defaults to [S,E]HZ)
+	:param float threshold: correlation coefficient that raises an alarm
+	:param float duration: longest template to use, in seconds
+	:param bp: bandpass filter parameters ``[highpass, lowpass]``, or ``False`` to not filter
+	:type bp: :py:class:`bool` or :py:class:`list`
+	:param bool quiet: ``True`` to suppress printing of the best match live to the console, ``False`` otherwise.
+	"""
+
+	def __init__(self, q=False, templates='', cha='HZ', threshold=0.7, duration=20,
+				 bp=[1, 10], quiet=True, testing=False, *args, **kwargs):
+		"""
+		Initializes the template matching thread.
+		"""
+		super().__init__()
+		self.sender = 'Match'
+		self.alive = True
+		self.testing = testing
+		self.quiet = quiet
+		self.stn = rs.stn
+		self.sps = rs.sps
+		self.default_ch = 'HZ'
+		self.args = args
+		self.kwargs = kwargs
+
+		self.threshold = threshold
+		self.duration = duration
+		self._set_channel(cha)
+		self._set_filt(bp)
+		self._load(templates)
+		self.step = int(self.sps)			# smallest block of samples to correlate
+		self.ring = rs.RingStream(seconds=10, fill_value='latest')
+		self.spectra = {}					# conjugate template spectra by transform length
+		self._restart()
+
+		self.exceed = False
+		self.best = 0.
+		self.maxcc = 0.
+		self.below = 0						# samples since a template last reached the threshold
+
+		if q:
+			self.queue = q
+		else:
+			printE('no queue passed to the consumer thread! We will exit now!',
+				   self.sender)
+			sys.stdout.flush()
+			self.alive = False
+			sys.exit()
+
+		printM('Starting.', self.sender)
+
+
+	def _find_chn(self):
+		"""
+		Finds channel match in list of channels.
+		"""
+		for chn in rs.chns:
+			if self.cha in chn:
+				self.cha = chn
+
+
+	def _set_channel(self, cha):
+		"""
+		This function sets the channel to listen to (see :py:func:`rsudp.c_rsam.RSAM._set_channel`).
+
+		:param cha: the channel to listen to
+		:type cha: str
+		"""
+		cha = self.default_ch if (cha == 'all') else cha
+		self.cha = cha if isinstance(cha, str) else cha[0]
+
+		if self.cha in str(rs.chns):
+			self._find_chn()
+		else:
+			printE('Could not find channel %s in list of channels! Please correct and restart.' % self.cha, self.sender)
+			sys.exit(2)
+
+
+	def _set_filt(self, bp):
+		'''
+		Sets the filter applied to both the templates and the live data.
+
+		:param bp: bandpass filter parameters. if set, should be in the format ``[highpass, lowpass]``
+		:type bp: :py:class:`bool` or :py:class:`list`
+		'''
+		self.filter = None
+		if bp:
+			if (bp[0] <= 0) and (bp[1] >= (self.sps/2)):
+				return
+			elif (bp[0] > 0) and (bp[1] >= (self.sps/2)):
+				kind = 'highpass'
+			elif (bp[0] <= 0) and (bp[1] <= (self.sps/2)):
+				kind = 'lowpass'
+			else:
+				kind = 'bandpass'
+			self.filter = helpers.StreamingFilter(kind, freqmin=bp[0], freqmax=bp[1])
+
+
+	def _cut(self, x):
+		'''
+		Cuts a filtered template to ``duration`` seconds around its largest amplitude.
+
+		:param numpy.ndarray x: the filtered template
+		:rtype: numpy.ndarray
+		'''
+		n = int(round(self.duration * self.sps))
+		if len(x) <= n:
+			return x
+		start = min(max(int(np.argmax(np.abs(x))) - n // 4, 0), len(x) - n)
+		return x[start:start + n]
+
+
+	def _load(self, templates):
+		'''
+		Reads, filters, and normalizes the templates.
+
+		:param str templates: directory of miniSEED template files
+		'''
+		tdir = os.path.abspath(os.path.expanduser(templates))
+		files = sorted(os.listdir(tdir)) if os.path.isdir(tdir) else []
+		self.names, tpl = [], []
+		for f in files:
+			try:
+				st = rs.read(os.path.join(tdir, f), format='MSEED')
+			except Exception as e:
+				printW('Could not read %s as miniSEED: %s' % (f, e), self.sender)
+				continue
+			for tr in st.select(channel=self.cha):
+				if tr.stats.sampling_rate != self.sps:
+					printW('Resampling template %s from %s to %s Hz' % (f, tr.stats.sampling_rate, self.sps),
+						   self.sender)
+					tr.resample(self.sps)
+				x = tr.data.astype(np.float64)
+				x = x - x.mean()
+				if self.filter:
+					x = self.filter.apply(x, self.sps)
+				x = self._cut(x)
+				x = x - x.mean()
+				norm = np.sqrt((x * x).sum())
+				if len(x) < 2 or norm == 0:
+					printW('Template %s is empty, skipping' % (f), self.sender)
+					continue
+				self.names.append('%s (%s)' % (f, tr.stats.starttime.strftime('%Y-%m-%d %H:%M:%S')))
+				tpl.append(x / norm)
+
+		if not tpl:
+			printE('No %s templates found in %s. Please correct and restart.' % (self.cha, tdir), self.sender)
+			sys.exit(2)
+
+		self.lengths = np.array([len(x) for x in tpl])
+		self.length = int(self.lengths.max())
+		# templates end together, so that every window ends at the same sample
+		self.templates = np.zeros((len(tpl), self.length))
+		for i, x in enumerate(tpl):
+			self.templates[i, self.length - len(x):] = x
+		printM('Loaded %s templates from %s (longest %.1f seconds)'
+			   % (len(tpl), tdir, self.length / self.sps), self.sender)
+
+
+	def _spectra(self, nfft):
+		'''
+		Returns the conjugate template spectra for a transform length,
+		calculating them the first time.
+
+		:param int nfft: transform length
+		:rtype: numpy.ndarray
+		'''
+		if nfft not in self.spectra:
+			self.spectra[nfft] = np.conj(np.fft.rfft(self.templates, nfft, axis=-1))
+		return self.spectra[nfft]
+
+
+	def _restart(self):
+		'''
+		Forgets all samples, as if starting again. Used at startup and
+		when the data does not follow on from the last samples (after a long gap, for example).
+		'''
+		self.tail = np.zeros(self.length - 1)	# the last samples, for overlap-save
+		self.count = 0							# samples correlated since the restart
+		self._mark = None
+		self._pending = np.zeros(0)
+		if self.filter:
+			self.filter.reset()
+
+
+	def _getq(self):
+		"""
+		Reads data from the queue and updates the stream.
+
+		:rtype: bool
+		:return: Returns ``True`` if stream is updated, otherwise ``False``.
+		"""
+		d = self.queue.get(True, timeout=None)
+		self.queue.task_done()
+		return self._update(d)
+
+
+	def _update(self, d):
+		'''
+		Updates the stream with a queue item.
+
+		:param d: the data packet or message
+		:rtype: bool
+		:return: Returns ``True`` if stream is updated, otherwise ``False``.
+		'''
+		if rs.getCHN(d) == self.cha:
+			self.ring.append(d)
+			return True
+		elif helpers.msg_type(d) == 'TERM':
+			self.alive = False
+			printM('Exiting.', self.sender)
+			sys.exit()
+		else:
+			return False
+
+
+	def _stream(self):
+		'''
+		Filters the samples that have arrived since the last call into
+		:py:data:`self._pending`, restarting if they do not follow on.
+		'''
+		if self.cha not in self.ring.rings:
+			return
+		x, mark, contiguous = self.ring.since(self.cha, self._mark)
+		if not contiguous:
+			self._restart()
+			x, mark, contiguous = self.ring.since(self.cha)
+		self._mark = mark
+		if len(x):
+			y = self.filter.filter(self.cha, x, self.sps) if self.filter else np.asarray(x, dtype=np.float64)
+			self._pending = np.concatenate([self._pending, y])
+
+
+	def _correlate(self, x):
+		'''
+		Correlates a block of filtered samples with every template.
+
+		:param numpy.ndarray x: the new samples
+		:rtype: numpy.ndarray
+		:return: correlation coefficients with shape ``(templates, len(x))``, for the windows ending at each new sample
+		'''
+		n = len(x)
+		seg = np.concatenate([self.tail, x])
+		nfft = 1 << int(np.ceil(np.log2(len(seg))))
+		num = np.fft.irfft(np.fft.rfft(seg, nfft) * self._spectra(nfft), nfft, axis=-1)[:, :n]
+		self.tail = seg[n:]
+
+		# energy of the data in each template's window
+		cs1 = np.concatenate([[0.], np.cumsum(seg)])
+		cs2 = np.concatenate([[0.], np.cumsum(seg * seg)])
+		end = np.arange(n) + self.length
+		cc = np.zeros_like(num)
+		for length in np.unique(self.lengths):
+			rows = self.lengths == length
+			s1 = cs1[end] - cs1[end - length]
+			var = (cs2[end] - cs2[end - length]) - s1 * s1 / length
+			den = np.sqrt(np.maximum(var, 0.))
+			ok = den > 1e-9 * np.sqrt(length)
+			cc[np.ix_(rows, ok)] = num[np.ix_(rows, ok)] / den[ok]
+
+		# windows that start before the restart are not real
+		full = np.arange(self.count + 1, self.count + n + 1) >= self.length
+		self.count += n
+		return cc * full
+
+
+	def _is_trigger(self, cc):
+		'''
+		Raises or resets the alarm.
+
+		:param numpy.ndarray cc: correlation coefficients from :py:func:`_correlate`
+		'''
+		n = cc.shape[-1]
+		best = cc.max(axis=0)
+		self.best = float(best.max())
+		above = np.flatnonzero(best >= self.threshold)
+		end = self.ring.endtime(self.cha) - len(self._pending) / self.sps	# time of the last sample of cc
+
+		if len(above) and not self.exceed:
+			i = above[0]
+			j = int(np.argmax(cc[:, i]))
+			alarm = helpers.fsec(end - (n - 1 - i) / self.sps)
+			self.raise_alarm(alarm)
+			self.exceed = True
+			print()
+			printM('Template %s matched with correlation %.3f at %s'
+				   % (self.names[j], cc[j, i], alarm.strftime('%Y-%m-%d %H:%M:%S.%f')[:22]), self.sender)
+			printM('Trigger will reset after %.1f seconds below %s...'
+				   % (self.length / self.sps, self.threshold), sender=self.sender)
+			COLOR['current'] = COLOR['purple']
+			if self.testing:
+				TEST['c_match'][1] = True
+
+		if self.exceed:
+			self.maxcc = max(self.maxcc, self.best)
+			self.below = (n - 1 - above[-1]) if len(above) else self.below + n
+			if self.below >= self.length:
+				alarm_reset = helpers.fsec(end)
+				self.raise_reset(alarm_reset)
+				self.exceed = False
+				print()
+				printM('Max correlation reached in alarm state: %s' % (round(self.maxcc, 3)), self.sender)
+				printM('Match trigger reset and active again at %s' % (
+					   alarm_reset.strftime('%Y-%m-%d %H:%M:%S.%f')[:22]), self.sender)
+				self.maxcc = 0.
+				COLOR['current'] = COLOR['green']
+
+
+	def _print_match(self):
+		'''
+		Prints the best correlation of the last block.
+		'''
+		if not self.quiet:
+			msg = '\r%s [%s] Threshold: %s; Best correlation: %.4f' % (
+				   (self.ring.endtime(self.cha) - len(self._pending) / self.sps).strftime('%Y-%m-%d %H:%M:%S'),
+				   self.sender, self.threshold, self.best)
+			print(COLOR['current'] + COLOR['bold'] + msg + COLOR['white'], end='', flush=True)
+
+
+	def run(self):
+		"""
+		Reads data from the queue and matches it against the templates
+		at least every second of data. Quits if it sees a ``TERM`` message.
+		"""
+		printM('Starting template matching on %s channel %s with %s templates and threshold=%s'
+			   % (self.stn, self.cha, len(self.names), self.threshold), self.sender)
+		while True:
+			updated = False
+			for d in self.get_batch():
+				updated = self._update(d) or updated
+			if updated:
+				self._stream()
+				if len(self._pending) >= self.step:
+					x, self._pending = self._pending, np.zeros(0)
+					self._is_trigger(self._correlate(x))
+					self._print_match()
+			sys.stdout.flush()
@@ -8,6 +8,7 @@ import rsudp.raspberryshake as rs
 from rsudp import printM, printW, printE, get_scap_dir, helpers
 from rsudp.test import TEST
 import linecache
+from queue import Empty
 sender = 'plot.py'
 QT = False
 QtGui = False
@@ -147,6 +148,7 @@ class Plot:
 		self.totchns = rs.numchns
 
 		self.seconds = seconds
+		self.ring = rs.RingStream(seconds=self.seconds, fill_value='latest')
 		self.pkts_in_period = rs.tr * rs.numchns * self.seconds	# theoretical number of packets received in self.seconds
 		self.spectrogram = spectrogram
 
@@ -176,28 +178,50 @@ class Plot:
 
 	def deconvolve(self):
 		'''
-		Send the streams to the central library deconvolve function.
+		Copy the buffered data to a stream and send it to the central library deconvolve function.
 		'''
+		self.raw = self.ring.to_stream()
 		helpers.deconvolve(self)
 
-	def getq(self):
+	def getq(self, timeout=None):
 		'''
 		Get data from the queue and test for whether it has certain strings.
 		ALARM and TERM both trigger specific behavior.
 		ALARM messages cause the event counter to increment, and if
 		:py:data:`screencap==True` then aplot image will be saved when the
 		event is :py:data:`self.save_pct` of the way across the plot.
+
+		.. versionadded:: 1.1.2
+
+			``timeout`` limits how long to wait for data.
+
+		:param float timeout: seconds to wait for data (``None`` waits forever, ``0`` does not wait)
+		:rtype: bool or None
+		:return: ``True`` if the data was for a plotted channel, ``None`` if there was nothing to read before the timeout, otherwise ``False``
 		'''
-		d = self.queue.get()
+		try:
+			d = self.queue.get(True, timeout)
+		except Empty:
+			return None
 		self.queue.task_done()
-		if 'TERM' in str(d):
+		return self._update(d)
+
+	def _update(self, d):
+		'''
+		Acts on a queue item as described in :py:func:`getq`.
+
+		:param d: the data packet or message
+		:rtype: bool
+		:return: ``True`` if the data was for a plotted channel, otherwise ``False``
+		'''
+		if helpers.msg_type(d) == 'TERM':
 			plt.close()
 			if 'SELF' in str(d):
 				printM('Plot has been closed, plot thread will exit.', self.sender)
 			self.alive = False
 			rs.producer = False
 
-		elif 'ALARM' in str(d):
+		elif helpers.msg_type(d) == 'ALARM':
 			self.events += 1		# add event to count
 			self.save_timer -= 1	# don't push the save time forward if there are a large number of alarm events
 			event = [self.save_timer + int(self.save_pct*self.pkts_in_period),
@@ -213,8 +237,7 @@ class Plot:
 			self.fig.canvas.set_window_title('(%s) %s.%s - Raspberry Shake Monitor' % (self.events, self.net, self.stn))
 
 		if rs.getCHN(d) in self.chans:
-			self.raw = rs.update_stream(
-				stream=self.raw, d=d, fill_value='latest')
+			self.ring.append(d)
 			return True
 		else:
 			return False
@@ -632,7 +655,6 @@ class Plot:
 		the number of channels times the data packet arrival rate in Hz.
 		This has the effect of making the plot update once per second.
 		'''
-		obstart = self.stream[0].stats.endtime - timedelta(seconds=self.seconds)	# obspy time
 # AstroTaka -----------------
 		'''
 		start = np.datetime64(self.stream[0].stats.endtime
@@ -643,8 +665,6 @@ class Plot:
 							  )-np.timedelta64(self.seconds, 's')	# numpy time
 		end = np.datetime64(self.stream[0].stats.endtime+(3600*9))	# numpy time
 # ---------------------------
-		self.raw = self.raw.slice(starttime=obstart)	# slice the stream to the specified length (seconds variable)
-		self.stream = self.stream.slice(starttime=obstart)	# slice the stream to the specified length (seconds variable)
 		i = 0
 		for i in range(self.num_chans):	# for each channel, update the plots
 			mean = int(round(np.mean(self.stream[i].data)))
@@ -682,8 +702,6 @@ class Plot:
 			i = 0
 		else:
 			i += 1
-		self.stream = rs.copy(self.stream)	# essential, otherwise the stream has a memory leak
-		self.raw = rs.copy(self.raw)		# and could eventually crash the machine
 		self.deconvolve()
 		self.update_plot()
 		if u >= 0:				# avoiding a matplotlib broadcast error
@@ -694,7 +712,6 @@ class Plot:
 			if (self.save_timer > self.save[0][0]):
 				self._eventsave()
 		u = 0
-		time.sleep(0.005)		# wait a ms to see if another packet will arrive
 		sys.stdout.flush()
 		return i, u
 
@@ -715,10 +732,17 @@ class Plot:
 		"""
 		The heart of the plotting routine.
 
-		Begins by updating the queue to populate a :py:class:`obspy.core.stream.Stream` object, then setting up the main plot.
+		Begins by updating the queue to populate a :py:class:`rsudp.raspberryshake.RingStream` object, then setting up the main plot.
 		The first time through the main loop, the plot is not drawn. After that, the plot is drawn every time all channels are updated.
 		Any plots containing a spectrogram and more than 1 channel are drawn at most every second (1000 ms).
 		All other plots are drawn at most every quarter second (250 ms).
+
+		.. versionadded:: 1.1.2
+
+			The loop waits on the queue until either data arrives or the next
+			redraw is due, then reads everything that has arrived before drawing,
+			rather than sleeping between reads. A burst of data is therefore read as
+			fast as it arrives, and nothing wakes the loop while no data is arriving.
 		"""
 		self.getq() # block until data is flowing from the consumer
 		for i in range((self.totchns)*2): # fill up a stream object
@@ -727,27 +751,26 @@ class Plot:
 		self.deconvolve()
 		self.setup_plot()
 
-		n = 0	# number of iterations without plotting
 		i = 0	# number of plot events without clearing the linecache
 		u = -1	# number of blocked queue calls (must be -1 at startup)
+		interval = self.delay / rs.tr	# seconds between redraws
+		redraw = time.time() + interval
+		n = 0	# number of queue items read since the last redraw
 		while True: # main loop
-			while True: # sub loop
-				if self.alive == False:	# break if the user has closed the plot
-					break
+			# wait for data until the next redraw is due; after that, read without waiting,
+			# unless nothing has arrived to draw
+			batch = rs.get_batch(self.queue, timeout=max(redraw - time.time(), 0) if n else None)
+			for d in batch:
 				n += 1
 				self.save_timer += 1
-				if self.queue.qsize() > 0:
-					self.getq()
-					time.sleep(0.009)		# wait a ms to see if another packet will arrive
-				else:
-					u = self.qu(u)
-					if n > (self.delay * rs.numchns):
-						n = 0
-						break
+				u += 1 if self._update(d) else 0
 			if self.alive == False:	# break if the user has closed the plot
 				printM('Exiting.', self.sender)
 				break
-			i, u = self.mainloop(i, u)
-			if self.testing:
-				TEST['c_plot'][1] = True
+			if (not batch) and (time.time() >= redraw):	# everything that arrived has been read
+				i, u = self.mainloop(i, u)
+				redraw = time.time() + interval
+				n = 0
+				if self.testing:
+					TEST['c_plot'][1] = True
 		return
@@ -1,6 +1,6 @@
 import sys
 from rsudp.raspberryshake import ConsumerThread
-from rsudp import printM, printW, printE
+from rsudp import printM, printW, printE, helpers
 from rsudp.test import TEST
 
 
@@ -41,11 +41,11 @@ class PrintRaw(ConsumerThread):
 		while True:
 			d = self.queue.get()
 			self.queue.task_done()
-			if 'TERM' in str(d):
+			if helpers.msg_type(d) == 'TERM':
 				self.alive = False
 				printM('Exiting.', self.sender)
 				sys.exit()
-			elif 'ALARM' in str(d):
+			elif helpers.msg_type(d) == 'ALARM':
 				pass
 			else:
 				if not self.testing:
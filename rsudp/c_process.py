@@ -0,0 +1,266 @@
+import sys
+import signal
+import struct
+from queue import Empty
+from rsudp import printM, printE, helpers
+import rsudp.raspberryshake as rs
+from rsudp.c_consumer import Subscriber
+from rsudp.test import TEST
+
+try:	# shared memory needs python 3.8, and handing a consumer to its worker needs fork
+	import multiprocessing as mp
+	from multiprocessing import shared_memory
+	CTX = mp.get_context('fork')
+	SHM = True
+except (ImportError, ValueError):
+	SHM = False
+
+
+class SharedRing(Subscriber):
+	'''
+	.. versionadded:: 1.1.2
+
+	A queue that passes data to a sub-consumer running in another process
+	(see :py:class:`rsudp.c_process.ProcessConsumer`).
+	The :py:class:`rsudp.c_consumer.Consumer` puts items on it like on any other
+	destination. Data packets are copied into a ring of fixed-size slots in
+	shared memory, while messages (``ALARM``, ``RESET``, ``IMGPATH``, ``TERM``...)
+	are sent through a pipe and are read before any waiting data, as in a
+	:py:class:`rsudp.c_consumer.DualLaneQueue`.
+	The worker reads the ring through a :py:class:`rsudp.c_process.SharedRingReader`.
+
+	Only the ``'block'`` policy (see :py:class:`rsudp.c_consumer.PolicyQueue`) waits
+	for the worker when the ring is full. Any other policy throws away the incoming packet.
+
+	Only available if :py:data:`rsudp.c_process.SHM` is ``True``.
+
+	:param int size: number of data packets the ring holds
+	:param int slot: maximum size in bytes of a data packet
+	:param str policy: what to do when the ring is full
+	:param str name: name to use when reporting dropped packets
+	'''
+	COUNTS = struct.Struct('QQQ')	# data packets written, data packets read, messages sent
+	LENGTH = struct.Struct('I')
+
+	def __init__(self, size=rs.qsize, slot=4096, policy='block', name=''):
+		self.size = int(size)
+		self.slot = int(slot)
+		self.policy = policy
+		self.name = name
+		self.dropped = 0			# data packets thrown away because the ring was full
+		self.closed = False			# set when the worker has exited
+		self.shm = shared_memory.SharedMemory(create=True,
+						size=self.COUNTS.size + self.size * self.slot)
+		self.shm.buf[:self.COUNTS.size] = bytes(self.COUNTS.size)
+		self.items = CTX.Semaphore(0)			# data packets and messages waiting
+		self.space = CTX.Semaphore(self.size)	# free slots
+		self.msg_out, self.msg_in = CTX.Pipe(duplex=False)
+		self.written = 0
+		self.sent = 0
+
+	def _offset(self, n):
+		return self.COUNTS.size + (n % self.size) * self.slot
+
+	def counts(self):
+		'''
+		:rtype: tuple
+		:return: the numbers of data packets written and read, and of messages sent
+		'''
+		return self.COUNTS.unpack_from(self.shm.buf, 0)
+
+	def put(self, item, block=True, timeout=None):
+		'''
+		Puts a data packet in the ring, or sends a message through the pipe.
+		Only one thread may call this.
+
+		:param item: the data packet or message to pass on
+		'''
+		if self.closed:
+			return
+		data = bytes(item)
+		if helpers.msg_type(item) != 'DATA':
+			self.msg_in.send_bytes(data)
+			self.sent += 1
+			struct.pack_into('Q', self.shm.buf, 16, self.sent)
+			self.items.release()
+			return
+		if len(data) > self.slot - self.LENGTH.size:
+			self.dropped += 1
+			return
+		if self.policy == 'block':
+			while not self.space.acquire(True, 0.5):
+				if self.closed:		# nobody is reading any more
+					return
+		elif not self.space.acquire(False):
+			self.dropped += 1
+			return
+		off = self._offset(self.written)
+		self.LENGTH.pack_into(self.shm.buf, off, len(data))
+		self.shm.buf[off + self.LENGTH.size:off + self.LENGTH.size + len(data)] = data
+		self.written += 1
+		struct.pack_into('Q', self.shm.buf, 0, self.written)
+		self.items.release()
+
+
+class SharedRingReader(object):
+	'''
+	.. versionadded:: 1.1.2
+
+	The worker process's end of a :py:class:`rsudp.c_process.SharedRing`,
+	with the parts of the :py:class:`queue.Queue` interface that sub-consumers use.
+	Items are returned as bytes.
+
+	:param rsudp.c_process.SharedRing ring: the ring to read
+	'''
+	def __init__(self, ring):
+		self.ring = ring
+		self.cursor = 0		# data packets read
+		self.got = 0		# messages read
+
+	def qsize(self):
+		written, read, sent = self.ring.counts()
+		return (written - self.cursor) + (sent - self.got)
+
+	def empty(self):
+		return self.qsize() <= 0
+
+	def get(self, block=True, timeout=None):
+		'''
+		Reads the next message, or if there is none, the next data packet.
+
+		:param bool block: whether to wait for an item if there is none
+		:param float timeout: seconds to wait (``None`` waits forever)
+		:raise queue.Empty: if there is nothing to read
+		'''
+		r = self.ring
+		if not r.items.acquire(block, timeout):
+			raise Empty
+		if r.counts()[2] > self.got:
+			self.got += 1
+			return r.msg_out.recv_bytes()
+		off = r._offset(self.cursor)
+		n = r.LENGTH.unpack_from(r.shm.buf, off)[0]
+		item = bytes(r.shm.buf[off + r.LENGTH.size:off + r.LENGTH.size + n])
+		self.cursor += 1
+		struct.pack_into('Q', r.shm.buf, 8, self.cursor)
+		r.space.release()
+		return item
+
+	def get_nowait(self):
+		return self.get(False)
+
+	def task_done(self):
+		pass
+
+
+def _work(consumer, ring, events):
+	'''
+	Runs a sub-consumer in its worker process, reading from ``ring``
+	and sending its alarms, resets, and exit back through ``events``,
+	followed by its test results and (for :py:class:`rsudp.c_write.Write`) the files it wrote.
+	'''
+	signal.signal(signal.SIGINT, signal.SIG_IGN)	# the main process shuts workers down
+	consumer.queue = SharedRingReader(ring)
+	consumer.connect(lambda t, e, v: events.send((e, v)))
+	try:
+		consumer.run()
+	except SystemExit:
+		pass
+	finally:
+		# test results are set in this process's copy of the test dictionary
+		events.send(('TEST', [t for t in TEST if TEST[t][1]]))
+		if hasattr(consumer, 'outfiles'):
+			events.send(('OUTFILES', list(consumer.outfiles)))
+		events.close()
+
+
+class ProcessConsumer(rs.ConsumerThread):
+	'''
+	.. versionadded:: 1.1.2
+
+	Runs a sub-consumer in a worker process of its own, so that CPU-heavy modules
+	(STA/LTA, RSAM, miniSEED compression...) are not limited by Python's global
+	interpreter lock. The sub-consumer is set up as usual, then handed to this class,
+	which takes its place in the list of threads. :py:func:`start_worker` forks a worker
+	process that runs the sub-consumer, which reads its data from ``ring``
+	(in place of its queue). When started, this thread stays in the main process and passes the
+	worker's alarms, resets, published messages, and exit on to the :py:class:`rsudp.p_producer.Producer`.
+
+	A process forked while other threads are running gets copies of the locks those
+	threads hold (the lock on standard output, for example), which nothing in the worker
+	will ever release. So :py:func:`start_worker` should be called from the main thread
+	before any other thread is started, as :py:func:`rsudp.client.start_workers` does.
+	If it has not been called, :py:func:`run` calls it.
+
+	The worker is forked from the main process, so it has a copy of everything
+	the sub-consumer had when it was set up, such as the station's inventory.
+	Changes the worker makes to its own copies are not seen by the main process,
+	except for test results and the list of files a :py:class:`rsudp.c_write.Write`
+	wrote (``outfiles``), which are sent back when the worker exits.
+
+	.. code-block:: python
+
+		>>> ring = SharedRing(name='alert')
+		>>> alrt = Alert(q=ring, cha='EHZ', sta=6, lta=30, thresh=3.5, reset=2)
+		>>> proc = ProcessConsumer(alrt, ring)
+		>>> cons = Consumer(queue, [ring])
+
+	Only available if :py:data:`rsudp.c_process.SHM` is ``True``
+	(Python 3.8 or newer, on a system that can fork).
+
+	:param rsudp.raspberryshake.ConsumerThread consumer: the sub-consumer to run in a worker
+	:param rsudp.c_process.SharedRing ring: the ring the master consumer passes the sub-consumer's data to
+	'''
+	def __init__(self, consumer, ring):
+		super().__init__()
+		self.sender = consumer.sender
+		self.consumer = consumer
+		self.ring = ring
+		self.daemon = True
+		self.events, self.worker_events = CTX.Pipe(duplex=False)
+		self.proc = CTX.Process(target=_work, args=(consumer, ring, self.worker_events),
+								daemon=True)
+
+	def start_worker(self):
+		'''
+		Forks the worker process, unless it has already been started.
+		'''
+		if self.proc.pid is not None:
+			return
+		self.consumer.sender = self.sender
+		sys.stdout.flush()			# so buffered output is not written twice
+		sys.stderr.flush()
+		self.proc.start()
+		self.worker_events.close()	# so that recv() notices when the worker exits
+		self.ring.shm.unlink()		# the worker has the memory mapped; remove the name now so it cannot leak
+		printM('Started worker process %s.' % (self.proc.pid), self.sender)
+
+	def run(self):
+		'''
+		Starts the worker if it has not been started yet, then relays its events until it exits.
+		'''
+		self.start_worker()
+		while True:
+			try:
+				event, value = self.events.recv()
+			except EOFError:
+				break
+			if event == 'ALARM':
+				self.raise_alarm(value)
+			elif event == 'RESET':
+				self.raise_reset(value)
+			elif event == 'MSG':
+				self.publish(value)
+			elif event == 'TEST':
+				for t in value:
+					TEST[t][1] = True
+			elif event == 'OUTFILES':
+				self.consumer.outfiles = value	# so the main process's copy knows what was written
+			elif event == 'DEAD':
+				self.mark_dead()
+		self.proc.join()
+		self.ring.closed = True
+		if self.proc.exitcode:
+			printE('Worker process exited with code %s.' % (self.proc.exitcode), self.sender)
+		if self.alive:
+			self.mark_dead()
@@ -44,6 +44,7 @@ class RSAM(rs.ConsumerThread):
 		self.testing = testing
 		self.quiet = quiet	# suppresses printing of transmission stats
 		self.stn = rs.stn
+		self.tf = rs.tf
 		self.fwaddr = fwaddr
 		self.fwport = fwport
 		self.fwformat = fwformat.upper()
@@ -52,8 +53,10 @@ class RSAM(rs.ConsumerThread):
 		self.default_ch = 'HZ'
 		self.args = args
 		self.kwargs = kwargs
+		self.ring = rs.RingStream(seconds=interval, fill_value='latest')
 		self.raw = rs.Stream()
 		self.stream = rs.Stream()
+		self.data = []
 		self.units = 'counts'
 
 		self._set_deconv(deconv)
@@ -139,10 +142,10 @@ class RSAM(rs.ConsumerThread):
 		"""
 		d = self.queue.get(True, timeout=None)
 		self.queue.task_done()
-		if self.cha in str(d):
-			self.raw = rs.update_stream(stream=self.raw, d=d, fill_value='latest')
+		if rs.getCHN(d) == self.cha:
+			self.ring.append(d)
 			return True
-		elif 'TERM' in str(d):
+		elif helpers.msg_type(d) == 'TERM':
 			self.alive = False
 			printM('Exiting.', self.sender)
 			sys.exit()
@@ -158,6 +161,19 @@ class RSAM(rs.ConsumerThread):
 			helpers.deconvolve(self)
 
 
+	def _window(self):
+		"""
+		Gets the last :py:data:`interval` seconds of data from the ring buffer,
+		deconvolving it if necessary.
+		"""
+		if self.deconv:
+			self.raw = self.ring.to_stream(seconds=self.interval)
+			self._deconvolve()
+			self.data = self.stream[0].data
+		else:
+			self.data = self.ring.last(self.cha, self.interval)
+
+
 	def _subloop(self):
 		"""
 		Gets the queue and figures out whether or not the specified channel is in the packet.
@@ -174,7 +190,7 @@ class RSAM(rs.ConsumerThread):
 		"""
 		Run the RSAM analysis
 		"""
-		arr = [abs(el) for el in self.stream[0].data]
+		arr = [abs(el) for el in self.data]
 		meanv = statistics.mean(arr)
 		medianv = statistics.median(arr)
 		minv = min(arr)
@@ -188,8 +204,8 @@ class RSAM(rs.ConsumerThread):
 		"""
 		if not self.quiet:
 			msg = '%s Current RSAM: mean %s median %s min %s max %s' % (
-				(self.stream[0].stats.starttime + timedelta(seconds=
-															len(self.stream[0].data) * self.stream[0].stats.delta)).strftime('%Y-%m-%d %H:%M:%S'),
+				(self.ring.endtime(self.cha) + timedelta(seconds=
+														 1 / self.ring.sps)).strftime('%Y-%m-%d %H:%M:%S'),
 				self.rsam[0],
 				self.rsam[1],
 				self.rsam[2],
@@ -226,7 +242,7 @@ class RSAM(rs.ConsumerThread):
 		n = 0
 		next_int = time.time() + self.interval
 
-		wait_pkts = self.interval / (rs.tf / 1000)
+		wait_pkts = self.interval / (self.tf / 1000)
 
 		while n > 3:
 			self.getq()
@@ -236,20 +252,11 @@ class RSAM(rs.ConsumerThread):
 		while True:
 			self._subloop()
 
-			self.raw = rs.copy(self.raw)	# necessary to avoid memory leak
-			self.stream = self.raw.copy()
-			self._deconvolve()
-
 			if n > wait_pkts:
-				# if the trigger is activated
-				obstart = self.stream[0].stats.endtime - timedelta(seconds=self.interval)	# obspy time
-				self.raw = self.raw.slice(starttime=obstart)		# slice the stream to the specified length (seconds variable)
-				self.stream = self.stream.slice(starttime=obstart)	# slice the stream to the specified length (seconds variable)
-
 				# run rsam analysis
 				if time.time() > next_int:
+					self._window()
 					self._rsam()
-					self.stream = rs.copy(self.stream)  # prevent mem leak
 					self._forward_rsam()
 					self._print_rsam()
 					next_int = time.time() + self.interval
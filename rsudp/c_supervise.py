@@ -0,0 +1,147 @@
+import time
+from rsudp import printM, printW, printE, helpers
+import rsudp.raspberryshake as rs
+
+
+class Supervisor(rs.ConsumerThread):
+	'''
+	.. versionadded:: 1.1.2
+
+	Runs a sub-consumer and restarts it if it crashes, so that one failing
+	module (a notification module during a web service outage, for example)
+	does not shut down the rest of rsudp. The sub-consumer is set up as usual,
+	then handed to this class, which takes its place in the list of threads.
+
+	When the sub-consumer's ``run`` method raises an exception or exits with
+	an error code, this waits (see below) and then calls ``run`` again on the same
+	object, which keeps its queue and anything it had buffered. While waiting,
+	the sub-consumer's queue is emptied so that it does not hold up other modules,
+	and a ``TERM`` message ends the wait. The wait starts at ``backoff`` seconds
+	and doubles with each crash, up to ``max_backoff`` seconds. It goes back to
+	``backoff`` once the sub-consumer has run for ``stable`` seconds without crashing.
+
+	If the sub-consumer exits normally (after a ``TERM`` message), or crashes and
+	is ``critical``, this marks itself as stopped, which makes the Producer shut rsudp down,
+	as an unsupervised sub-consumer would.
+
+	The sub-consumer's alarms, resets, and published messages are passed on to the Producer.
+	Restarts are counted in :py:data:`restarts`, and data thrown away while
+	waiting in :py:data:`discarded`.
+
+	.. code-block:: python
+
+		>>> q = mk_q(name='tweets')
+		>>> tweet = Tweeter(q=q, ...)
+		>>> sup = Supervisor(tweet, critical=False)
+		>>> THREADS.append(sup)
+
+	:param rsudp.raspberryshake.ConsumerThread consumer: the sub-consumer to run
+	:param bool critical: whether a crash should shut rsudp down instead of restarting the sub-consumer
+	:param float backoff: seconds to wait before the first restart
+	:param float max_backoff: longest time to wait before a restart
+	:param float stable: seconds the sub-consumer must run for the wait to go back to ``backoff``
+	'''
+	def __init__(self, consumer, critical=False, backoff=1, max_backoff=60, stable=600):
+		super().__init__()
+		self.sender = consumer.sender
+		self.consumer = consumer
+		self.critical = critical
+		self.backoff = backoff
+		self.max_backoff = max_backoff
+		self.stable = stable
+		self.restarts = 0			# times the sub-consumer has been restarted
+		self.discarded = 0			# queue items thrown away while waiting to restart
+
+	@property
+	def queue(self):
+		'''
+		The sub-consumer's queue.
+		'''
+		return self.consumer.queue
+
+	@queue.setter
+	def queue(self, q):
+		self.consumer.queue = q
+
+	@property
+	def handle(self):
+		'''
+		The sub-consumer's ``handle`` method, if it has one
+		(see :py:class:`rsudp.raspberryshake.ConsumerThread`).
+		'''
+		return self.consumer.handle
+
+	@property
+	def handle_blocks(self):
+		return self.consumer.handle_blocks
+
+	def _relay(self, thread, event, value):
+		'''
+		Passes the sub-consumer's alarms, resets, and published messages on to the Producer.
+		Its exits are dealt with when its ``run`` method returns.
+		'''
+		if event == 'ALARM':
+			self.raise_alarm(value)
+		elif event == 'RESET':
+			self.raise_reset(value)
+		elif event == 'MSG':
+			self.publish(value)
+
+	def _run_once(self):
+		'''
+		Runs the sub-consumer until it exits.
+
+		:rtype: bool
+		:return: ``True`` if it exited normally, ``False`` if it crashed
+		'''
+		try:
+			self.consumer.run()
+		except SystemExit as e:
+			if e.code:
+				printE('Module exited with code %s.' % (e.code), self.sender)
+				return False
+		except Exception as e:
+			printE('Module crashed: %s: %s' % (type(e).__name__, e), self.sender)
+			return False
+		return True
+
+	def _wait(self, delay):
+		'''
+		Throws away the sub-consumer's queue items for ``delay`` seconds.
+
+		:param float delay: seconds to wait
+		:rtype: bool
+		:return: ``False`` if a ``TERM`` message arrived while waiting, otherwise ``True``
+		'''
+		end = time.time() + delay
+		while time.time() < end:
+			for d in rs.get_batch(self.queue, timeout=max(end - time.time(), 0)):
+				if helpers.msg_type(d) == 'TERM':
+					return False
+				self.discarded += 1
+		return True
+
+	def run(self):
+		'''
+		Runs the sub-consumer, restarting it after crashes until it exits normally.
+		'''
+		self.consumer.sender = self.sender
+		self.consumer.connect(self._relay)
+		crashes = 0		# crashes since the sub-consumer last ran for self.stable seconds
+		while True:
+			started = time.time()
+			if self._run_once():
+				break
+			if self.critical:
+				printE('This module is critical, shutting down.', self.sender)
+				break
+			crashes = 1 if (time.time() - started >= self.stable) else crashes + 1
+			delay = min(self.backoff * 2 ** (crashes - 1), self.max_backoff)
+			printW('Restarting module in %s seconds...' % (delay), self.sender)
+			if not self._wait(delay):
+				printM('Exiting.', self.sender)
+				break
+			self.restarts += 1
+			self.consumer.alive = True
+			printM('Restarting module (restart %s).' % (self.restarts), self.sender)
+		self.mark_dead()
@@ -95,24 +95,24 @@ class Testing(rs.ConsumerThread):
 
 		'''
 		global IMGPATH
-		if 'TERM' in str(d):
+		if helpers.msg_type(d) == 'TERM':
 			printM('Got TERM message...', sender=self.sender)
 			t.TEST['x_TERM'][1] = True
 			self.alive = False
 	
-		elif 'ALARM' in str(d):
+		elif helpers.msg_type(d) == 'ALARM':
 			printM('Got ALARM message with time %s' % (
 				   helpers.fsec(helpers.get_msg_time(d))
 				   ), sender=self.sender)
 			t.TEST['x_ALARM'][1] = True
 
-		elif 'RESET' in str(d):
+		elif helpers.msg_type(d) == 'RESET':
 			printM('Got RESET message with time %s' % (
 				   helpers.fsec(helpers.get_msg_time(d))
 				   ), sender=self.sender)
 			t.TEST['x_RESET'][1] = True
 
-		elif 'IMGPATH' in str(d):
+		elif helpers.msg_type(d) == 'IMGPATH':
 			printM('Got IMGPATH message with time %s' % (
 				   helpers.fsec(helpers.get_msg_time(d))
 				   ), sender=self.sender)
@@ -76,6 +76,7 @@ class Tweeter(rs.ConsumerThread):
 		self.testing = testing
 		self.fmt = '%Y-%m-%d %H:%M:%S.%f'
 		self.region = ' - region: %s' % rs.region.title() if rs.region else ''
+		self.station = rs.current_station()	# the inventory is read from this when tweeting, in case it is refreshed
 		self.consumer_key = consumer_key
 		self.consumer_secret = consumer_secret
 		self.access_token = access_token
@@ -110,7 +111,7 @@ class Tweeter(rs.ConsumerThread):
 		d = self.queue.get()
 		self.queue.task_done()
 
-		if 'TERM' in str(d):
+		if helpers.msg_type(d) == 'TERM':
 			self.alive = False
 			printM('Exiting.', self.sender)
 			sys.exit()
@@ -131,8 +132,8 @@ class Tweeter(rs.ConsumerThread):
 		try:
 			printM('Tweet: %s' % (message), sender=self.sender)
 			if not self.testing:
-				response = self.twitter.update_status(status=message, lat=rs.inv[0][0].latitude,
-														long=rs.inv[0][0].longitude,
+				response = self.twitter.update_status(status=message, lat=self.station.inv[0][0].latitude,
+														long=self.station.inv[0][0].longitude,
 														geo_enabled=True, display_coordinates=True)
 														# location will only stick to tweets on accounts that have location enabled in Settings
 				url = 'https://twitter.com/%s/status/%s' % (response['user']['screen_name'], response['id_str'])
@@ -148,8 +149,8 @@ class Tweeter(rs.ConsumerThread):
 				printM('Tweet: %s' % (message), sender=self.sender)
 				if not self.testing:
 					self.auth()
-					response = self.twitter.update_status(status=message, lat=rs.inv[0][0].latitude,
-															long=rs.inv[0][0].longitude,
+					response = self.twitter.update_status(status=message, lat=self.station.inv[0][0].latitude,
+															long=self.station.inv[0][0].longitude,
 															geo_enabled=True, display_coordinates=True)
 															# location will only stick to tweets on accounts that have location enabled in Settings
 					url = 'https://twitter.com/%s/status/%s' % (response['user']['screen_name'], response['id_str'])
@@ -183,7 +184,7 @@ class Tweeter(rs.ConsumerThread):
 							time.sleep(5.1)
 							printM('Sending tweet...', sender=self.sender)
 							response = self.twitter.update_status(status=message, media_ids=response['media_id'],
-																	lat=rs.inv[0][0].latitude, long=rs.inv[0][0].longitude,
+																	lat=self.station.inv[0][0].latitude, long=self.station.inv[0][0].longitude,
 																	geo_enabled=True, display_coordinates=True)
 																	# location will only stick to tweets on accounts that have location enabled in Settings
 							url = 'https://twitter.com/%s/status/%s' % (response['user']['screen_name'], response['id_str'])
@@ -199,7 +200,7 @@ class Tweeter(rs.ConsumerThread):
 								time.sleep(5.1)
 								printM('Sending tweet...', sender=self.sender)
 								response = self.twitter.update_status(status=message, media_ids=response['media_id'],
-																		lat=rs.inv[0][0].latitude, long=rs.inv[0][0].longitude,
+																		lat=self.station.inv[0][0].latitude, long=self.station.inv[0][0].longitude,
 																		geo_enabled=True, display_coordinates=True)
 																		# location will only stick to tweets on accounts that have location enabled in Settings
 								url = 'https://twitter.com/%s/status/%s' % (response['user']['screen_name'], response['id_str'])
@@ -216,15 +217,25 @@ class Tweeter(rs.ConsumerThread):
 		
 		self.last_message = message
 
+	def handle(self, d):
+		'''
+		.. versionadded:: 1.1.2
+
+		Acts on one ``ALARM`` or ``IMGPATH`` message
+		(see :py:data:`rsudp.raspberryshake.ConsumerThread.handle`).
+
+		:param bytes d: the queue message
+		'''
+		if helpers.msg_type(d) == 'ALARM':
+			self._when_alarm(d)
+
+		elif helpers.msg_type(d) == 'IMGPATH':
+			self._when_img(d)
+
 	def run(self):
 		"""
 		Reads data from the queue and tweets a message if it sees an ALARM or IMGPATH message
 		"""
 		while True:
 			d = self.getq()
-
-			if 'ALARM' in str(d):
-				self._when_alarm(d)
-
-			elif 'IMGPATH' in str(d):
-				self._when_img(d)
+			self.handle(d)
@@ -1,5 +1,6 @@
 import sys, os
 import time
+from queue import Empty
 from datetime import timedelta
 from obspy import UTCDateTime
 import rsudp.raspberryshake as rs
@@ -29,7 +30,8 @@ class Write(rs.ConsumerThread):
 
 		self.queue = q
 
-		self.stream = rs.Stream()
+		self.ring = rs.RingStream(seconds=120, fill_value=None)	# roughly ten times the write interval
+		self.written = None		# everything before this time is on disk
 		self.outdir = os.path.join(data_dir, 'data')
 		self.outfiles = []
 
@@ -39,30 +41,51 @@ class Write(rs.ConsumerThread):
 		printM('Writing channels: %s' % self.chans, self.sender)
 		self.numchns = rs.numchns
 		self.stime = 1/rs.sps
-		self.inv = rs.inv
+		self.tf = rs.tf
+		self.station = rs.current_station()
+		self.inv = False		# the inventory last written to the output directory
+		self.net = rs.net
+		self.stn = rs.stn
 
 		printM('Starting.', self.sender)
 
 
-	def getq(self):
+	def getq(self, timeout=None):
 		'''
 		Reads data from the queue and updates the stream.
 
+		.. versionadded:: 1.1.2
+
+			``timeout`` limits how long to wait for data.
+
+		:param float timeout: seconds to wait for data (``None`` waits forever)
 		:rtype: bool
 		:return: Returns ``True`` if stream is updated, otherwise ``False``.
 		'''
-		d = self.queue.get(True, timeout=None)
+		try:
+			d = self.queue.get(True, timeout=timeout)
+		except Empty:
+			return False
 		self.queue.task_done()
-		if 'TERM' in str(d):
+		return self._update(d)
+
+	def _update(self, d):
+		'''
+		Updates the stream with a queue item, or exits if it is a ``TERM`` message.
+
+		:param d: the data packet or message
+		:rtype: bool
+		:return: Returns ``True`` if stream is updated, otherwise ``False``.
+		'''
+		if helpers.msg_type(d) == 'TERM':
 			self.alive = False
 			printM('Exiting.', self.sender)
 			sys.exit()
-		elif str(d.decode('UTF-8')).split(' ')[0] in ['ALARM', 'RESET', 'IMGPATH']:
+		elif helpers.msg_type(d) in ['ALARM', 'RESET', 'IMGPATH']:
 			pass
 		else:
 			if rs.getCHN(d) in self.chans:
-				self.stream = rs.update_stream(
-					stream=self.stream, d=d, fill_value=None)
+				self.ring.append(d)
 				return True
 			else:
 				return False
@@ -71,7 +94,7 @@ class Write(rs.ConsumerThread):
 		'''
 		Sets samples per second.
 		'''
-		self.sps = self.stream[0].stats.sampling_rate
+		self.sps = self.ring.sps
 
 	def elapse(self, new=False):
 		'''
@@ -91,9 +114,9 @@ class Write(rs.ConsumerThread):
 
 	def slicestream(self):
 		'''
-		Causes the stream to slice down to the time the last write operation was made.
+		Marks everything up to the time of the last write operation as written.
 		'''
-		self.stream.slice(starttime=self.last)
+		self.written = self.last
 
 	def _tracewrite(self, t):
 		'''
@@ -131,21 +154,43 @@ class Write(rs.ConsumerThread):
 		or a new UTC day has just started, then this function writes to a new file).
 
 		:type stream: obspy.core.stream.Stream or bool
-		:param stream: The stream segment to write. If ``False``, the program has just started.
+		:param stream: The stream segment to write. If ``False``, everything up to five seconds before the most recent sample is written.
 		'''
-		if not stream:
-			self.last = self.stream[0].stats.endtime - timedelta(seconds=5)
-			stream = self.stream.copy().slice(
-						endtime=self.last, nearest_sample=False)
+		if stream is False:
+			self.last = self.ring.endtime(self.ring.channels[0]) - timedelta(seconds=5)
+			stream = self.ring.to_stream(starttime=self.written, endtime=self.last)
 
 		for t in stream:
 			self._tracewrite(t)
 		if self.testing:
 			TEST['c_write'][1] = True
 
+	def write_inv(self):
+		'''
+		.. versionadded:: 1.1.2
+
+		Writes the station's inventory to the output directory, if there is one
+		and it is not the one written last time (for example, after it was
+		refreshed in the background, see :py:func:`rsudp.raspberryshake.Station.refresh_inventory`).
+		'''
+		inv = self.station.inv
+		if inv and (inv is not self.inv):
+			printM('Writing inventory file: %s/%s.%s.00.xml' % (self.outdir,
+					self.net, self.stn), self.sender)
+			inv.write('%s/%s.%s.00.xml' % (self.outdir,
+					self.net, self.stn),
+					format='STATIONXML')
+		self.inv = inv
+
 	def run(self):
 		"""
 		Reads packets and coordinates write operations.
+
+		.. versionadded:: 1.1.2
+
+			Data is written every ten seconds. Between writes, the loop waits on the
+			queue until either data arrives or the next write is due, rather than
+			sleeping between reads, so a burst of data is read as fast as it arrives.
 		"""
 		self.elapse()
 
@@ -153,43 +198,29 @@ class Write(rs.ConsumerThread):
 		self.set_sps()
 		self.getq()
 		printM('miniSEED output directory: %s' % (self.outdir), self.sender)
-		if self.inv:
-			printM('Writing inventory file: %s/%s.%s.00.xml' % (self.outdir,
-					self.stream[0].stats.network,
-					self.stream[0].stats.station), self.sender)
-			self.inv.write('%s/%s.%s.00.xml' % (self.outdir,
-					self.stream[0].stats.network,
-					self.stream[0].stats.station),
-					format='STATIONXML')
+		self.write_inv()
 		printM('Beginning miniSEED output.', self.sender)
-		wait_pkts = (self.numchns * 10) / (rs.tf / 1000) 	# comes out to 10 seconds (tf is in ms)
+		interval = 10	# seconds between writes
+		flush = time.time() + interval
 
-		n = 0
+		n = 0	# packets since the last write
 		while True:
-			while True:
-				if self.queue.qsize() > 0:
-					self.getq()
-					time.sleep(0.01)		# wait a few ms to see if another packet will arrive
+			# wait for data until the next write is due, unless there is nothing to write
+			for d in self.get_batch(timeout=max(flush - time.time(), 0) if n else None):
+				if self._update(d):
 					n += 1
-				else:
-					self.getq()
-					n += 1
-					break
-			if n >= wait_pkts:
-				if self.newday < UTCDateTime.now(): # end of previous day and start of new day
-					self.write(self.stream.slice(
-								endtime=self.newday, nearest_sample=False))
-					self.stream = self.stream.slice(
-								starttime=self.newday, nearest_sample=False)
-					self.elapse(new=True)
-				else:
-					self.write()
-					self.stream = self.stream.slice(
-								starttime=self.last, nearest_sample=False)
-				self.stream = rs.copy(self.stream)
-				n = 0
-
-				self.getq()
-				time.sleep(0.01)		# wait a few ms to see if another packet will arrive
+			if (time.time() < flush) or (n == 0):
+				continue
+			if self.newday < UTCDateTime.now(): # end of previous day and start of new day
+				self.write(self.ring.to_stream(
+							starttime=self.written, endtime=self.newday))
+				self.written = self.newday	# the new day's file starts at the midnight just crossed
+				self.elapse(new=True)
+			else:
+				self.write()
+				self.slicestream()
+			self.write_inv()
+			n = 0
+			flush = time.time() + interval
 			sys.stdout.flush()
 			sys.stderr.flush()
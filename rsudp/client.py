@@ -5,14 +5,19 @@ import time
 import json
 import traceback
 from queue import Queue
+from copy import deepcopy
+from threading import Thread
 from rsudp import printM, printW, printE, default_loc, init_dirs, settings_loc, add_debug_handler, start_logging
 from rsudp import COLOR
 import rsudp.helpers as H
 import rsudp.test as T
 import rsudp.raspberryshake as rs
 from rsudp.packetize import packetize
-from rsudp.c_consumer import Consumer
-from rsudp.p_producer import Producer
+from rsudp.c_consumer import Consumer, BroadcastRing, BroadcastReader, PolicyQueue, DualLaneQueue
+from rsudp.c_process import ProcessConsumer, SharedRing, SHM
+from rsudp.c_supervise import Supervisor
+from rsudp.p_producer import Producer, MultiProducer
+from rsudp.p_asyncio import AsyncProducer
 from rsudp.c_printraw import PrintRaw
 from rsudp.c_write import Write
 from rsudp.c_plot import Plot, MPL
@@ -23,6 +28,8 @@ from rsudp.c_custom import Custom
 from rsudp.c_tweet import Tweeter
 from rsudp.c_telegram import Telegrammer
 from rsudp.c_rsam import RSAM
+from rsudp.c_intensity import Intensity
+from rsudp.c_match import Match
 from rsudp.c_testing import Testing
 from rsudp.t_testdata import TestData
 import pkg_resources as pr
@@ -39,6 +46,21 @@ WRITER = False
 SOUND = False
 TESTING = False
 TESTQUEUE = False
+PARSE = False
+BURST = 0
+BROADCAST = False
+RUNTIME = 'threads'
+SUPERVISE = False
+CRITICAL = []
+STATIONS = []		# (station, master consumer) pairs in multi-station mode
+# what each module's queue does when it is full, unless set in the settings file
+QPOLICY = {
+	'alertsound': 'coalesce',
+	'custom': 'coalesce',
+	'tweets': 'coalesce',
+	'telegram': 'coalesce',
+	'line': 'coalesce',
+}
 TESTFILE = pr.resource_filename('rsudp', os.path.join('test', 'testdata'))
 SENDER = 'Main'
 
@@ -48,6 +70,16 @@ def handler(sig, frame):
 	'''
 	rs.producer = False
 
+def status_handler(sig, frame):
+	'''
+	.. versionadded:: 1.1.2
+
+	Function passed to :py:func:`signal.signal` to handle ``SIGUSR1``
+	by printing :py:func:`report_status` (from a thread of its own,
+	so that the report does not interrupt whatever the main thread is printing).
+	'''
+	Thread(target=report_status, daemon=True).start()
+
 def _xit(code=0):
 	'''
 	End the program. Called after all running threads have stopped.
@@ -78,43 +110,223 @@ def test_mode(mode=None):
 	return TESTING
 
 
-def mk_q():
+def mk_q(policy='block', name='', channels=None, messages=None):
 	'''
 	Makes a queue and appends it to the :py:data:`destinations`
 	variable to be passed to the master consumer thread
 	:py:class:`rsudp.c_consumer.Consumer`.
 
-	:rtype: queue.Queue
+	.. versionadded:: 1.1.2
+
+		If :py:data:`BROADCAST` is set, all sub-consumers share one
+		:py:class:`rsudp.c_consumer.BroadcastRing`, which is the only destination,
+		and this returns a new reader of that ring instead of a queue.
+
+		The queue is a :py:class:`rsudp.c_consumer.PolicyQueue` with the given
+		``policy`` (see :py:func:`qpolicy`). Ring readers only distinguish between
+		``'block'`` and dropping, so any other policy makes a ``'drop'`` reader.
+
+		``channels`` and ``messages`` subscribe the queue to only some of the data
+		(see :py:func:`rsudp.c_consumer.Subscriber.subscribe`).
+		Modules whose channels are only known once they are created can
+		subscribe afterwards by calling ``subscribe`` on the queue.
+
+	:param str policy: what to do when the queue is full
+	:param str name: name of the module that reads the queue, used to report dropped packets
+	:param list channels: channels to deliver data packets for (``None`` for all, ``[]`` for none)
+	:param list messages: message types to deliver (``None`` for all)
+	:rtype: rsudp.c_consumer.PolicyQueue or rsudp.c_consumer.BroadcastReader
 	:return: Returns the queue to pass to the sub-consumer.
 	'''
-	q = Queue(rs.qsize)
-	DESTINATIONS.append(q)
+	if BROADCAST:
+		if not (DESTINATIONS and isinstance(DESTINATIONS[0], BroadcastRing)):
+			DESTINATIONS.insert(0, BroadcastRing(rs.qsize))
+		q = DESTINATIONS[0].reader('block' if policy == 'block' else 'drop', name)
+	else:
+		q = PolicyQueue(rs.qsize, policy, name)
+		DESTINATIONS.append(q)
+	if (channels is not None) or (messages is not None):
+		q.subscribe(channels, messages)
 	return q
 
-def mk_p(proc):
+def qpolicy(settings, module):
+	'''
+	.. versionadded:: 1.1.2
+
+	Looks up the queue policy for a module in the ``backpressure`` entry of the
+	``settings`` section, falling back to :py:data:`QPOLICY`, then to ``'block'``.
+
+	:param dict settings: settings dictionary
+	:param str module: name of the module's section in the settings
+	:rtype: str
+	:return: the policy to pass to :py:func:`mk_q`
+	'''
+	policy = settings['settings'].get('backpressure', {}).get(module, QPOLICY.get(module, 'block'))
+	if policy not in PolicyQueue.POLICIES:
+		printE('Unknown backpressure policy "%s" for %s, using "block"' % (policy, module), sender=SENDER)
+		policy = 'block'
+	return policy
+
+def report_drops(destinations, sender=SENDER):
+	'''
+	.. versionadded:: 1.1.2
+
+	Prints the number of packets each module's queue dropped because it was full,
+	including (in the asyncio runtime) packets that never reached it because
+	the queue of the thread that fills it was full (see :py:class:`rsudp.p_asyncio.AsyncProducer`).
+
+	:param list destinations: the queues (or broadcast ring) given to the master consumer
+	:param str sender: the name to print the report under
+	'''
+	for d in destinations:
+		for q in (d.readers if isinstance(d, BroadcastRing) else (d,)):
+			n = getattr(q, 'dropped', 0) + getattr(q, 'missed', 0)
+			if n:
+				printW('%s queue (%s) dropped %s packets because the module could not keep up'
+					   % (q.name or 'Module', q.policy, n), sender=sender)
+
+def mk_p(proc, process=False, module=None):
 	'''
 	Appends a process to the list of threads to start and stop.
 
+	.. versionadded:: 1.1.2
+
+		If ``process`` is ``True``, the sub-consumer is run in a worker process
+		(see :py:class:`rsudp.c_process.ProcessConsumer`), and the queue it was
+		given by :py:func:`mk_q` is replaced with a :py:class:`rsudp.c_process.SharedRing`
+		with the same policy and subscription.
+
+		Otherwise, if :py:data:`SUPERVISE` is set, the sub-consumer is run by a
+		:py:class:`rsudp.c_supervise.Supervisor`, which restarts it if it crashes.
+		Modules whose settings section (``module``) is in :py:data:`CRITICAL` shut rsudp down instead.
+
 	:param threading.Thread proc: The process thread to append to the list of threads.
+	:param bool process: whether to run the thread in a worker process (see :py:func:`use_process`)
+	:param str module: name of the module's section in the settings (used to check :py:data:`CRITICAL`)
 	'''
+	if process:
+		q = proc.queue
+		ring = SharedRing(rs.qsize, policy=q.policy, name=q.name)
+		ring.subscribe(q.channels, q.messages)
+		if isinstance(q, BroadcastReader):
+			q.ring.remove(q)
+		else:
+			DESTINATIONS.remove(q)
+		DESTINATIONS.append(ring)
+		proc = ProcessConsumer(proc, ring)
+	elif SUPERVISE:
+		proc = Supervisor(proc, critical=module in CRITICAL)
 	THREADS.append(proc)
 
+def report_restarts(threads, sender=SENDER):
+	'''
+	.. versionadded:: 1.1.2
+
+	Prints the number of times each supervised sub-consumer was restarted
+	(see :py:class:`rsudp.c_supervise.Supervisor`).
+
+	:param list threads: the sub-consumer threads
+	:param str sender: the name to print the report under
+	'''
+	for thread in threads:
+		if isinstance(thread, Supervisor) and thread.restarts:
+			printW('%s was restarted %s times (%s queue items thrown away while waiting)'
+				   % (thread.sender, thread.restarts, thread.discarded), sender=sender)
+
+def report_status():
+	'''
+	.. versionadded:: 1.1.2
+
+	Prints the producer's ingest statistics (see :py:class:`rsudp.p_producer.IngestStats`),
+	and the packets each module has dropped and the restarts so far,
+	while rsudp is running. Send rsudp ``SIGUSR1`` (``kill -USR1 <pid>``)
+	to call this (see :py:func:`status_handler`).
+	'''
+	if not PROD:
+		return
+	if isinstance(PROD, MultiProducer):
+		for st, cons in STATIONS:
+			PROD.stats[st].report(st.sender)
+			report_drops(cons.destinations, sender='%s %s' % (SENDER, st.stn))
+	else:
+		PROD.stats.report(PROD.sender)
+		report_drops(DESTINATIONS)
+	report_restarts(THREADS)
+
+def start_workers(threads):
+	'''
+	.. versionadded:: 1.1.2
+
+	Forks the worker processes of the sub-consumers that run in them
+	(see :py:class:`rsudp.c_process.ProcessConsumer`). Must be called from the main
+	thread before the other threads are started, so that no worker starts with
+	a copy of a lock that another thread was holding.
+
+	:param list threads: the sub-consumer threads
+	'''
+	for thread in threads:
+		if isinstance(thread, ProcessConsumer):
+			thread.start_worker()
+
+def join_workers(timeout=5):
+	'''
+	.. versionadded:: 1.1.2
+
+	Waits for sub-consumers running in worker processes to finish
+	(see :py:class:`rsudp.c_process.ProcessConsumer`).
+
+	:param float timeout: seconds to wait for each worker
+	'''
+	for thread in THREADS:
+		if isinstance(thread, ProcessConsumer) and thread.is_alive():
+			thread.join(timeout)
+
+def use_process(settings, module):
+	'''
+	.. versionadded:: 1.1.2
+
+	Whether a module is listed in the ``processes`` entry of the ``settings`` section,
+	and can be run in a worker process on this system (see :py:data:`rsudp.c_process.SHM`).
+
+	:param dict settings: settings dictionary
+	:param str module: name of the module's section in the settings
+	:rtype: bool
+	'''
+	if module not in settings['settings'].get('processes', []):
+		return False
+	if not SHM:
+		printW('Worker processes need Python 3.8 or newer on a system that can fork; running %s as a thread.'
+			   % module, sender=SENDER)
+		return False
+	return True
+
 
 def start():
 	'''
 	Start Consumer, Threads, and Producer.
+
+	.. versionadded:: 1.1.2
+
+		If :py:data:`RUNTIME` is ``'asyncio'``, an :py:class:`rsudp.p_asyncio.AsyncProducer`
+		takes the place of the Producer and Consumer, and starts the threads itself.
 	'''
 	global PROD, PLOTTER, THREADS, DESTINATIONS
-	# master queue and consumer
-	queue = Queue(rs.qsize)
-	cons = Consumer(queue, DESTINATIONS, testing=TESTING)
-	cons.start()
+	start_workers(THREADS)
+	if RUNTIME == 'asyncio':
+		# one event loop reads the port, distributes data, and drives the light modules
+		queue = PROD = AsyncProducer(THREADS, DESTINATIONS, testing=TESTING, parse=PARSE)
+		PROD.start()
+	else:
+		# master queue and consumer
+		queue = DualLaneQueue(rs.qsize)
+		cons = Consumer(queue, DESTINATIONS, testing=TESTING, parse=PARSE)
+		cons.start()
 
-	for thread in THREADS:
-		thread.start()
+		for thread in THREADS:
+			thread.start()
 
-	PROD = Producer(queue, THREADS, testing=TESTING)
-	PROD.start()
+		PROD = Producer(queue, THREADS, testing=TESTING, parse=PARSE, burst=BURST)
+		PROD.start()
 
 	if PLOTTER and MPL:
 		# give the plotter the master queue
@@ -129,58 +341,57 @@ def start():
 
 	time.sleep(0.5) # give threads time to exit
 	PROD.stop = True
+	join_workers()
+	report_drops(DESTINATIONS)
+	report_restarts(THREADS)
 
 
-def run(settings, debug):
+def invcache(settings):
 	'''
-	Main setup function. Takes configuration values and passes them to
-	the appropriate threads and functions.
+	.. versionadded:: 1.1.2
 
-	:param dict settings: settings dictionary (see :ref:`defaults` for guidance)
-	:param bool debug: whether or not to show debug output (should be turned off if starting as daemon)
-	'''
-	global PLOTTER, SOUND
-	# handler for the exit signal
-	signal.signal(signal.SIGINT, handler)
+	Reads the inventory cache settings (see :py:func:`rsudp.raspberryshake.Station.get_inventory`).
 
-	if TESTING:
-		global TESTQUEUE
-		# initialize the test data to read information from file and put it on the port
-		TESTQUEUE = Queue()		# separate from client library because this is not downstream of the producer
-		tdata = TestData(q=TESTQUEUE, data_file=TESTFILE, port=settings['settings']['port'])
-		tdata.start()
+	:param dict settings: settings dictionary
+	:rtype: tuple
+	:return: the inventory cache directory (``False`` if caching is off) and the cache lifetime in seconds
+	'''
+	if not settings['settings'].get('invcache', False):
+		return False, 0
+	odir = os.path.abspath(os.path.expanduser(settings['settings']['output_dir']))
+	return os.path.join(odir, 'inventory'), float(settings['settings'].get('invttl', 24)) * 3600
 
-	# initialize the central library
-	rs.initRSlib(dport=settings['settings']['port'],
-				 rsstn=settings['settings']['station'])
 
-	H.conn_stats(TESTING)
-	if TESTING:
-		T.TEST['n_port'][1] = True	# port has been opened
-		if rs.sps == 0:
-			printE('There is already a Raspberry Shake sending data to this port.', sender=SENDER)
-			printE('For testing, please change the port in your settings file to an unused one.',
-					sender=SENDER, spaces=True)
-			_xit(1)
+def mk_consumers(settings, debug):
+	'''
+	.. versionadded:: 1.1.2
 
+	Sets up queues and sub-consumer threads for the modules enabled in
+	a settings dictionary (see :ref:`defaults`), using :py:func:`mk_q` and
+	:py:func:`mk_p`. Modules read station parameters from
+	:py:mod:`rsudp.raspberryshake` when they are created.
 
+	:param dict settings: settings dictionary
+	:param bool debug: whether or not to show debug output
+	'''
+	global PLOTTER
 	output_dir = settings['settings']['output_dir']
 
-
 	if settings['printdata']['enabled']:
 		# set up queue and process
-		q = mk_q()
+		q = mk_q(qpolicy(settings, 'printdata'), 'printdata')
 		prnt = PrintRaw(q, testing=TESTING)
-		mk_p(prnt)
+		mk_p(prnt, process=use_process(settings, 'printdata'), module='printdata')
 
 	if settings['write']['enabled']:
 		global WRITER
 		# set up queue and process
 		cha = settings['write']['channels']
-		q = mk_q()
+		q = mk_q(qpolicy(settings, 'write'), 'write')
 		WRITER = Write(q=q, data_dir=output_dir,
 					   cha=cha, testing=TESTING)
-		mk_p(WRITER)
+		q.subscribe(channels=WRITER.chans, messages=[])
+		mk_p(WRITER, process=use_process(settings, 'write'), module='write')
 
 	if settings['plot']['enabled'] and MPL:
 		while True:
@@ -203,7 +414,7 @@ def run(settings, debug):
 				deconv = 'CHAN'
 		else:
 			deconv = False
-		pq = mk_q()
+		pq = mk_q(qpolicy(settings, 'plot'), 'plot')
 		PLOTTER = Plot(cha=cha, seconds=sec, spectrogram=spec,
 						fullscreen=full, kiosk=kiosk, deconv=deconv, q=pq,
 						screencap=screencap, alert=alert, testing=TESTING)
@@ -220,11 +431,13 @@ def run(settings, debug):
 		if len(addr) == len(port):
 			printM('Initializing %s Forward threads' % (len(addr)), sender=SENDER)
 			for i in range(len(addr)):
-				q = mk_q()
+				q = mk_q(qpolicy(settings, 'forward'), 'forward %s' % i)
 				forward = Forward(num=i, addr=addr[i], port=int(port[i]), cha=cha,
 								  fwd_data=fwd_data, fwd_alarms=fwd_alarms,
 								  q=q, testing=TESTING)
-				mk_p(forward)
+				q.subscribe(channels=forward.chans if fwd_data else [],
+							messages=['ALARM', 'RESET'] if fwd_alarms else [])
+				mk_p(forward, process=use_process(settings, 'forward'), module='forward')
 		else:
 			printE('List length mismatch: %s addresses and %s ports in forward section of settings file' % (
 										len(addr), len(port)), sender=SENDER)
@@ -238,6 +451,7 @@ def run(settings, debug):
 		reset = settings['alert']['reset']
 		bp = [settings['alert']['highpass'], settings['alert']['lowpass']]
 		cha = settings['alert']['channel']
+		votes = settings['alert'].get('votes', 1)
 		if settings['alert']['deconvolve']:
 			if settings['alert']['units'].upper() in rs.UNITS:
 				deconv = settings['alert']['units'].upper()
@@ -247,20 +461,21 @@ def run(settings, debug):
 			deconv = False
 
 		# set up queue and process
-		q = mk_q()
+		q = mk_q(qpolicy(settings, 'alert'), 'alert')
 		alrt = Alert(sta=sta, lta=lta, thresh=thresh, reset=reset, bp=bp,
 					 cha=cha, debug=debug, q=q, testing=TESTING,
-					 deconv=deconv)
-		mk_p(alrt)
+					 deconv=deconv, votes=votes)
+		q.subscribe(channels=alrt.channels, messages=[])
+		mk_p(alrt, process=use_process(settings, 'alert'), module='alert')
 
 	if settings['alertsound']['enabled']:
 		soundloc = os.path.expanduser(os.path.expanduser(settings['alertsound']['mp3file']))
 		if soundloc in ['doorbell', 'alarm', 'beeps', 'sonar']:
 			soundloc = pr.resource_filename('rsudp', os.path.join('rs_sounds', '%s.mp3' % soundloc))
 
-		q = mk_q()
+		q = mk_q(qpolicy(settings, 'alertsound'), 'alertsound', channels=[], messages=['ALARM'])
 		alsnd = AlertSound(q=q, testing=TESTING, soundloc=soundloc)
-		mk_p(alsnd)
+		mk_p(alsnd, process=use_process(settings, 'alertsound'), module='alertsound')
 
 	runcustom = False
 	try:
@@ -283,9 +498,9 @@ def run(settings, debug):
 			raise KeyError(e)
 	if runcustom:
 		# set up queue and process
-		q = mk_q()
+		q = mk_q(qpolicy(settings, 'custom'), 'custom', channels=[], messages=['ALARM'])
 		cstm = Custom(q=q, codefile=f, win_ovr=win_ovr, testing=TESTING)
-		mk_p(cstm)
+		mk_p(cstm, process=use_process(settings, 'custom'), module='custom')
 
 
 	if settings['tweets']['enabled']:
@@ -297,11 +512,11 @@ def run(settings, debug):
 		tweet_images = settings['tweets']['tweet_images']
 		extra_text = settings['tweets']['extra_text']
 
-		q = mk_q()
+		q = mk_q(qpolicy(settings, 'tweets'), 'tweets', channels=[], messages=['ALARM', 'IMGPATH'])
 		TWITTER = Tweeter(q=q, consumer_key=consumer_key, consumer_secret=consumer_secret,
 						access_token=access_token, access_token_secret=access_token_secret,
 						tweet_images=tweet_images, extra_text=extra_text, testing=TESTING)
-		mk_p(TWITTER)
+		mk_p(TWITTER, process=use_process(settings, 'tweets'), module='tweets')
 
 	if settings['telegram']['enabled']:
 		global TELEGRAM
@@ -312,20 +527,20 @@ def run(settings, debug):
 
 		for chat_id in chat_ids:
 			sender = "Telegram id %s" % (chat_id)
-			q = mk_q()
+			q = mk_q(qpolicy(settings, 'telegram'), sender, channels=[], messages=['ALARM', 'IMGPATH'])
 			TELEGRAM = Telegrammer(q=q, token=token, chat_id=chat_id,
 								   send_images=send_images, extra_text=extra_text,
 								   sender=sender, testing=TESTING)
-			mk_p(TELEGRAM)
+			mk_p(TELEGRAM, process=use_process(settings, 'telegram'), module='telegram')
 
 # AstroTaka -----------------
 	if settings['line']['enabled']:
 		token = settings['line']['token']
 		send_images = settings['line']['send_images']
 		
-		q = mk_q()
+		q = mk_q(qpolicy(settings, 'line'), 'line', channels=[], messages=['ALARM', 'IMGPATH'])
 		line = LINE(q=q, token=token, send_images=send_images)
-		mk_p(line)
+		mk_p(line, process=use_process(settings, 'line'), module='line')
 # ---------------------------
 
 	if settings['rsam']['enabled']:
@@ -345,12 +560,49 @@ def run(settings, debug):
 			deconv = False
 
 		# set up queue and process
-		q = mk_q()
+		q = mk_q(qpolicy(settings, 'rsam'), 'rsam')
 		rsam = RSAM(q=q, interval=interval, cha=cha, deconv=deconv,
 					fwaddr=fwaddr, fwport=fwport, fwformat=fwformat,
 					quiet=quiet, testing=TESTING)
+		q.subscribe(channels=[rsam.cha], messages=[])
 
-		mk_p(rsam)
+		mk_p(rsam, process=use_process(settings, 'rsam'), module='rsam')
+
+	if settings.get('intensity', {}).get('enabled', False):
+		# put settings in namespace
+		fwaddr = settings['intensity'].get('fwaddr', False)
+		fwport = settings['intensity'].get('fwport', False)
+		fwformat = settings['intensity'].get('fwformat', 'LITE')
+		interval = settings['intensity'].get('interval', 1)
+		window = settings['intensity'].get('window', 60)
+		sensitivity = settings['intensity'].get('sensitivity', False)
+		quiet = settings['intensity'].get('quiet', True)
+
+		# set up queue and process
+		q = mk_q(qpolicy(settings, 'intensity'), 'intensity')
+		intensity = Intensity(q=q, interval=interval, window=window, sensitivity=sensitivity,
+							  fwaddr=fwaddr, fwport=fwport, fwformat=fwformat,
+							  quiet=quiet, testing=TESTING)
+		q.subscribe(channels=intensity.channels, messages=[])
+
+		mk_p(intensity, process=use_process(settings, 'intensity'), module='intensity')
+
+	if settings.get('match', {}).get('enabled', False):
+		# put settings in namespace
+		templates = settings['match'].get('templates', '')
+		cha = settings['match'].get('channel', 'HZ')
+		threshold = settings['match'].get('threshold', 0.7)
+		duration = settings['match'].get('duration', 20)
+		bp = [settings['match'].get('highpass', 1), settings['match'].get('lowpass', 10)]
+		quiet = settings['match'].get('quiet', True)
+
+		# set up queue and process
+		q = mk_q(qpolicy(settings, 'match'), 'match')
+		match = Match(q=q, templates=templates, cha=cha, threshold=threshold,
+					  duration=duration, bp=bp, quiet=quiet, testing=TESTING)
+		q.subscribe(channels=[match.cha], messages=[])
+
+		mk_p(match, process=use_process(settings, 'match'), module='match')
 
 
 	# start additional modules here!
@@ -359,15 +611,94 @@ def run(settings, debug):
 
 	################################
 
+
+def run(settings, debug):
+	'''
+	Main setup function. Takes configuration values and passes them to
+	the appropriate threads and functions.
+
+	:param dict settings: settings dictionary (see :ref:`defaults` for guidance)
+	:param bool debug: whether or not to show debug output (should be turned off if starting as daemon)
+	'''
+	global PLOTTER, SOUND, PARSE, BURST, BROADCAST, RUNTIME, SUPERVISE, CRITICAL, THREADS, DESTINATIONS
+	# handler for the exit signal
+	signal.signal(signal.SIGINT, handler)
+	if hasattr(signal, 'SIGUSR1'):
+		# print ingest statistics and dropped packets on request
+		signal.signal(signal.SIGUSR1, status_handler)
+
+	# restart modules that crash, unless they are critical
+	SUPERVISE = settings['settings'].get('supervise', True)
+	CRITICAL = settings['settings'].get('critical', [])
+
+	if settings.get('multistation', {}).get('enabled') and not TESTING:
+		run_multi(settings, debug)
+		return
+
+	if TESTING:
+		global TESTQUEUE
+		# initialize the test data to read information from file and put it on the port
+		TESTQUEUE = Queue()		# separate from client library because this is not downstream of the producer
+		tdata = TestData(q=TESTQUEUE, data_file=TESTFILE, port=settings['settings']['port'])
+		tdata.start()
+
+	# keep a copy of the station inventory on disk
+	rs.invcache, rs.invttl = invcache(settings)
+
+	# initialize the central library
+	rs.initRSlib(dport=settings['settings']['port'],
+				 rsstn=settings['settings']['station'],
+				 rcvbuf=settings['settings'].get('rcvbuf', 0),
+				 cache=rs.params_loc if settings['settings'].get('paramcache', False) else None)
+
+	H.conn_stats(TESTING)
 	if TESTING:
-		# initialize test consumer
-		q = mk_q()
-		test = Testing(q=q)
-		mk_p(test)
+		T.TEST['n_port'][1] = True	# port has been opened
+		if rs.sps == 0:
+			printE('There is already a Raspberry Shake sending data to this port.', sender=SENDER)
+			printE('For testing, please change the port in your settings file to an unused one.',
+					sender=SENDER, spaces=True)
+			_xit(1)
 
 
-	# start the producer, consumer, and activated modules
-	start()
+	# parse each packet once in the producer rather than once per consumer
+	PARSE = settings['settings'].get('preparse', False)
+	# drain the port in bursts rather than one datagram at a time
+	BURST = settings['settings'].get('burst', 0)
+	# hand data to modules through one shared ring rather than a queue each
+	BROADCAST = settings['settings'].get('broadcast', False)
+	# run light modules on an event loop rather than a thread each
+	RUNTIME = settings['settings'].get('runtime', 'threads')
+	if RUNTIME not in ('threads', 'asyncio'):
+		printE('Unknown runtime "%s", using "threads"' % (RUNTIME), sender=SENDER)
+		RUNTIME = 'threads'
+	elif (RUNTIME == 'asyncio') and BURST:
+		printW('Burst reads are not used by the asyncio runtime.', sender=SENDER)
+
+
+	while True:
+		mk_consumers(settings, debug)
+
+		if TESTING:
+			# initialize test consumer
+			q = mk_q()
+			test = Testing(q=q)
+			mk_p(test)
+
+
+		# start the producer, consumer, and activated modules
+		start()
+
+		if not rs.default.changed:
+			break
+		# the cached stream parameters were wrong (see ShakeSession.verify),
+		# so set up the modules again with the ones detected from live data
+		rs.default.changed = False
+		for thread in THREADS:
+			if thread.is_alive():
+				thread.join(5)	# so the new workers are not forked while the old modules are still running
+		THREADS, DESTINATIONS = [], []
+		printM('Starting modules again with the detected stream parameters...', sender=SENDER)
 
 	PLOTTER = False
 	if not TESTING:
@@ -376,6 +707,85 @@ def run(settings, debug):
 		printW('Client has exited, ending tests...', sender=SENDER, announce=False)
 
 
+def run_multi(settings, debug):
+	'''
+	.. versionadded:: 1.1.2
+
+	Setup function for multi-station mode, where one rsudp process receives
+	data from several Raspberry Shakes (see the ``multistation`` section of :ref:`defaults`).
+	Each station gets its own master queue, :py:class:`rsudp.c_consumer.Consumer`
+	and set of modules, configured from the main settings plus that station's ``overrides``.
+	A single :py:class:`rsudp.p_producer.MultiProducer` receives data for all stations.
+
+	The plot module needs the main thread and is therefore not run in this mode.
+
+	:param dict settings: settings dictionary (see :ref:`defaults` for guidance)
+	:param bool debug: whether or not to show debug output (should be turned off if starting as daemon)
+	'''
+	global PROD, DESTINATIONS, BROADCAST
+	ms = settings['multistation']
+	BROADCAST = settings['settings'].get('broadcast', False)
+	stations, overrides = [], {}
+	for stncfg in ms['stations']:
+		st = rs.Station(stn=stncfg.get('station', 'Z0000'),
+						port=stncfg.get('port', settings['settings']['port']),
+						addr=stncfg.get('address', ''))
+		overrides[st] = stncfg.get('overrides', {})
+		stations.append(st)
+	if len(stations) == 0:
+		printE('Multi-station mode is enabled but no stations are listed in the settings file.', sender=SENDER)
+		_xit(1)
+
+	PROD = MultiProducer(stations, rcvbuf=settings['settings'].get('rcvbuf', 0))
+	stations = PROD.detect(timeout=ms.get('timeout', 10))
+	if len(stations) == 0:
+		printE('No stations sent data, exiting.', sender=SENDER)
+		_xit(1)
+
+	if settings['plot']['enabled']:
+		printW('The plot module is not available in multi-station mode and will not be started.', sender=SENDER)
+	if settings['settings'].get('runtime', 'threads') != 'threads':
+		printW('Multi-station mode only has the threads runtime; using threads.', sender=SENDER)
+
+	consumers = []
+	for st in stations:
+		st.invcache, st.invttl = invcache(settings)
+		st.get_inventory()
+		# each station's modules use the main settings, plus any overrides for that station
+		stnsettings = deepcopy(settings)
+		for section in overrides[st]:
+			stnsettings[section].update(overrides[st][section])
+		stnsettings['plot']['enabled'] = False
+		DESTINATIONS = []
+		n = len(THREADS)
+		with st:
+			mk_consumers(stnsettings, debug)
+		for thread in THREADS[n:]:
+			thread.sender = '%s %s' % (thread.sender, st.stn)
+		queue = DualLaneQueue(rs.qsize)
+		consumers.append(Consumer(queue, DESTINATIONS, parse=True))
+		PROD.add_station(st, queue, THREADS[n:])
+		printM('Started %s modules for station %s' % (len(THREADS[n:]), st.stn), sender=SENDER)
+
+	STATIONS[:] = zip(stations, consumers)
+	start_workers(THREADS)
+	for cons in consumers:
+		cons.start()
+	for thread in THREADS:
+		thread.start()
+	PROD.start()
+
+	while not PROD.stop:
+		time.sleep(0.1) # wait until processes end
+
+	time.sleep(0.5) # give threads time to exit
+	join_workers()
+	for st, cons in STATIONS:
+		report_drops(cons.destinations, sender='%s %s' % (SENDER, st.stn))
+	report_restarts(THREADS)
+	_xit()
+
+
 def main():
 	'''
 	Loads settings to start the main client.
@@ -2,6 +2,7 @@ import rsudp.raspberryshake as rs
 from rsudp import COLOR, printM, printW
 import os
 import json
+from scipy.signal import iirfilter, sosfilt
 
 
 def dump_default(settings_loc, default_settings):
@@ -31,7 +32,19 @@ def default_settings(output_dir='%s/rsudp' % os.path.expanduser('~').replace('\\
     "port": 8888,
     "station": "Z0000",
     "output_dir": "%s",
-    "debug": true},
+    "debug": true,
+    "preparse": false,
+    "burst": 0,
+    "rcvbuf": 0,
+    "paramcache": false,
+    "invcache": false,
+    "invttl": 24,
+    "broadcast": false,
+    "backpressure": {},
+    "processes": [],
+    "runtime": "threads",
+    "supervise": true,
+    "critical": []},
 "printdata": {
     "enabled": false},
 "write": {
@@ -61,6 +74,7 @@ def default_settings(output_dir='%s/rsudp' % os.path.expanduser('~').replace('\\
     "lta": 30,
     "threshold": 3.95,
     "reset": 0.9,
+    "votes": 1,
     "highpass": 0.8,
     "lowpass": 9,
     "deconvolve": false,
@@ -95,10 +109,36 @@ def default_settings(output_dir='%s/rsudp' % os.path.expanduser('~').replace('\\
     "channel": "HZ",
     "interval": 10,
     "deconvolve": false,
-    "units": "VEL"}
+    "units": "VEL"},
+"intensity": {
+    "enabled": false,
+    "quiet": true,
+    "fwaddr": "192.168.1.254",
+    "fwport": 8886,
+    "fwformat": "LITE",
+    "interval": 1,
+    "window": 60,
+    "sensitivity": false},
+"match": {
+    "enabled": false,
+    "templates": "%s/templates",
+    "channel": "HZ",
+    "threshold": 0.7,
+    "duration": 20,
+    "highpass": 1,
+    "lowpass": 10,
+    "quiet": true},
+"multistation": {
+    "enabled": false,
+    "timeout": 10,
+    "stations": [
+        {"station": "Z0000",
+         "port": 8888,
+         "address": "",
+         "overrides": {}}]}
 }
 
-""" % (output_dir)
+""" % (output_dir, output_dir)
 	if verbose:
 		print('By default output_dir is set to %s' % output_dir)
 	return def_settings
@@ -324,6 +364,54 @@ def msg_imgpath(event_time, figname):
 	return b'IMGPATH %s %s' % (bytes(str(event_time), 'utf-8'), bytes(str(figname), 'utf-8'))
 
 
+def msg_intensity(event_time, intensity, pga, pgv):
+	'''
+	.. versionadded:: 1.1.2
+
+	This function constructs the ``INTENSITY`` message as a bytes object.
+	Currently this is only used by :py:class:`rsudp.c_intensity.Intensity`
+	to publish the JMA seismic intensity and peak ground motion of the last window.
+
+	For example:
+
+	.. code-block:: python
+
+		>>> from obspy import UTCDateTime
+		>>> ti = UTCDateTime(2020, 1, 1, 0, 0, 0, 599000, precision=3)
+		>>> msg_intensity(ti, 3.2, 12.5, 0.81)
+		b'INTENSITY 2020-01-01T00:00:00.599Z 3.2 12.5 0.81'
+
+	:param obspy.core.utcdatetime.UTCDateTime event_time: the time of the last sample measured
+	:param float intensity: JMA instrumental seismic intensity
+	:param float pga: peak ground acceleration in gal (cm/s\ :sup:`2`)
+	:param float pgv: peak ground velocity in cm/s
+	:rtype: bytes
+	:return: the ``INTENSITY`` message, ready to be put on the queue
+	'''
+	return b'INTENSITY %s %s %s %s' % (bytes(str(event_time), 'utf-8'), bytes(str(intensity), 'utf-8'),
+									   bytes(str(pga), 'utf-8'), bytes(str(pgv), 'utf-8'))
+
+
+def get_msg_intensity(msg):
+	'''
+	.. versionadded:: 1.1.2
+
+	This function gets the values from an ``INTENSITY`` message
+	(see :py:func:`rsudp.helpers.msg_intensity`).
+
+	.. code-block:: python
+
+		>>> get_msg_intensity(b'INTENSITY 2020-01-01T00:00:00.599Z 3.2 12.5 0.81')
+		(3.2, 12.5, 0.81)
+
+	:param msg: the bytes-formatted or parsed queue message to decode
+	:type msg: bytes or rsudp.raspberryshake.Message
+	:rtype: tuple
+	:return: the intensity, PGA (gal), and PGV (cm/s)
+	'''
+	return tuple(float(v) for v in bytes(msg).decode('utf-8').split(' ')[2:5])
+
+
 def msg_term():
 	'''
 	This function constructs the simple ``TERM`` message as a bytes object.
@@ -340,10 +428,44 @@ def msg_term():
 	return b'TERM'
 
 
+def msg_type(d):
+	'''
+	.. versionadded:: 1.1.2
+
+	This function returns the type of a queue item without decoding
+	the whole item, so that consumers can cheaply tell data from messages.
+	Works on both bytes and parsed (:py:func:`rsudp.raspberryshake.parse_message`)
+	queue items.
+
+	For example:
+
+	.. code-block:: python
+
+		>>> msg_type(b"{'EHZ', 1582315130.292, 14168, 14927, 16112}")
+		'DATA'
+		>>> msg_type(b'ALARM 2020-01-01T00:00:00.599Z')
+		'ALARM'
+		>>> msg_type(msg_term())
+		'TERM'
+
+	:param d: the queue item to inspect
+	:type d: bytes or rsudp.raspberryshake.Packet or rsudp.raspberryshake.Message
+	:rtype: str
+	:return: ``'DATA'`` for data packets, otherwise the message type (``'ALARM'``, ``'RESET'``, ``'IMGPATH'``, ``'TERM'``...)
+	'''
+	if isinstance(d, rs.Packet):
+		return 'DATA'
+	if isinstance(d, rs.Message):
+		return d.kind
+	if d[:1] == b'{':
+		return 'DATA'
+	return d.split(b' ', 1)[0].strip().decode('utf-8')
+
+
 def get_msg_time(msg):
 	'''
 	This function gets the time from ``ALARM``, ``RESET``,
-	and ``IMGPATH`` messages as a UTCDateTime object.
+	``IMGPATH``, and ``INTENSITY`` messages as a UTCDateTime object.
 
 	For example:
 
@@ -358,10 +480,13 @@ def get_msg_time(msg):
 		>>> get_msg_time(msg)
 		UTCDateTime(2020, 1, 1, 0, 0, 0, 599000)
 
-	:param bytes msg: the bytes-formatted queue message to decode
+	:param msg: the bytes-formatted or parsed queue message to decode
+	:type msg: bytes or rsudp.raspberryshake.Message
 	:rtype: obspy.core.utcdatetime.UTCDateTime
 	:return: the time embedded in the message
 	'''
+	if isinstance(msg, rs.Message):
+		return msg.time
 	return rs.UTCDateTime.strptime(msg.decode('utf-8').split(' ')[1], '%Y-%m-%dT%H:%M:%S.%fZ')
 
 
@@ -382,13 +507,37 @@ def get_msg_path(msg):
 		>>> get_msg_path(msg)
 		'/home/pi/rsudp/screenshots/test.png'
 
-	:param bytes msg: the bytes-formatted queue message to decode
+	:param msg: the bytes-formatted or parsed queue message to decode
+	:type msg: bytes or rsudp.raspberryshake.Message
 	:rtype: str
 	:return: the path embedded in the message
 	'''
+	if isinstance(msg, rs.Message):
+		return msg.path
 	return msg.decode('utf-8').split(' ')[2]
 
 
+def _response(trace):
+	'''
+	.. versionadded:: 1.1.2
+
+	Attaches the cached instrument response (:py:func:`rsudp.raspberryshake.get_response`)
+	to a trace if it does not already have one, so that
+	:py:func:`obspy.core.trace.Trace.remove_response` does not have to
+	search the whole inventory.
+
+	:param obspy.core.trace.Trace trace: the trace object instance to deconvolve
+	:rtype: obspy.core.inventory.inventory.Inventory or None
+	:return: ``None`` if the trace carries its response, otherwise the inventory for ObsPy to search
+	'''
+	if 'response' not in trace.stats:
+		try:
+			trace.stats.response = rs.get_response(trace.id, trace.stats.starttime)
+		except Exception:
+			return rs.inv
+	return None
+
+
 def deconv_vel_inst(self, trace, output):
 	'''
 	.. role:: pycode(code)
@@ -401,10 +550,10 @@ def deconv_vel_inst(self, trace, output):
 	:param obspy.core.trace.Trace trace: the trace object instance to deconvolve
 	'''
 	if self.deconv not in 'CHAN':
-		trace.remove_response(inventory=rs.inv, pre_filt=[0.1, 0.6, 0.95*self.sps, self.sps],
+		trace.remove_response(inventory=_response(trace), pre_filt=[0.1, 0.6, 0.95*self.sps, self.sps],
 								output=output, water_level=4.5, taper=False)
 	else:
-		trace.remove_response(inventory=rs.inv, pre_filt=[0.1, 0.6, 0.95*self.sps, self.sps],
+		trace.remove_response(inventory=_response(trace), pre_filt=[0.1, 0.6, 0.95*self.sps, self.sps],
 								output='VEL', water_level=4.5, taper=False)
 	if 'ACC' in self.deconv:
 # AstroTaka -----------------
@@ -439,10 +588,10 @@ def deconv_acc_inst(self, trace, output):
 	:param obspy.core.trace.Trace trace: the trace object instance to deconvolve
 	'''
 	if self.deconv not in 'CHAN':
-		trace.remove_response(inventory=rs.inv, pre_filt=[0.1, 0.6, 0.95*self.sps, self.sps],
+		trace.remove_response(inventory=_response(trace), pre_filt=[0.1, 0.6, 0.95*self.sps, self.sps],
 								output=output, water_level=4.5, taper=False)
 	else:
-		trace.remove_response(inventory=rs.inv, pre_filt=[0.1, 0.6, 0.95*self.sps, self.sps],
+		trace.remove_response(inventory=_response(trace), pre_filt=[0.1, 0.6, 0.95*self.sps, self.sps],
 								output='ACC', water_level=4.5, taper=False)
 	if 'VEL' in self.deconv:
 		trace.data = rs.np.cumsum(trace.data)
@@ -526,6 +675,103 @@ def deconvolve(self):
 			trace.stats.units = ' counts'		# this is not being deconvolved
 
 
+class StreamingFilter(object):
+	'''
+	.. versionadded:: 1.1.2
+
+	A Butterworth filter for sub-consumers that filter their data as it arrives,
+	rather than a window at a time. Each channel has its own filter state,
+	so a packet is filtered as if it followed on from the last one on its
+	channel, and the filter's start-up ripple only happens once, not at the
+	start of every window. The filter is designed once for each sampling rate
+	(see :py:func:`sos`), the same way :py:func:`obspy.signal.filter.bandpass`
+	and its relatives do it.
+
+	.. code-block:: python
+
+		>>> filt = StreamingFilter('bandpass', freqmin=0.7, freqmax=2)
+		>>> d = rs.getDATA()
+		>>> y = filt.filter(rs.getCHN(d), rs.getSTREAM(d), sps=rs.sps)
+
+	:param str kind: ``'bandpass'``, ``'highpass'``, or ``'lowpass'``
+	:param float freqmin: low corner frequency (``'bandpass'`` and ``'highpass'``)
+	:param float freqmax: high corner frequency (``'bandpass'`` and ``'lowpass'``)
+	:param int corners: filter order
+	'''
+	KINDS = ('bandpass', 'highpass', 'lowpass')
+
+	def __init__(self, kind, freqmin=None, freqmax=None, corners=4):
+		if kind not in self.KINDS:
+			raise ValueError('Unknown filter: %s' % kind)
+		self.kind = kind
+		self.freqmin = freqmin
+		self.freqmax = freqmax
+		self.corners = corners
+		self.designs = {}		# second-order sections by sampling rate
+		self.zi = {}			# filter state by channel
+
+	def sos(self, sps):
+		'''
+		Returns the filter for a sampling rate, designing it the first time.
+
+		:param float sps: sampling rate in samples per second
+		:rtype: numpy.ndarray
+		:return: second-order sections (see :py:func:`scipy.signal.sosfilt`)
+		'''
+		if sps not in self.designs:
+			fe = 0.5 * sps
+			if self.kind == 'bandpass':
+				wn, btype = [self.freqmin / fe, self.freqmax / fe], 'band'
+			elif self.kind == 'highpass':
+				wn, btype = self.freqmin / fe, 'highpass'
+			else:
+				wn, btype = self.freqmax / fe, 'lowpass'
+			self.designs[sps] = iirfilter(self.corners, wn, btype=btype,
+										  ftype='butter', output='sos')
+		return self.designs[sps]
+
+	def filter(self, chan, samples, sps):
+		'''
+		Filters samples that follow on from the last ones passed for ``chan``.
+
+		:param str chan: channel name
+		:param numpy.ndarray samples: the new samples
+		:param float sps: sampling rate in samples per second
+		:rtype: numpy.ndarray
+		:return: the filtered samples, as 64-bit floats
+		'''
+		sos = self.sos(sps)
+		zi = self.zi.get(chan)
+		if zi is None:
+			zi = rs.np.zeros((sos.shape[0], 2))
+		y, self.zi[chan] = sosfilt(sos, rs.np.asarray(samples, dtype=rs.np.float64), zi=zi)
+		return y
+
+	def apply(self, samples, sps):
+		'''
+		Filters a whole window of samples without using or changing any channel's state,
+		as :py:func:`obspy.signal.filter.bandpass` would.
+
+		:param numpy.ndarray samples: the samples
+		:param float sps: sampling rate in samples per second
+		:rtype: numpy.ndarray
+		:return: the filtered samples, as 64-bit floats
+		'''
+		return sosfilt(self.sos(sps), rs.np.asarray(samples, dtype=rs.np.float64))
+
+	def reset(self, chan=None):
+		'''
+		Forgets the filter state of a channel, so that its next samples are
+		filtered as if they were the first. Use this after a gap.
+
+		:param str chan: channel name, or ``None`` for all channels
+		'''
+		if chan is None:
+			self.zi.clear()
+		else:
+			self.zi.pop(chan, None)
+
+
 def resolve_extra_text(extra_text, max_len, sender='helpers'):
 	'''
 	.. role:: pycode(code)
@@ -0,0 +1,319 @@
+import sys
+import asyncio
+from collections import deque
+from queue import Full
+from rsudp import printM, printW, printE, helpers
+import rsudp.raspberryshake as RS
+from rsudp.c_consumer import Subscriber, BroadcastRing, BroadcastReader, DualLaneQueue, PolicyQueue, Consumer
+from rsudp.p_producer import Producer
+from rsudp.test import TEST
+
+
+class AsyncQueue(Subscriber):
+	'''
+	.. versionadded:: 1.1.2
+
+	A sub-consumer queue read by a coroutine on the
+	:py:class:`rsudp.p_asyncio.AsyncProducer`'s event loop. Like a
+	:py:class:`rsudp.c_consumer.PolicyQueue`, messages have their own lane and
+	are read before any waiting data, and ``policy`` decides what happens to
+	data packets when the queue is full. The event loop cannot wait for space,
+	so a ``'block'`` queue throws away new data when it is full, like ``'drop-newest'``.
+
+	Only the event loop's thread may use this.
+
+	:param int maxsize: size of the queue
+	:param str policy: ``'block'``, ``'drop-oldest'``, ``'drop-newest'``, or ``'coalesce'``
+	:param str name: name to use when reporting dropped packets
+	'''
+	def __init__(self, maxsize=RS.qsize, policy='block', name=''):
+		if policy not in PolicyQueue.POLICIES:
+			raise ValueError('Unknown queue policy: %s' % policy)
+		self.maxsize = int(maxsize)
+		self.policy = policy
+		self.name = name
+		self.dropped = 0			# data packets thrown away because the queue was full
+		self.control = deque()
+		self.data = deque()
+		self.ready = asyncio.Event()
+
+	def qsize(self):
+		return len(self.control) + len(self.data)
+
+	def put(self, item, block=True, timeout=None):
+		'''
+		Puts an item on the queue, applying the policy if the queue is full.
+		Never waits, so ``block`` and ``timeout`` are not used.
+
+		:param item: the data packet or message to queue
+		'''
+		if DualLaneQueue.is_control(item):
+			self.control.append(item)
+		else:
+			if 0 < self.maxsize <= len(self.data):
+				if self.policy in ('block', 'drop-newest'):
+					self.dropped += 1
+					return
+				n = 1 if self.policy == 'drop-oldest' else len(self.data)
+				for i in range(n):
+					self.data.popleft()
+				self.dropped += n
+			self.data.append(item)
+		self.ready.set()
+
+	async def get(self):
+		'''
+		Waits for the next message, or if there is none, the next data packet.
+		'''
+		while not (self.control or self.data):
+			self.ready.clear()
+			await self.ready.wait()
+		return self.control.popleft() if self.control else self.data.popleft()
+
+
+class _Protocol(asyncio.DatagramProtocol):
+	'''
+	Passes datagrams from the port to the :py:class:`rsudp.p_asyncio.AsyncProducer`.
+	'''
+	def __init__(self, producer):
+		self.producer = producer
+
+	def datagram_received(self, data, addr):
+		self.producer._filter_sender(data, addr)
+		if self.producer.testing:
+			TEST['x_data'][1] = True
+
+	def error_received(self, exc):
+		printE('Error reading from the port: %s' % (exc), self.producer.sender)
+
+
+class AsyncProducer(Producer):
+	'''
+	.. versionadded:: 1.1.2
+
+	Producer and master consumer for the ``"asyncio"`` runtime (see the
+	``runtime`` entry of the ``settings`` section of :ref:`defaults`),
+	which runs on one :py:mod:`asyncio` event loop instead of giving every
+	sub-consumer a thread that spends most of its time waiting on its queue.
+
+	The port is read by an :py:class:`asyncio.DatagramProtocol`, and each datagram is
+	passed straight to the sub-consumer queues in ``destinations``
+	(with the same subscriptions as in :py:class:`rsudp.c_consumer.Consumer`),
+	so no master queue or master consumer thread is needed.
+
+	Sub-consumers that define ``handle`` (see :py:class:`rsudp.raspberryshake.ConsumerThread`),
+	such as forwarding and notification modules, are not started as threads.
+	Each is given an :py:class:`rsudp.p_asyncio.AsyncQueue` in place of its queue,
+	with the same policy and subscription, and a coroutine passes it one item at a time.
+	Handlers that may block (for example, by sending a message to a web service) are run in
+	the event loop's default executor, so they do not hold up the loop.
+	Other sub-consumers, which do heavier work on their data (Alert, Write, RSAM, worker
+	processes...), are started as threads as usual, and the plot keeps the main thread.
+	Their queues are filled by a :py:class:`rsudp.c_consumer.Consumer` thread, as in
+	the threaded runtime, so that a full ``'block'`` queue makes that thread wait
+	instead of the event loop. The loop puts data on that thread's queue without waiting;
+	if it is full, the data is thrown away and counted in :py:data:`dropped`, and in the
+	``missed`` count of each sub-consumer queue it was meant for
+	(reported with their own dropped packets, see :py:func:`rsudp.client.report_drops`).
+
+	Anything the main thread or a sub-consumer thread puts on the master queue
+	(for example, the plot's ``TERM`` and ``IMGPATH`` messages) should be passed to
+	:py:func:`put`, which is safe to call from any thread.
+
+	.. code-block:: python
+
+		>>> prod = AsyncProducer(THREADS, DESTINATIONS, parse=True)
+		>>> prod.start()
+
+	:param list threads: the sub-consumers to run and monitor for status changes (not started yet)
+	:param list destinations: the sub-consumer queues (see :py:class:`rsudp.c_consumer.Consumer`)
+	:param bool parse: whether to parse datagrams before passing them on
+	:param rsudp.raspberryshake.ShakeSession session: `(optional)` the session whose socket to read (defaults to :py:data:`rsudp.raspberryshake.default`)
+	'''
+
+	def __init__(self, threads, destinations, testing=False, parse=False, session=None):
+		super().__init__(queue=None, threads=threads, testing=testing, parse=parse, session=session)
+		self.sender = 'AsyncProducer'
+		self.destinations = destinations
+		self.routes = []
+		self.by_channel = False
+		self.master = None		# queue of the thread that fills the threaded sub-consumers' queues
+		self.threaded = []		# the queues that thread fills
+		self.dropped = 0		# items thrown away because that queue was full
+		self.loop = asyncio.new_event_loop()	# created now so that put() works before run()
+
+
+	def _route(self):
+		'''
+		Works out which destinations receive which items, as the master consumer would.
+		Destinations that are not :py:class:`rsudp.p_asyncio.AsyncQueue` objects are
+		given to a :py:class:`rsudp.c_consumer.Consumer` thread, which receives everything.
+		'''
+		loop_qs = [q for q in self.destinations if isinstance(q, AsyncQueue)]
+		threaded = [q for q in self.destinations if not isinstance(q, AsyncQueue)]
+		# destinations with no subscription get everything
+		self.routes = [(q, q.accepts if getattr(q, 'subscribed', False) else None)
+					   for q in loop_qs]
+		self.by_channel = any(getattr(q, 'channels', None) is not None for q in loop_qs)
+		self.threaded = [q for d in threaded for q in (d.readers if isinstance(d, BroadcastRing) else (d,))]
+		for q in self.threaded:
+			q.missed = 0		# only this thread counts these
+		if threaded:
+			self.master = DualLaneQueue(RS.qsize)
+			self.routes.append((self.master, None))
+			Consumer(self.master, threaded, testing=self.testing, parse=self.parse).start()
+
+
+	def _put(self, msg, batch=None, queue=None):
+		'''
+		Pass a datagram or message to the sub-consumer queues, parsing it first if required.
+		Runs in the event loop's thread.
+
+		:param bytes msg: the datagram or message to pass on
+		'''
+		p = RS.parse_message(msg, self.session) if (self.parse and isinstance(msg, bytes)) else msg
+		t = helpers.msg_type(p)
+		chn = RS.getCHN(p) if (self.by_channel and t == 'DATA') else None
+		for q, accepts in self.routes:
+			if (accepts is None) or accepts(t, chn):
+				try:
+					q.put(p, block=False)	# the loop never waits
+				except Full:
+					self._missed(p, t)
+		if self.testing:
+			TEST['x_masterqueue'][1] = True
+
+
+	def _missed(self, p, t):
+		'''
+		Counts a data packet that the threaded sub-consumers' queue had no room for
+		against each sub-consumer queue that would have received it.
+
+		:param p: the data packet
+		:param str t: its type, from :py:func:`rsudp.helpers.msg_type`
+		'''
+		self.dropped += 1
+		chn = RS.getCHN(p)
+		for q in self.threaded:
+			if (not getattr(q, 'subscribed', False)) or q.accepts(t, chn):
+				q.missed += 1
+
+
+	def put(self, item, block=True, timeout=None):
+		'''
+		Passes a message to the sub-consumers from any thread,
+		as if it had been put on the master queue.
+
+		:param item: the message to pass on
+		'''
+		try:
+			self.loop.call_soon_threadsafe(self._put, item)
+		except RuntimeError:
+			pass	# the loop has closed, so nobody is listening
+
+
+	def _signal(self, thread, event, value, queue=None):
+		'''
+		Receives an event from a sub-consumer, and has the event loop handle it.
+		Safe to call from any thread.
+		'''
+		try:
+			self.loop.call_soon_threadsafe(self._handle, thread, event, value)
+		except RuntimeError:
+			pass	# the loop has closed
+
+
+	def _adopt(self, thread):
+		'''
+		Gives a sub-consumer that defines ``handle`` an :py:class:`rsudp.p_asyncio.AsyncQueue`
+		in place of the queue it was made with.
+
+		:param rsudp.raspberryshake.ConsumerThread thread: the sub-consumer
+		:rtype: rsudp.p_asyncio.AsyncQueue
+		'''
+		old = thread.queue
+		policy = getattr(old, 'policy', 'block')
+		if policy == 'block':
+			printW('Modules on the event loop cannot make it wait, so this one will drop new data if it falls %s packets behind.'
+				   % (RS.qsize), thread.sender)
+		q = AsyncQueue(RS.qsize, 'drop-newest' if policy == 'drop' else policy, getattr(old, 'name', ''))
+		q.subscribe(old.channels, old.messages)
+		if isinstance(old, BroadcastReader):
+			old.ring.remove(old)
+		elif old in self.destinations:
+			self.destinations.remove(old)
+		self.destinations.append(q)
+		thread.queue = q
+		return q
+
+
+	async def _drive(self, thread):
+		'''
+		Passes each item in a sub-consumer's queue to its ``handle`` method until ``TERM``.
+
+		:param rsudp.raspberryshake.ConsumerThread thread: the sub-consumer
+		'''
+		while True:
+			d = await thread.queue.get()
+			if helpers.msg_type(d) == 'TERM':
+				thread.alive = False
+				printM('Exiting.', thread.sender)
+				return
+			try:
+				if thread.handle_blocks:
+					await self.loop.run_in_executor(None, thread.handle, d)
+				else:
+					thread.handle(d)
+			except Exception as e:
+				printE('Could not handle %s message: %s' % (helpers.msg_type(d), e), thread.sender)
+
+
+	async def _main(self):
+		'''
+		Sets up the sub-consumers and reads the port until told to stop.
+		'''
+		self.session.producer = True
+		driven = [t for t in self.threads if getattr(t, 'handle', None) is not None]
+		for thread in driven:
+			self._adopt(thread)
+		self._route()
+		self.polled = self._connect(self.threads)
+		for thread in self.threads:
+			if thread not in driven:
+				thread.start()
+		tasks = [self.loop.create_task(self._drive(t)) for t in driven]
+		printM('Running %s modules on the event loop and %s in threads.'
+			   % (len(driven), len(self.threads) - len(driven)), self.sender)
+
+		# read from a copy of the socket, so the session's stays open when the transport closes
+		transport, protocol = await self.loop.create_datagram_endpoint(
+			lambda: _Protocol(self), sock=self.session.sock.dup())
+		while self.session.producer and not self.stop:
+			if self.polled:
+				self._tasks()
+			await asyncio.sleep(0.1)
+		self.session.producer = False
+		transport.close()
+
+		print()
+		self.stats.report(self.sender)
+		printM('Sending TERM signal to threads...', self.sender)
+		self._put(helpers.msg_term())
+		if tasks:
+			await asyncio.wait(tasks, timeout=5)
+
+
+	def run(self):
+		"""
+		Runs the event loop until the Producer stops.
+		"""
+		asyncio.set_event_loop(self.loop)
+		try:
+			self.loop.run_until_complete(self._main())
+			if hasattr(self.loop, 'shutdown_default_executor'):	# python 3.9+
+				self.loop.run_until_complete(self.loop.shutdown_default_executor())
+		finally:
+			self.loop.close()
+			self._close_wake()
+		self.stop = True
+		sys.exit()
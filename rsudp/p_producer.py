@@ -1,10 +1,164 @@
-import sys
+import sys, os
+import time
+import select
+import selectors
+import socket as s
+from collections import deque
 from threading import Thread
 from rsudp import printM, printW, printE, helpers
 import rsudp.raspberryshake as RS
 from rsudp.test import TEST
 
 
+class IngestStats(object):
+	'''
+	.. versionadded:: 1.1.2
+
+	Live counters for data arriving at the port, kept by the
+	:py:class:`rsudp.p_producer.Producer` (as ``Producer.stats``).
+	These are meant to answer the question of whether missing data was
+	lost on the network or dropped because rsudp was too slow to read it:
+
+	- **timestamp gaps** between consecutive packets on a channel
+	  (the same test :py:mod:`rsudp.packetloss` uses) show packets that
+	  never arrived
+	- **kernel drops** (read from :code:`/proc/net/udp` on Linux) count
+	  packets that arrived but were thrown away because the socket's
+	  receive buffer was full
+
+	Call :py:func:`snapshot` at any time to get a copy of the counters,
+	or :py:func:`report` to log them. A running rsudp logs them when it
+	receives ``SIGUSR1`` (see :py:func:`rsudp.client.report_status`).
+
+	:param float tf: transmission frequency in milliseconds (defaults to :py:data:`rsudp.raspberryshake.tf`)
+	:param socket.socket sock: the socket to read kernel counters for (defaults to :py:data:`rsudp.raspberryshake.sock`)
+	'''
+	def __init__(self, tf=None, sock=None):
+		self.sender = 'IngestStats'
+		self.tf = tf if tf else RS.tf
+		self.sock = sock if sock else RS.sock
+		self.tre = (self.tf + self.tf * .5) / 1000. if self.tf else None	# time diff / error to identify a missed packet
+		self.start = time.time()
+		self.channels = {}
+		self.senders = {}		# datagrams received per sender address
+		self.blocked = {}		# datagrams ignored per blocked sender address
+		self.drops0 = self._kernel()['drops'] or 0
+
+	def _kernel(self):
+		'''
+		Reads the receive queue length and drop counter for the
+		Producer's socket from :code:`/proc/net/udp` (Linux only).
+
+		:rtype: dict
+		:return: ``{'rx_queue': bytes, 'drops': count, 'rcvbuf': bytes}``; values are ``None`` if unavailable
+		'''
+		k = {'rx_queue': None, 'drops': None, 'rcvbuf': None}
+		try:
+			k['rcvbuf'] = self.sock.getsockopt(s.SOL_SOCKET, s.SO_RCVBUF)
+			inode = str(os.fstat(self.sock.fileno()).st_ino)
+			for f in ('/proc/net/udp', '/proc/net/udp6'):
+				if not os.path.exists(f):
+					continue
+				with open(f, 'r') as fh:
+					for line in fh.readlines()[1:]:
+						fields = line.split()
+						if fields[9] == inode:
+							k['rx_queue'] = int(fields[4].split(':')[1], 16)
+							k['drops'] = int(fields[-1])
+							return k
+		except Exception:
+			pass
+		return k
+
+	def update(self, data, addr, blocked=False):
+		'''
+		Counts one datagram. If the Producer parses datagrams, pass the parsed
+		item, so that the header is not read again here.
+
+		:param data: the datagram
+		:type data: bytes or rsudp.raspberryshake.Packet or rsudp.raspberryshake.Message
+		:param tuple addr: the address it came from
+		:param bool blocked: whether the sender is being ignored
+		'''
+		if blocked:
+			self.blocked[addr[0]] = self.blocked.get(addr[0], 0) + 1
+			return
+		self.senders[addr[0]] = self.senders.get(addr[0], 0) + 1
+		if isinstance(data, RS.Packet):
+			chan, ts, data = data.channel, data.time, data.raw
+		elif isinstance(data, bytes) and (data[:1] == b'{'):
+			chan, ts = RS._header(data)[:2]		# one scan of the header for both fields
+		else:
+			return
+		arrival = time.time()
+		c = self.channels.get(chan)
+		if c is None:
+			self.channels[chan] = {'packets': 1, 'bytes': len(data), 'gaps': 0,
+								   'lost': 0, 'jitter': 0., 'first': ts,
+								   'time': ts, 'arrival': arrival}
+			return
+		c['packets'] += 1
+		c['bytes'] += len(data)
+		timeD = ts - c['time']
+		if self.tre and (abs(timeD) > self.tre):
+			c['gaps'] += 1
+			if timeD > 0:
+				c['lost'] += int(round(timeD / (self.tf / 1000.))) - 1
+		# inter-arrival jitter, smoothed as in RFC 3550
+		d = (arrival - c['arrival']) - timeD
+		c['jitter'] += (abs(d) - c['jitter']) / 16.
+		c['time'], c['arrival'] = ts, arrival
+
+	def snapshot(self):
+		'''
+		Returns a copy of the current counters.
+
+		.. code-block:: python
+
+			>>> PROD.stats.snapshot()
+			{'uptime': 60.2, 'channels': {'EHZ': {'packets': 241, 'bytes': 37996,
+			'gaps': 0, 'lost': 0, 'jitter': 0.0021, 'rate': 4.0, ...}},
+			'senders': {'192.168.1.2': 964}, 'blocked': {},
+			'kernel': {'rx_queue': 0, 'drops': 0, 'rcvbuf': 212992}}
+
+		:rtype: dict
+		:return: counters by channel, sender, and for the kernel socket
+		'''
+		uptime = time.time() - self.start
+		channels = {}
+		for chan, c in list(self.channels.items()):	# the Producer may add a channel meanwhile
+			c = dict(c)
+			span = c['time'] - c['first']
+			c['rate'] = round((c['packets'] - 1) / span, 3) if span > 0 else 0.
+			channels[chan] = c
+		kernel = self._kernel()
+		if kernel['drops'] is not None:
+			kernel['drops'] -= self.drops0
+		return {'uptime': round(uptime, 1), 'channels': channels,
+				'senders': dict(self.senders), 'blocked': dict(self.blocked),
+				'kernel': kernel}
+
+	def report(self, sender=None):
+		'''
+		Logs the current counters.
+
+		:param str sender: name to log the report under (defaults to ``IngestStats``)
+		'''
+		sender = sender if sender else self.sender
+		snap = self.snapshot()
+		for chan in sorted(snap['channels']):
+			c = snap['channels'][chan]
+			printM('%s: %s packets (%s bytes, %s pkt/s), %s timestamp gaps, %s packets missing, jitter %.1f ms'
+				   % (chan, c['packets'], c['bytes'], c['rate'], c['gaps'], c['lost'],
+					  c['jitter'] * 1000), sender)
+		k = snap['kernel']
+		if k['drops'] is not None:
+			printM('Kernel dropped %s packets (receive buffer %s bytes, %s bytes queued)'
+				   % (k['drops'], k['rcvbuf'], k['rx_queue']), sender)
+		for addr in snap['blocked']:
+			printM('Ignored %s packets from %s' % (snap['blocked'][addr], addr), sender)
+
+
 class Producer(Thread):
 	'''
 	Data Producer thread (see :ref:`producer-consumer`) which receives data from the port
@@ -14,11 +168,42 @@ class Producer(Thread):
 	quit gracefully and put a TERM message on the queue, which should stop all running
 	consumers.
 
+	.. versionadded:: 1.1.2
+
+		If ``parse`` is ``True``, every datagram is parsed exactly once into an immutable
+		:py:class:`rsudp.raspberryshake.Packet` or :py:class:`rsudp.raspberryshake.Message`
+		(see :py:func:`rsudp.raspberryshake.parse_message`) before it is put on the queue,
+		so that sub-consumers do not each have to parse the same bytes.
+		Parsed packets carry the ``session`` (see :py:data:`rsudp.raspberryshake.Packet.station`),
+		so that traces made from them get its station metadata. A Producer for a session
+		other than :py:data:`rsudp.raspberryshake.default` always parses, for that reason.
+
+		Ingest counters are kept in ``Producer.stats`` (an :py:class:`rsudp.p_producer.IngestStats`)
+		and logged when the Producer exits.
+
+		If ``burst`` is greater than zero, the socket is set to non-blocking mode
+		and every time data arrives, the Producer reads up to ``burst`` waiting datagrams
+		before putting them on the queue together as one
+		:py:class:`rsudp.raspberryshake.Batch`. Consumer status is then checked
+		once per burst rather than once per datagram. This lets the Producer catch up
+		quickly after a pause (i.e. a slow plot redraw) before the kernel's
+		receive buffer overflows.
+
+		Threads that are :py:class:`rsudp.raspberryshake.ConsumerThread` objects
+		send their alarms, resets, and exits to the Producer as events
+		(see :py:func:`rsudp.raspberryshake.ConsumerThread.connect`). Each event wakes
+		the Producer with an empty datagram to its own port, so it is handled right away
+		even if no data is arriving, and no thread is checked after each packet.
+		Only threads that are not ConsumerThreads are still polled.
+
 	:param queue.Queue queue: The master queue, used to pass data to :py:class:`rsudp.c_consumer.Consumer`
 	:param list threads: The list of :py:class:`threading.Thread` s to monitor for status changes
+	:param bool parse: whether to parse datagrams before putting them on the queue
+	:param int burst: maximum number of datagrams to read per burst (``0`` reads one datagram at a time)
+	:param rsudp.raspberryshake.ShakeSession session: `(optional)` the session whose socket to read (defaults to :py:data:`rsudp.raspberryshake.default`)
 	'''
 
-	def __init__(self, queue, threads, testing=False):
+	def __init__(self, queue, threads, testing=False, parse=False, burst=0, session=None):
 		"""
 		Initializing Producer thread. 
 		
@@ -30,55 +215,203 @@ class Producer(Thread):
 		self.threads = threads
 		self.stop = False
 		self.testing = testing
+		self.burst = burst
+		self.session = session if session else RS.default
+		# packets have to carry any other session, or traces get the default one's metadata
+		self.parse = parse or (self.session is not RS.default)
+		self.dgsize = 4096		# max datagram size
 
 		self.firstaddr = ''
 		self.blocked = []
+		self.stats = IngestStats(tf=self.session.tf, sock=self.session.sock)
+		self.events = deque()	# (thread, event, value, queue) from sub-consumers, see _signal
+		self.polled = []		# threads that cannot signal state changes
+		self.wakesock = s.socket(s.AF_INET, s.SOCK_DGRAM)
+		self.wake_to = None		# address of this producer's own socket
 
 		printM('Starting.', self.sender)
 
 
-	def _filter_sender(self, data, addr):
+	def _put(self, msg, batch=None, queue=None):
 		'''
-		Filter the message sender and put data on the consumer queue.
+		Put a datagram or message on the master queue, parsing it first if required
+		(items that are already parsed are put on as they are).
+
+		:param bytes msg: the datagram or message to put on the queue
+		:param rsudp.raspberryshake.Batch batch: if given, add the message to this batch instead of putting it on the queue
+		:param queue.Queue queue: `(optional)` the queue to use instead of the master queue
+		'''
+		msg = RS.parse_message(msg, self.session) if self.parse else msg
+		if batch is None:
+			(self.queue if queue is None else queue).put(msg)
+		else:
+			batch.append(msg)
+
+
+	def _filter_sender(self, data, addr, batch=None):
+		'''
+		Filter the message sender and put data on the consumer queue
+		(or in ``batch``, if given).
 		'''
+		if not data:
+			return		# a wakeup from _signal, not data
 		if self.firstaddr == '':
 			self.firstaddr = addr[0]
 			printM('Receiving UDP data from %s' % (self.firstaddr), self.sender)
 		if (self.firstaddr != '') and (addr[0] == self.firstaddr):
-			self.queue.put(data)
-			if data.decode('utf-8') == 'TERM':
-				RS.producer = False
+			item = RS.parse_message(data, self.session) if self.parse else data	# parsed once, for the stats and the queue
+			self.stats.update(item, addr)
+			if (self.session.verifying is not None) and not self.session.verify(item):
+				self.stop = True	# cached stream parameters were wrong
+			self._put(item, batch)
+			if data == b'TERM':
+				self.session.producer = False
 				self.stop = True
 		else:
+			self.stats.update(data, addr, blocked=True)
 			if addr[0] not in self.blocked:
 				printM('Another IP (%s) is sending UDP data to this port. Ignoring...'
 						% (addr[0]), self.sender)
 				self.blocked.append(addr[0])
 
 
+	def _recv_burst(self):
+		'''
+		Wait for data on the socket, then read everything available
+		(up to :py:data:`self.burst` datagrams) and put it on the queue
+		as one :py:class:`rsudp.raspberryshake.Batch`.
+		'''
+		select.select([self.session.sock], [], [])
+		batch = RS.Batch()
+		for i in range(self.burst):
+			try:
+				data, addr = self.session.sock.recvfrom(self.dgsize)
+			except (BlockingIOError, InterruptedError):
+				break
+			self._filter_sender(data, addr, batch)
+			if self.stop:
+				break
+		if batch:
+			self.queue.put(batch)
+
+
+	def _handle(self, thread, event, value, queue=None):
+		'''
+		Act on a sub-consumer's event: send an ``ALARM`` or ``RESET`` message,
+		pass on a message it published, or set the stop flag if it has stopped.
+
+		:param threading.Thread thread: the sub-consumer
+		:param str event: ``'ALARM'``, ``'RESET'``, ``'MSG'``, or ``'DEAD'``
+		:param value: the time of the alarm or reset, or the published message
+		:param queue.Queue queue: `(optional)` the queue to send messages to instead of the master queue
+		'''
+		if event == 'ALARM':
+			# if there is an alarm in a sub thread, send the ALARM message to the queues
+			self._put(helpers.msg_alarm(value), queue=queue)
+			printM('%s thread has indicated alarm state, sending ALARM message to queues'
+					% thread.sender, sender=self.sender)
+		elif event == 'RESET':
+			# if there's an alarm_reset flag in a sub thread, send a RESET message
+			self._put(helpers.msg_reset(value), queue=queue)
+			printM('%s thread has indicated alarm reset, sending RESET message to queues'
+					% thread.sender, sender=self.sender)
+		elif event == 'MSG':
+			self._put(value, queue=queue)
+		elif event == 'DEAD':
+			# if a thread stops, set the stop flag
+			self.stop = True
+
+
+	def _check(self, thread, queue=None):
+		'''
+		Poll the flags of a sub-consumer that cannot send events.
+
+		:param threading.Thread thread: the sub-consumer
+		:param queue.Queue queue: `(optional)` the queue to send messages to instead of the master queue
+		'''
+		if thread.alarm:
+			self._handle(thread, 'ALARM', thread.alarm, queue)
+			thread.alarm = False	# now re-arm the trigger
+		if thread.alarm_reset:
+			self._handle(thread, 'RESET', thread.alarm_reset, queue)
+			thread.alarm_reset = False	# re-arm the trigger
+		if not thread.alive:
+			self._handle(thread, 'DEAD', None, queue)
+
+
+	def _signal(self, thread, event, value, queue=None):
+		'''
+		.. versionadded:: 1.1.2
+
+		Receives an event from a sub-consumer. This runs in the sub-consumer's
+		thread, so it only queues the event and wakes the Producer, which handles it.
+
+		:param rsudp.raspberryshake.ConsumerThread thread: the sub-consumer
+		:param str event: ``'ALARM'``, ``'RESET'``, ``'MSG'``, or ``'DEAD'``
+		:param value: the time of the alarm or reset, or the published message
+		:param queue.Queue queue: `(optional)` the queue to send messages to instead of the master queue
+		'''
+		self.events.append((thread, event, value, queue))
+		if self.wake_to:
+			try:
+				self.wakesock.sendto(b'', self.wake_to)
+			except OSError:
+				pass	# the producer will see the event after the next packet
+
+
+	@staticmethod
+	def _loopback(sock):
+		'''
+		The address to send a wakeup datagram to for a bound socket.
+		'''
+		host, port = sock.getsockname()[:2]
+		return ('127.0.0.1' if host in ('', '0.0.0.0') else host, port)
+
+
+	def _close_wake(self):
+		'''
+		Closes the wakeup socket. Events raised after this are still queued,
+		but nothing handles them once the Producer has stopped.
+		'''
+		self.wake_to = None
+		self.wakesock.close()
+
+
+	def _drain(self):
+		'''
+		Handle the events queued by :py:func:`rsudp.p_producer.Producer._signal`.
+		'''
+		while self.events:
+			self._handle(*self.events.popleft())
+
+
+	def _connect(self, threads, queue=None):
+		'''
+		.. versionadded:: 1.1.2
+
+		Connects each :py:class:`rsudp.raspberryshake.ConsumerThread` in ``threads``
+		so that it sends its events to :py:func:`rsudp.p_producer.Producer._signal`.
+
+		:param list threads: sub-consumers to connect
+		:param queue.Queue queue: `(optional)` the queue their messages go to instead of the master queue
+		:rtype: list
+		:return: the threads that cannot send events, and so have to be polled
+		'''
+		polled = []
+		for thread in threads:
+			if isinstance(thread, RS.ConsumerThread):
+				thread.connect(lambda t, e, v, q=queue: self._signal(t, e, v, q))
+			else:
+				polled.append(thread)
+		return polled
+
+
 	def _tasks(self):
 		'''
-		Execute tasks based on the states of sub-consumers.
-		'''
-		for thread in self.threads:
-			# for each thread here
-			if thread.alarm:
-				# if there is an alarm in a sub thread, send the ALARM message to the queues
-				self.queue.put(helpers.msg_alarm(thread.alarm))
-				printM('%s thread has indicated alarm state, sending ALARM message to queues'
-						% thread.sender, sender=self.sender)
-				# now re-arm the trigger
-				thread.alarm = False
-			if thread.alarm_reset:
-				# if there's an alarm_reset flag in a sub thread, send a RESET message
-				self.queue.put(helpers.msg_reset(thread.alarm_reset))
-				printM('%s thread has indicated alarm reset, sending RESET message to queues'
-						% thread.sender, sender=self.sender)
-				# re-arm the trigger
-				thread.alarm_reset = False
-			if not thread.alive:
-				# if a thread stops, set the stop flag
-				self.stop = True
+		Execute tasks based on the states of sub-consumers that cannot signal them.
+		'''
+		for thread in self.polled:
+			self._check(thread)
 
 
 	def run(self):
@@ -87,19 +420,209 @@ class Producer(Thread):
 		it may be used to populate ObsPy streams for various things like
 		plotting, alert triggers, and ground motion calculation.
 		"""
-		RS.producer = True
-		while RS.producer:
-			data, addr = RS.sock.recvfrom(4096)
-			self._filter_sender(data, addr)
-			self._tasks()
+		self.session.producer = True
+		self.wake_to = self._loopback(self.session.sock)
+		self.polled = self._connect(self.threads)
+		if self.burst:
+			self.session.sock.setblocking(False)
+		while self.session.producer:
+			if self.burst:
+				self._recv_burst()
+			else:
+				data, addr = self.session.sock.recvfrom(self.dgsize)
+				self._filter_sender(data, addr)
+			if self.events:
+				self._drain()
+			if self.polled:
+				self._tasks()
 			if self.stop:
-				RS.producer = False
+				self.session.producer = False
 				break
 			if self.testing:
 				TEST['x_data'][1] = True
 
 		print()
+		self.stats.report(self.sender)
+		printM('Sending TERM signal to threads...', self.sender)
+		self._put(helpers.msg_term())
+		self._close_wake()
+		self.stop = True
+		sys.exit()
+
+
+class MultiProducer(Producer):
+	'''
+	.. versionadded:: 1.1.2
+
+	Data Producer for multi-station mode, which receives data from several
+	Raspberry Shakes on one or more ports in the same process.
+	Each station is a :py:class:`rsudp.raspberryshake.Station` identified by the
+	port it sends to and the address it sends from. A station without a configured
+	address claims the first sender on its port that no other station has claimed.
+	Data from any other sender is ignored.
+
+	Before consumers are set up, :py:func:`rsudp.p_producer.MultiProducer.detect`
+	learns each station's parameters from its first packets.
+	Then each station is given its own master queue and list of consumers
+	(:py:func:`rsudp.p_producer.MultiProducer.add_station`),
+	and the producer puts that station's packets (parsed, and tagged with the station),
+	and the ``ALARM`` and ``RESET`` messages from that station's consumers,
+	on that station's queue only.
+	If any consumer stops, all stations are sent a ``TERM`` message.
+
+	:param list stations: the :py:class:`rsudp.raspberryshake.Station` objects to receive data for
+	:param int rcvbuf: `(optional)` socket receive buffer size in bytes
+	:param int burst: maximum number of datagrams to read from a port at a time
+	'''
+
+	def __init__(self, stations, testing=False, rcvbuf=None, burst=64):
+		super().__init__(queue=None, threads=[], testing=testing, parse=True)
+		self.sender = 'MultiProducer'
+		self.stations = list(stations)
+		self.burst = burst
+		self.queues = {}		# master queue for each station
+		self.consumers = {}		# consumer threads for each station
+		self.stats = {}			# IngestStats for each station
+		self.routes = {}		# (address, port): station
+		self.socks = {}			# port: socket
+		self.sel = selectors.DefaultSelector()
+		for port in sorted(set(st.port for st in self.stations)):
+			sock = s.socket(s.AF_INET, s.SOCK_DGRAM)
+			if rcvbuf:
+				sock.setsockopt(s.SOL_SOCKET, s.SO_RCVBUF, int(rcvbuf))
+			try:
+				sock.bind(('', port))
+			except Exception as e:
+				printE('Could not bind to port %s. Is another program using it?' % port, self.sender)
+				printE('Detail: %s' % e, self.sender, spaces=True)
+				raise OSError(e)
+			sock.setblocking(False)
+			self.sel.register(sock, selectors.EVENT_READ, port)
+			self.socks[port] = sock
+			printM('Waiting for UDP data on port %s...' % (port), self.sender)
+		self.wake_to = self._loopback(sock)		# any one port wakes the selector
+		for st in self.stations:
+			if st.addr:
+				self.routes[(st.addr, st.port)] = st
+
+
+	def _route(self, addr, port):
+		'''
+		Find the station a datagram belongs to.
+
+		:param tuple addr: the address the datagram came from
+		:param int port: the port the datagram arrived on
+		:rtype: rsudp.raspberryshake.Station or None
+		:return: the station, or ``None`` if the sender is not a known station
+		'''
+		key = (addr[0], port)
+		st = self.routes.get(key)
+		if (st is None) and (key not in self.blocked):
+			for cand in self.stations:
+				if (cand.port == port) and (not cand.addr):
+					cand.addr = addr[0]
+					self.routes[key] = cand
+					printM('Receiving UDP data from %s on port %s for station %s'
+						   % (addr[0], port, cand.stn), self.sender)
+					return cand
+			printM('Another IP (%s) is sending UDP data to port %s. Ignoring...'
+				   % (addr[0], port), self.sender)
+			self.blocked.append(key)
+		return st
+
+
+	def _recv(self, timeout=None):
+		'''
+		Wait for data on any port, then read what is available
+		(up to :py:data:`self.burst` datagrams per port).
+
+		:param float timeout: seconds to wait for data (``None`` waits forever)
+		:rtype: list
+		:return: ``[(station, data, addr), ...]``, where station is ``None`` for unknown senders
+		'''
+		out = []
+		for key, mask in self.sel.select(timeout):
+			for i in range(self.burst):
+				try:
+					data, addr = key.fileobj.recvfrom(self.dgsize)
+				except (BlockingIOError, InterruptedError):
+					break
+				if data:	# empty datagrams are wakeups (see Producer._signal)
+					out.append((self._route(addr, key.data), data, addr))
+		return out
+
+
+	def detect(self, timeout=10):
+		'''
+		Read packets until the parameters of every station are known
+		(see :py:func:`rsudp.raspberryshake.Station.feed`), or until ``timeout``
+		seconds have passed. Stations that have not sent enough data by then are dropped.
+
+		:param float timeout: seconds to wait for all stations
+		:rtype: list
+		:return: the stations that are ready
+		'''
+		end = time.time() + timeout
+		while (time.time() < end) and not all(st.ready for st in self.stations):
+			for st, data, addr in self._recv(0.5):
+				if (st is not None) and (not st.ready) and st.feed(data):
+					printM('Available channels: %s' % st.chns, st.sender)
+		for st in [st for st in self.stations if not st.ready]:
+			printE('No data received from station %s on port %s in %s seconds; skipping it.'
+				   % (st.stn, st.port, timeout), self.sender)
+			self.stations.remove(st)
+			for key in [k for k in self.routes if self.routes[k] is st]:
+				del self.routes[key]
+		return self.stations
+
+
+	def add_station(self, station, queue, threads):
+		'''
+		Set the master queue and consumers for a station.
+
+		:param rsudp.raspberryshake.Station station: a station returned by :py:func:`rsudp.p_producer.MultiProducer.detect`
+		:param queue.Queue queue: the station's master queue, read by its :py:class:`rsudp.c_consumer.Consumer`
+		:param list threads: the station's consumer threads to monitor for status changes
+		'''
+		self.queues[station] = queue
+		self.consumers[station] = self._connect(threads, queue)	# only the ones that must be polled
+		self.stats[station] = IngestStats(tf=station.tf, sock=self.socks[station.port])
+
+
+	def _tasks(self):
+		'''
+		Execute tasks based on the states of each station's sub-consumers
+		that cannot signal them, sending any resulting messages to that station's queue.
+		'''
+		for st in self.queues:
+			for thread in self.consumers[st]:
+				self._check(thread, self.queues[st])
+
+
+	def run(self):
+		"""
+		Routes each station's data to its master queue until told to stop.
+		"""
+		self.session.producer = True
+		while self.session.producer:
+			for st, data, addr in self._recv(0.5):
+				if st in self.queues:
+					item = RS.parse_message(data, st)
+					self.stats[st].update(item, addr)
+					self.queues[st].put(item)
+			if self.events:
+				self._drain()
+			self._tasks()
+			if self.stop:
+				self.session.producer = False
+				break
+
+		print()
+		for st in self.queues:
+			self.stats[st].report(st.sender)
 		printM('Sending TERM signal to threads...', self.sender)
-		self.queue.put(helpers.msg_term())
+		for st in self.queues:
+			self.queues[st].put(RS.parse_message(helpers.msg_term()))
+		self._close_wake()
 		self.stop = True
 		sys.exit()
@@ -1,34 +1,31 @@
 import numpy as np
 import os, platform
+import time
+from collections import namedtuple
 import socket as s
 import signal
+import sys, types
+import json
+from queue import Queue, Empty
 from obspy import UTCDateTime
 from obspy.core.stream import Stream
 from obspy import read_inventory, read
 from obspy.geodetics.flinnengdahl import FlinnEngdahl
 from obspy.core.trace import Trace
-from rsudp import printM, printW, printE
+from rsudp import printM, printW, printE, default_loc
 from requests.exceptions import HTTPError
-from threading import Thread
+from threading import Thread, Lock, local
 from . import __version__
 
-initd, sockopen = False, False
 qsize = 2048 			# max queue size
-port = 8888				# default listening port
-to = 10					# socket test timeout
-firstaddr = ''			# the first address data is received from
-inv = False				# station inventory
 INVWARN = False			# warning when inventory attachment fails
-region = False
-producer = False 		# flag for producer status
-stn = 'Z0000'			# station name
-net = 'AM'				# network (this will always be AM)
-chns = []				# list of channels
-numchns = 0
+_local = local()		# per thread: the Station or ShakeSession whose parameters are loaded (see Station.__enter__)
+default = None			# the ShakeSession that this module's functions act on (created at the bottom of this file)
+params_loc = os.path.join(default_loc, 'rsudp_params.json')	# stream parameter cache (see ShakeSession.set_params)
 
-tf = None				# transmission frequency in ms
-tr = None				# transmission rate in packets per second
-sps = None				# samples per second
+# socket and station variables (initd, sockopen, sock, to, producer, port, stn, net,
+# firstaddr, chns, numchns, tf, tr, sps, inv, region) are attributes of a ShakeSession,
+# and are read and set through this module as before (see _Module at the bottom of this file)
 
 # conversion units
 # 		'name',	: ['pretty name', 'unit display']
@@ -81,30 +78,25 @@ def get_ip():
 
 ip = get_ip()
 
-# construct a socket
-socket_type =  s.SOCK_DGRAM
-sock = s.socket(s.AF_INET, socket_type)
-if platform.system() not in 'Windows':
-    sock.setsockopt(s.SOL_SOCKET, s.SO_REUSEADDR, 1)
-
 def handler(signum, frame, ip=ip):
 	'''
 	The signal handler for the nodata alarm.
 
+	.. deprecated:: 1.1.2
+
+		:py:func:`rsudp.raspberryshake.set_params` now waits for data
+		using a socket timeout (see :py:func:`rsudp.raspberryshake.ShakeSession.set_params`).
+		This function is kept for programs that set the alarm themselves.
+
 	:param int signum: signal number
 	:param int frame: frame number
 	:param str ip: the IP of the box this program is running on (i.e. the device the Raspberry Shake should send data to)
 	:raise IOError: on UNIX systems if no data is received
 	'''
-	global port
-	printE('No data received in %s seconds; aborting.' % (to), sender='Init')
-	printE('Check that the Shake is forwarding data to:', sender='Init', announce=False, spaces=True)
-	printE('IP address: %s    Port: %s' % (ip, port), sender='Init', announce=False, spaces=True)
-	printE('and that no firewall exists between the Shake and this computer.', sender='Init', announce=False, spaces=True)
-	raise IOError('No data received')
+	default._nodata(ip)
 
 
-def initRSlib(dport=port, rsstn='Z0000', timeout=10):
+def initRSlib(dport=8888, rsstn='Z0000', timeout=10, rcvbuf=None, cache=None):
 	'''
 	.. role:: pycode(code)
 		:language: python
@@ -128,53 +120,17 @@ def initRSlib(dport=port, rsstn='Z0000', timeout=10):
 	:param int dport: The local port the Raspberry Shake is sending UDP data packets to. Defaults to :pycode:`8888`.
 	:param str rsstn: The name of the station (something like :pycode:`'RCB43'` or :pycode:`'S0CDE'`)
 	:param int timeout: The number of seconds for :py:func:`rsudp.raspberryshake.set_params` to wait for data before an error is raised (zero for unlimited wait)
+	:param int rcvbuf: `(optional)` socket receive buffer size in bytes (see :py:func:`rsudp.raspberryshake.openSOCK`)
+	:param str cache: `(optional)` stream parameter cache file to start from (see :py:func:`rsudp.raspberryshake.set_params`)
 
 	:rtype: str
 	:return: The instrument channel as a string
 
 	'''
-	global port, stn, to, initd, port
-	global producer
-	sender = 'RS lib'
-	printM('Initializing rsudp v %s.' % (__version__), sender)
-	try:						# set port value first
-		if dport == int(dport):
-			port = int(dport)
-		else:
-			port = int(dport)
-			printW('Supplied port value was converted to integer. Non-integer port numbers are invalid.')
-	except Exception as e:
-		printE('Details - %s' % e)
+	printM('Initializing rsudp v %s.' % (__version__), 'RS lib')
+	default.init(dport=dport, rsstn=rsstn, timeout=timeout, rcvbuf=rcvbuf, cache=cache)
 
-	try:						# set station name
-		if len(rsstn) == 5:
-			stn = str(rsstn).upper()
-		else:
-			stn = str(rsstn).upper()
-			printW('Station name does not follow Raspberry Shake naming convention.')
-	except ValueError as e:
-		printE('Invalid station name supplied. Details: %s' % e)
-		printE('reverting to station name Z0000', announce=False, spaces=True)
-	except Exception as e:
-		printE('Details - %s' % e)
-	
-	try:						# set timeout value 
-		to = int(timeout)
-	except ValueError as e:
-		printW('You likely supplied a non-integer as the timeout value. Your value was: %s'
-				% timeout)
-		printW('Continuing with default timeout of %s sec'
-				% (to), announce=False, spaces=True)
-		printW('details: %s' % e, announce=False, spaces=True)
-	except Exception as e:
-		printE('Details - %s' % e)
-
-	initd = True				# if initialization goes correctly, set initd to true
-	openSOCK()					# open a socket
-	printM('Waiting for UDP data on port %s...' % (port), sender)
-	set_params()				# get data and set parameters
-
-def openSOCK(host=''):
+def openSOCK(host='', rcvbuf=None):
 	'''
 	.. role:: pycode(code)
 		:language: python
@@ -183,27 +139,14 @@ def openSOCK(host=''):
 	Called by :py:func:`rsudp.raspberryshake.initRSlib`, must be done before :py:func:`rsudp.raspberryshake.set_params`.
 
 	:param str host: self-referential location at which to open a listening port (defaults to :pycode:`''` which resolves to :pycode:`'localhost'`)
+	:param int rcvbuf: `(optional)` size of the socket's receive buffer in bytes. A bigger buffer holds more packets while the program is busy. The operating system may adjust this value (Linux doubles it and caps it at ``net.core.rmem_max``).
 	:raise IOError: if the library is not initialized (:py:func:`rsudp.raspberryshake.initRSlib`) prior to running this function
 	:raise OSError: if the program cannot bind to the specified port number
 
 	'''
-	global sockopen
-	sockopen = False
-	if initd:
-		HP = '%s:%s' % ('localhost',port)
-		printM("Opening socket on %s (HOST:PORT)"
-				% HP, 'openSOCK')
-		try:
-			sock.bind((host, port))
-			sockopen = True
-		except Exception as e:
-			printE('Could not bind to port %s. Is another program using it?' % port)
-			printE('Detail: %s' % e, announce=False)
-			raise OSError(e)
-	else:
-		raise IOError("Before opening a socket, you must initialize this raspberryshake library by calling initRSlib(dport=XXXXX, rssta='R0E05') first.")
+	default.open(host=host, rcvbuf=rcvbuf)
 
-def set_params():
+def set_params(cache=None):
 	'''
 	.. role:: pycode(code)
 		:language: python
@@ -212,23 +155,20 @@ def set_params():
 	Called by :py:func:`rsudp.raspberryshake.initRSlib`,
 	must be done after :py:func:`rsudp.raspberryshake.openSOCK`
 	but before :py:func:`rsudp.raspberryshake.getDATA`.
-	Will wait :pycode:`rsudp.raspberryshake.to` seconds for data before raising a no data exception
-	(only available with UNIX socket types).
-
-	'''
-	global to, firstaddr
-	if os.name not in 'nt': 	# signal alarm not available on windows
-		signal.signal(signal.SIGALRM, handler)
-		signal.alarm(to)		# alarm time set with timeout value
-	data, (firstaddr, connport) = sock.recvfrom(2048)
-	if os.name not in 'nt':
-		signal.alarm(0)			# once data has been received, turn alarm completely off
-	to = 0						# otherwise it erroneously triggers after keyboardinterrupt
-	getTR(getCHNS()[0])
-	getSR(tf, data)
-	getTTLCHN()
-	printM('Available channels: %s' % chns, 'Init')
-	get_inventory()
+	Will wait :pycode:`rsudp.raspberryshake.to` seconds for data before raising a no data exception.
+
+	.. versionadded:: 1.1.2
+
+		If ``cache`` is the path of a stream parameter cache file
+		(i.e. :pycode:`rsudp.raspberryshake.params_loc`) that has an entry for this
+		station, port, and sender, those parameters are used right away instead of
+		waiting for several seconds of data to detect them.
+		They are then checked against live data as it arrives
+		(see :py:func:`rsudp.raspberryshake.ShakeSession.verify`).
+
+	:param str cache: `(optional)` path of the stream parameter cache file
+	'''
+	default.set_params(cache=cache)
 
 def getDATA():
 	'''
@@ -254,15 +194,179 @@ def getDATA():
 	:raise IOError: if the library is not initialized (:py:func:`rsudp.raspberryshake.initRSlib`) prior to running this function
 
 	'''
-	global to, firstaddr
-	if sockopen:
-		return sock.recv(4096)
-	else:
-		if initd:
-			raise IOError("No socket is open. Please open a socket using this library's openSOCK() function.")
-		else:
-			raise IOError('No socket is open. Please initialize the library using initRSlib() then open a socket using openSOCK().')
-	
+	return default.get_data()
+
+
+class Packet(namedtuple('Packet', ['channel', 'time', 'data', 'raw', 'station'])):
+	'''
+	.. role:: pycode(code)
+		:language: python
+
+	A compact, parsed Raspberry Shake data packet, as returned by
+	:py:func:`rsudp.raspberryshake.parse_packet`.
+	Fields are the channel code (:py:class:`str`), the packet timestamp in
+	decimal seconds since 1970-01-01 00:00:00Z (:py:class:`float`), the samples
+	as a :py:class:`numpy.ndarray` of type :pycode:`numpy.int32`,
+	the original packet as :py:class:`bytes`,
+	and (in multi-station mode) the :py:class:`rsudp.raspberryshake.Station`
+	the packet came from, or ``None``.
+
+	.. code-block:: python
+
+		>>> p = rs.parse_packet(d)
+		>>> p.channel, p.time, len(p.data)
+		('EHZ', 1582315130.292, 25)
+
+	Packets behave like the bytes they were parsed from when passed to
+	:py:func:`str` or :py:func:`bytes`, or when decoded, so that consumers written
+	for raw queue messages keep working when the
+	:py:class:`rsudp.p_producer.Producer` is set to parse packets (see :ref:`producer-consumer`).
+	'''
+	__slots__ = ()
+
+	def __str__(self):
+		return str(self.raw)
+
+	def __bytes__(self):
+		return self.raw
+
+	def decode(self, *args, **kwargs):
+		return self.raw.decode(*args, **kwargs)
+
+Packet.__new__.__defaults__ = (None,)	# station
+
+
+class Message(namedtuple('Message', ['kind', 'time', 'path', 'raw'])):
+	'''
+	.. versionadded:: 1.1.2
+
+	A parsed queue message (see :ref:`message-types`), as returned by
+	:py:func:`rsudp.raspberryshake.parse_message`.
+	Fields are the message type (for example :pycode:`'ALARM'` or :pycode:`'TERM'`),
+	the message time as a :py:class:`obspy.core.utcdatetime.UTCDateTime` (or ``None``),
+	the image path for ``IMGPATH`` messages (or ``None``),
+	and the original message as :py:class:`bytes`.
+
+	Like :py:class:`rsudp.raspberryshake.Packet`, messages behave like their
+	original bytes when passed to :py:func:`str` or :py:func:`bytes`, or when decoded.
+	'''
+	__slots__ = ()
+
+	def __str__(self):
+		return str(self.raw)
+
+	def __bytes__(self):
+		return self.raw
+
+	def decode(self, *args, **kwargs):
+		return self.raw.decode(*args, **kwargs)
+
+
+class Batch(list):
+	'''
+	.. versionadded:: 1.1.2
+
+	A list of queue items received from the port in one burst.
+	When burst ingest is on (see :py:class:`rsudp.p_producer.Producer`),
+	the Producer puts one of these on the master queue per burst
+	instead of one item per datagram, and
+	:py:class:`rsudp.c_consumer.Consumer` unpacks it in order, so
+	sub-consumers never see a Batch.
+	'''
+	__slots__ = ()
+
+
+def _header(DP):
+	'''
+	Scan the header of a data packet exactly once.
+	Used by :py:func:`rsudp.raspberryshake.parse_packet` and the
+	single-field accessors that only need the channel or timestamp.
+
+	:param bytes DP: The Raspberry Shake UDP data packet
+	:rtype: str, float, int
+	:return: The channel, the timestamp, and the offset of the comma preceding the first sample
+	:raise ValueError: if DP is not a data packet
+	'''
+	c1 = DP.index(b',')
+	c2 = DP.index(b',', c1 + 1)
+	return DP[1:c1].strip(b"'").decode('utf-8'), float(DP[c1+1:c2]), c2
+
+
+def parse_packet(DP):
+	'''
+	.. versionadded:: 1.1.2
+
+	Parse a data packet in a single pass over the buffer, returning its channel,
+	timestamp, and samples. This is the fast path underlying
+	:py:func:`rsudp.raspberryshake.getCHN`, :py:func:`rsudp.raspberryshake.getTIME`,
+	:py:func:`rsudp.raspberryshake.getSTREAM`, and :py:func:`rsudp.raspberryshake.make_trace`.
+
+	In this example, we parse a Shake 1Dv7 data packet:
+
+	.. code-block:: python
+
+		>>> import rsudp.raspberryshake as rs
+		>>> rs.initRSlib(dport=8888, rsstn='R3BCF')
+		>>> d = rs.getDATA()
+		>>> p = rs.parse_packet(d)
+		>>> p
+		Packet(channel='EHZ', time=1582315130.292, data=array([14168, 14927, 16112, 17537, 18052, 17477,
+		15418, 13716, 15604, 17825, 19637, 20985, 17325, 10439, 11510, 17678,
+		20027, 20207, 18481, 15916, 13836, 13073, 14462, 17628, 19388], dtype=int32))
+
+	:param DP: The Raspberry Shake UDP data packet (:py:func:`rsudp.raspberryshake.getDATA`) to parse
+	:type DP: bytes or rsudp.raspberryshake.Packet
+	:rtype: rsudp.raspberryshake.Packet
+	:return: The parsed packet
+	:raise ValueError: if DP is not a data packet
+	'''
+	if isinstance(DP, Packet):
+		return DP
+	ch, t, c2 = _header(DP)
+	end = DP.rfind(b'}')
+	data = np.fromstring(DP[c2+1:end if end > 0 else len(DP)], dtype=np.int32, sep=',')
+	return Packet(ch, t, data, DP)
+
+
+def parse_message(d, station=None):
+	'''
+	.. versionadded:: 1.1.2
+
+	Parse a queue item exactly once into an immutable typed record.
+	Data packets become :py:class:`rsudp.raspberryshake.Packet` objects
+	(whose sample arrays are read-only, since they are shared between consumers),
+	and ``ALARM``, ``RESET``, ``IMGPATH``, ``INTENSITY``, and ``TERM`` messages become
+	:py:class:`rsudp.raspberryshake.Message` objects.
+	Items that have already been parsed are returned unchanged.
+
+	.. code-block:: python
+
+		>>> rs.parse_message(b'ALARM 2020-01-01T00:00:00.599Z')
+		Message(kind='ALARM', time=UTCDateTime(2020, 1, 1, 0, 0, 0, 599000), path=None, raw=b'ALARM 2020-01-01T00:00:00.599Z')
+		>>> rs.parse_message(b'TERM')
+		Message(kind='TERM', time=None, path=None, raw=b'TERM')
+
+	:param d: a data packet or queue message
+	:type d: bytes or rsudp.raspberryshake.Packet or rsudp.raspberryshake.Message
+	:param rsudp.raspberryshake.Station station: `(optional)` the station a data packet came from
+	:rtype: rsudp.raspberryshake.Packet or rsudp.raspberryshake.Message
+	:return: the parsed record
+	'''
+	if isinstance(d, (Packet, Message)):
+		return d
+	if d[:1] == b'{':
+		p = parse_packet(d)
+		p.data.flags.writeable = False
+		return p._replace(station=station) if station else p
+	parts = d.decode('utf-8').strip().split(' ', 2)
+	t, path = None, None
+	if (len(parts) > 1) and (parts[0] in ('ALARM', 'RESET', 'IMGPATH', 'INTENSITY')):
+		t = UTCDateTime.strptime(parts[1], '%Y-%m-%dT%H:%M:%S.%fZ')
+		if (len(parts) > 2) and (parts[0] == 'IMGPATH'):
+			path = parts[2]
+	return Message(parts[0], t, path, d)
+
+
 def getCHN(DP):
 	'''
 	Extract the channel information from the data packet.
@@ -279,12 +383,20 @@ def getCHN(DP):
 		'EHZ'
 
 	:param DP: The Raspberry Shake UDP data packet (:py:func:`rsudp.raspberryshake.getDATA`) to parse channel information from
-	:type DP: bytes
+	:type DP: bytes or rsudp.raspberryshake.Packet
 	:rtype: str
 	:return: Returns the instrument channel as a string.
 	'''
-	return str(DP.decode('utf-8').split(",")[0][1:]).strip("\'")
-	
+	if isinstance(DP, Packet):
+		return DP.channel
+	if isinstance(DP, Message):
+		return ''
+	try:
+		return _header(DP)[0]
+	except ValueError:
+		# not a data packet (i.e. a queue message); callers only test membership
+		return DP[1:].decode('utf-8')
+
 def getTIME(DP):
 	'''
 	Extract the timestamp from the data packet.
@@ -307,11 +419,13 @@ def getTIME(DP):
 		UTCDateTime(2020, 2, 21, 19, 58, 50, 292000)
 
 	:param DP: The Raspberry Shake UDP data packet (:py:func:`rsudp.raspberryshake.getDATA`) to parse time information from
-	:type DP: bytes
+	:type DP: bytes or rsudp.raspberryshake.Packet
 	:rtype: float
 	:return: Timestamp in decimal seconds since 1970-01-01 00:00:00Z
 	'''
-	return float(DP.split(b",")[1])
+	if isinstance(DP, Packet):
+		return DP.time
+	return _header(DP)[1]
 
 def getSTREAM(DP):
 	'''
@@ -331,12 +445,18 @@ def getSTREAM(DP):
 		 17825, 19637, 20985, 17325, 10439, 11510, 17678, 20027, 20207,
 		 18481, 15916, 13836, 13073, 14462, 17628, 19388]
 
+	.. note::
+
+		Code that can work with a :py:class:`numpy.ndarray` should use
+		:py:func:`rsudp.raspberryshake.parse_packet` instead, which avoids
+		building a Python list.
+
 	:param DP: The Raspberry Shake UDP data packet (:py:func:`rsudp.raspberryshake.getDATA`) to parse stream information from
-	:type DP: bytes
+	:type DP: bytes or rsudp.raspberryshake.Packet
 	:rtype: list
 	:return: List of data samples in the packet
 	'''
-	return list(map(int, DP.decode('utf-8').replace('}','').split(',')[2:]))
+	return parse_packet(DP).data.tolist()
 
 def getTR(chn):				# DP transmission rate in msecs
 	'''
@@ -360,22 +480,7 @@ def getTR(chn):				# DP transmission rate in msecs
 	:rtype: int
 	:return: Transmission rate in milliseconds between consecutive packets from a specific channel
 	'''
-	global tf, tr
-	timeP1, timeP2 = 0.0, 0.0
-	done = False
-	while not done:
-		DP = getDATA()
-		CHAN = getCHN(DP)
-		if CHAN == chn:
-			if timeP1 == 0.0:
-				timeP1 = getTIME(DP)
-			else:
-				timeP2 = getTIME(DP)
-				done = True
-	TR = timeP2*1000 - timeP1*1000
-	tf = int(TR)
-	tr = int(1000 / TR)
-	return tf
+	return default.get_tr(chn)
 
 def getSR(TR, DP):
 	'''
@@ -404,9 +509,7 @@ def getSR(TR, DP):
 	:rtype: int
 	:return: The sample rate in samples per second from a specific channel
 	'''
-	global sps
-	sps = int((DP.count(b",") - 1) * 1000 / TR)
-	return sps
+	return default.get_sr(TR, DP)
 	
 def getCHNS():
 	'''
@@ -425,33 +528,7 @@ def getCHNS():
 	:rtype: list
 	:return: The list of channels being sent to the port (from the single IP address sending data)
 	'''
-	global chns
-	chdict = {'EHZ': False, 'EHN': False, 'EHE': False,
-			  'ENZ': False, 'ENN': False, 'ENE': False, 'HDF': False}
-	firstCHN = ''
-	done = False
-	sim = 0
-	while not done:
-		DP = getDATA()
-		if firstCHN == '':
-			firstCHN = getCHN(DP)
-			chns.append(firstCHN)
-			continue
-		nextCHN = getCHN(DP)
-		if firstCHN == nextCHN:
-			if sim > 1:
-				done = True
-				continue
-			sim += 1
-		else:
-			chns.append(nextCHN)
-	for ch in chns:
-		chdict[ch] = True
-	chns = []
-	for ch in chdict:
-		if chdict[ch] == True:
-			chns.append(ch)
-	return chns
+	return default.get_chns()
 
 def getTTLCHN():
 	'''
@@ -470,9 +547,120 @@ def getTTLCHN():
 	:rtype: int
 	:return: The number of channels being sent to the port (from the single IP address sending data)
 	'''
-	global numchns
-	numchns = len(getCHNS())
-	return numchns
+	return default.get_ttlchn()
+
+
+def _inv_paths(cache_dir, network, station):
+	'''
+	Returns the paths of the cached StationXML file and its metadata file
+	(download time and region) for a station.
+
+	:param str cache_dir: inventory cache directory
+	:param str network: network code
+	:param str station: station code
+	:rtype: tuple
+	:return: ``(xml path, json path)``
+	'''
+	base = os.path.join(cache_dir, '%s.%s' % (network, station))
+	return base + '.xml', base + '.json'
+
+
+def read_cached_inventory(network, station, cache_dir):
+	'''
+	.. versionadded:: 1.1.2
+
+	Reads a station inventory from the on-disk inventory cache
+	(see :py:func:`rsudp.raspberryshake.Station.get_inventory`).
+	The cache holds one StationXML file per station, named
+	:code:`NET.STATION.xml`, next to a small :code:`NET.STATION.json` file
+	holding the time it was downloaded and the station's Flinn-Engdahl region.
+	A StationXML file placed in the cache by hand (without the json file)
+	is read as well, and treated as out of date.
+
+	:param str network: network code
+	:param str station: station code
+	:param str cache_dir: inventory cache directory
+	:rtype: tuple
+	:return: the inventory, region, and download time in unix seconds (``(False, False, 0)`` if there is no usable cached inventory)
+	'''
+	xml, meta = _inv_paths(cache_dir, network, station)
+	try:
+		inventory = read_inventory(xml, format='STATIONXML')
+	except Exception:
+		return False, False, 0
+	try:
+		with open(meta, 'r') as f:
+			m = json.load(f)
+		reg, fetched = m['region'], float(m['fetched'])
+	except (OSError, ValueError, KeyError, TypeError):
+		reg, fetched = False, 0
+	if not reg:
+		try:
+			reg = FlinnEngdahl().get_region(inventory[0][-1].longitude, inventory[0][-1].latitude)
+		except IndexError:
+			reg = False
+	return inventory, reg, fetched
+
+
+def _save_cached_inventory(inventory, reg, network, station, cache_dir, sender='get_inventory'):
+	'''
+	Writes a station inventory and its region to the inventory cache.
+	Files are written under temporary names and then renamed, so a reader
+	never sees a partly written file.
+
+	:param obspy.core.inventory.inventory.Inventory inventory: the inventory to save
+	:param str reg: the station's Flinn-Engdahl region
+	:param str network: network code
+	:param str station: station code
+	:param str cache_dir: inventory cache directory
+	:param str sender: the name to log messages under
+	'''
+	xml, meta = _inv_paths(cache_dir, network, station)
+	try:
+		os.makedirs(cache_dir, exist_ok=True)
+		inventory.write(xml + '.tmp', format='STATIONXML')
+		with open(meta + '.tmp', 'w') as f:
+			json.dump({'region': reg, 'fetched': time.time()}, f)
+		os.replace(xml + '.tmp', xml)
+		os.replace(meta + '.tmp', meta)
+	except Exception as e:
+		printW('Could not save inventory to cache: %s' % e, sender)
+
+
+def _fetch_inventory(network, station, sender='get_inventory'):
+	'''
+	Downloads a station inventory from the Raspberry Shake FDSN server.
+
+	:param str network: network code
+	:param str station: station code
+	:param str sender: the name to log messages under
+	:rtype: tuple
+	:return: the inventory and the station's Flinn-Engdahl region (``(False, False)`` on failure)
+	'''
+	inventory, reg = False, False
+	if 'Z0000' in station:
+		printW('No station name given, continuing without inventory.',
+				sender)
+	else:
+		try:
+			printM('Fetching inventory for station %s.%s from Raspberry Shake FDSN.'
+					% (network, station), sender)
+			url = 'https://fdsnws.raspberryshakedata.com/fdsnws/station/1/query?network=%s&station=%s&level=resp&nodata=404&format=xml' % (
+				   network, station)#, str(UTCDateTime.now()-timedelta(seconds=14400)))
+			inventory = read_inventory(url)
+			reg = FlinnEngdahl().get_region(inventory[0][-1].longitude, inventory[0][-1].latitude)
+			printM('Inventory fetch successful. Station region is %s' % (reg), sender)
+		except (IndexError, HTTPError):
+			printW('No inventory found for %s. Are you forwarding your Shake data?' % station, sender)
+			printW('Deconvolution will only be available if data forwarding is on.', sender, spaces=True)
+			printW('Access the config page of the web front end for details.', sender, spaces=True)
+			printW('More info at https://manual.raspberryshake.org/quickstart.html', sender, spaces=True)
+			inventory, reg = False, False
+		except Exception as e:
+			printE('Inventory fetch failed!', sender)
+			printE('Error detail: %s' % e, sender, spaces=True)
+			inventory, reg = False, False
+	return inventory, reg
 
 
 def get_inventory(sender='get_inventory'):
@@ -507,34 +695,147 @@ def get_inventory(sender='get_inventory'):
 	:rtype: obspy.core.inventory.inventory.Inventory or bool
 	:return: The inventory of the Raspberry Shake station in the :pycode:`rsudp.raspberryshake.stn` variable.
 	'''
-	global inv, stn, region
-	sender = 'get_inventory'
-	if 'Z0000' in stn:
-		printW('No station name given, continuing without inventory.',
-				sender)
-		inv = False
-	else:
-		try:
-			printM('Fetching inventory for station %s.%s from Raspberry Shake FDSN.'
-					% (net, stn), sender)
-			url = 'https://fdsnws.raspberryshakedata.com/fdsnws/station/1/query?network=%s&station=%s&level=resp&nodata=404&format=xml' % (
-				   net, stn)#, str(UTCDateTime.now()-timedelta(seconds=14400)))
-			inv = read_inventory(url)
-			region = FlinnEngdahl().get_region(inv[0][-1].longitude, inv[0][-1].latitude)
-			printM('Inventory fetch successful. Station region is %s' % (region), sender)
-		except (IndexError, HTTPError):
-			printW('No inventory found for %s. Are you forwarding your Shake data?' % stn, sender)
-			printW('Deconvolution will only be available if data forwarding is on.', sender, spaces=True)
-			printW('Access the config page of the web front end for details.', sender, spaces=True)
-			printW('More info at https://manual.raspberryshake.org/quickstart.html', sender, spaces=True)
-			inv = False
-			region = False
-		except Exception as e:
-			printE('Inventory fetch failed!', sender)
-			printE('Error detail: %s' % e, sender, spaces=True)
-			inv = False
-			region = False
-	return inv
+	return default.get_inventory(sender='get_inventory')
+
+
+def _epochs(inventory):
+	'''
+	Lists the channel epochs in an inventory.
+
+	:param obspy.core.inventory.inventory.Inventory inventory: the inventory to read
+	:rtype: list
+	:return: ``[(trace id, start, end, channel), ...]`` with start and end in nanoseconds (or ``None`` if open)
+	'''
+	epochs = []
+	for n in inventory:
+		for st in n:
+			for ch in st:
+				epochs.append(('%s.%s.%s.%s' % (n.code, st.code, ch.location_code, ch.code),
+							   ch.start_date.ns if ch.start_date else None,
+							   ch.end_date.ns if ch.end_date else None, ch))
+	return epochs
+
+
+class ResponseCache(object):
+	'''
+	.. versionadded:: 1.1.2
+
+	Instrument responses from an inventory, keyed by trace ID and channel epoch
+	(``{(trace id, start ns, end ns): response}``).
+	The cache is only rebuilt when the inventory's channel epochs change,
+	so updating it again with the same inventory is cheap.
+	Each :py:class:`rsudp.raspberryshake.Station` (and therefore each
+	:py:class:`rsudp.raspberryshake.ShakeSession`) keeps its own
+	(see :py:func:`rsudp.raspberryshake.get_response`).
+
+	Several consumer threads may look up responses at the same time, and the
+	first to see a new inventory rebuilds the cache. The new cache is built
+	separately and then swapped in, so the others never see it half built.
+	'''
+	def __init__(self):
+		self.resps = {}
+		self.inv = False		# the inventory that resps was built from
+		self.sig = None			# channel epochs of that inventory
+		self.hits = {}			# most recent cache key matched for each trace id
+		self.lock = Lock()		# one rebuild at a time
+
+	def update(self, inventory):
+		'''
+		Fills the cache from an inventory.
+
+		:param inventory: the inventory to cache responses from
+		:type inventory: obspy.core.inventory.inventory.Inventory or bool
+		:rtype: dict
+		:return: the response cache, ``{(trace id, start ns, end ns): response}``
+		'''
+		with self.lock:
+			if inventory:
+				epochs = _epochs(inventory)
+				sig = [(e[0], e[1], e[2]) for e in epochs]
+				if sig != self.sig:
+					resps = {}
+					for tid, start, end, ch in epochs:
+						resps[(tid, start, end)] = ch.response
+					self.resps, self.sig, self.hits = resps, sig, {}
+			else:
+				self.resps, self.sig, self.hits = {}, None, {}
+			self.inv = inventory
+			return self.resps
+
+	def get(self, tid, time, inventory):
+		'''
+		Looks up an instrument response, updating the cache first if
+		``inventory`` is not the one it was built from.
+
+		:param str tid: the trace ID (i.e. ``'AM.R940D.00.EHZ'``)
+		:param time: the time the response should be valid for
+		:type time: obspy.core.utcdatetime.UTCDateTime
+		:param inventory: the inventory the response should come from
+		:type inventory: obspy.core.inventory.inventory.Inventory or bool
+		:rtype: obspy.core.inventory.response.Response
+		:return: the instrument response
+		:raises Exception: if there is no matching response (same as ObsPy)
+		'''
+		if inventory is not self.inv:
+			self.update(inventory)		# someone swapped the inventory out from under us
+		ns = time.ns if isinstance(time, UTCDateTime) else UTCDateTime(time).ns
+		resps, hits = self.resps, self.hits		# the same cache throughout, even if another thread swaps it
+		keys = [hits[tid]] if tid in hits else []
+		for key in keys + list(resps):
+			k, start, end = key
+			if (key in resps) and (k == tid) and ((start is None) or (start <= ns)) and ((end is None) or (ns <= end)):
+				hits[tid] = key
+				return resps[key]
+		raise Exception('No matching response information found.')
+
+
+def cache_responses(inventory=None):
+	'''
+	.. versionadded:: 1.1.2
+
+	Fills the library's instrument response cache from an inventory
+	(by default, :py:data:`rsudp.raspberryshake.inv`).
+	The cache is keyed by trace ID and channel epoch, and is only rebuilt
+	when the inventory's channel epochs change, so calling this again with
+	the same inventory is cheap.
+	:py:func:`rsudp.raspberryshake.get_inventory` calls this when it
+	downloads an inventory.
+
+	:param inventory: the inventory to cache responses from
+	:type inventory: obspy.core.inventory.inventory.Inventory or bool or None
+	:rtype: dict
+	:return: the response cache, ``{(trace id, start ns, end ns): response}``
+	'''
+	return default.respcache.update(default.inv if inventory is None else inventory)
+
+
+def get_response(tid, time, station=None):
+	'''
+	.. versionadded:: 1.1.2
+
+	Looks up the instrument response for a channel in the response cache
+	(see :py:func:`rsudp.raspberryshake.cache_responses`).
+	This returns the same thing as
+	:py:func:`obspy.core.inventory.inventory.Inventory.get_response`
+	without searching through the inventory every time.
+
+	.. code-block:: python
+
+		>>> rs.get_response('AM.R940D.00.EHZ', rs.UTCDateTime.now())
+		Channel Response
+			From M/S (Velocity in Meters per Second) to COUNTS (Digital Counts)
+			...
+
+	:param str tid: the trace ID (i.e. ``'AM.R940D.00.EHZ'``)
+	:param time: the time the response should be valid for
+	:type time: obspy.core.utcdatetime.UTCDateTime
+	:param rsudp.raspberryshake.Station station: `(optional)` look in this station's inventory instead of :py:data:`rsudp.raspberryshake.inv`
+	:rtype: obspy.core.inventory.response.Response
+	:return: the instrument response
+	:raises Exception: if there is no matching response (same as ObsPy)
+	'''
+	st = station if station else _active()
+	return st.respcache.get(tid, time, st.inv)
 
 
 def make_trace(d):
@@ -553,40 +854,53 @@ def make_trace(d):
 		AM.R3BCF.00.EHZ | 2020-02-21T19:58:50.292000Z - 2020-02-21T19:58:50.532000Z | 100.0 Hz, 25 samples
 
 	:param d: The Raspberry Shake UDP data packet (:py:func:`rsudp.raspberryshake.getDATA`) to parse Trace information from
-	:type d: bytes
+	:type d: bytes or rsudp.raspberryshake.Packet
 	:rtype: obspy.core.trace.Trace
 	:return: A fully formed Trace object to build a Stream with
 	'''
-	global INVWARN
-	ch = getCHN(d)						# channel
-	if ch:
-		t = getTIME(d)				# unix epoch time since 1970-01-01 00:00:00Z; "timestamp" in obspy
-		st = getSTREAM(d)				# samples in data packet in list [] format
-		tr = Trace(data=np.ma.MaskedArray(st, dtype=np.int32))	# create empty trace
-		tr.stats.network = net			# assign values
-		tr.stats.location = '00'
-		tr.stats.station = stn
-		tr.stats.channel = ch
-		tr.stats.sampling_rate = sps
-		tr.stats.starttime = UTCDateTime(t, precision=3)
-		if inv:
-			try:
-				tr.stats.response = inv.get_response(tr.id, tr.stats.starttime)
-			except Exception as e:
-				if not INVWARN:
-					INVWARN = True
-					printE(e, sender='make_trace')
-					printE('Could not attach inventory response.', sender='make_trace')
-					printE('Are you sure you set the station name correctly?', spaces=True, sender='make_trace')
-					printE('This could indicate a mismatch in the number of data channels', spaces=True, sender='make_trace')
-					printE('between the inventory and the stream. For example,', spaces=True, sender='make_trace')
-					printE('if you are receiving RS4D data, please make sure', spaces=True, sender='make_trace')
-					printE('the inventory you download has 4 channels.', spaces=True, sender='make_trace')
-				else:
-					pass
+	p = parse_packet(d)					# channel, time, and samples in one pass
+	if p.channel:
+		tr = Trace(data=np.ma.MaskedArray(p.data, dtype=np.int32, copy=True))	# packet samples may be shared between consumers
+		_set_stats(tr, p.channel, p.time, p.station)
 		return tr
 
 
+def _set_stats(tr, chan, starttime, station=None):
+	'''
+	Assigns station metadata and (if available) the instrument response to a Trace.
+	Shared by :py:func:`rsudp.raspberryshake.make_trace` and
+	:py:func:`rsudp.raspberryshake.RingStream.to_stream`.
+
+	:param obspy.core.trace.Trace tr: the trace to fill in
+	:param str chan: the channel name
+	:param float starttime: unix epoch time of the first sample
+	:param rsudp.raspberryshake.Station station: `(optional)` the station the data came from (defaults to this library's station)
+	'''
+	global INVWARN
+	st = station if station else _active()
+	tr.stats.network = st.net			# assign values
+	tr.stats.location = '00'
+	tr.stats.station = st.stn
+	tr.stats.channel = chan
+	tr.stats.sampling_rate = st.sps
+	tr.stats.starttime = UTCDateTime(starttime, precision=3)	# unix epoch time since 1970-01-01 00:00:00Z; "timestamp" in obspy
+	if st.inv:
+		try:
+			tr.stats.response = get_response(tr.id, tr.stats.starttime, st)
+		except Exception as e:
+			if not INVWARN:
+				INVWARN = True
+				printE(e, sender='make_trace')
+				printE('Could not attach inventory response.', sender='make_trace')
+				printE('Are you sure you set the station name correctly?', spaces=True, sender='make_trace')
+				printE('This could indicate a mismatch in the number of data channels', spaces=True, sender='make_trace')
+				printE('between the inventory and the stream. For example,', spaces=True, sender='make_trace')
+				printE('if you are receiving RS4D data, please make sure', spaces=True, sender='make_trace')
+				printE('the inventory you download has 4 channels.', spaces=True, sender='make_trace')
+			else:
+				pass
+
+
 # Then make repeated calls to this, to continue adding trace data to the stream
 def update_stream(stream, d, **kwargs):
 	'''
@@ -611,7 +925,7 @@ def update_stream(stream, d, **kwargs):
 
 	:param obspy.core.stream.Stream stream: The stream to update
 	:param d: The Raspberry Shake UDP data packet (:py:func:`rsudp.raspberryshake.getDATA`) to parse Stream information from
-	:type d: bytes
+	:type d: bytes or rsudp.raspberryshake.Packet
 	:rtype: obspy.core.stream.Stream
 	:return: A seismic data stream
 	'''
@@ -650,6 +964,10 @@ def copy(orig):
 		AM.R3BCF.00.EHZ | 2020-02-21T19:58:50.292000Z - 2020-02-21T19:58:50.532000Z | 100.0 Hz, 25 samples
 
 
+	.. note::
+		Consumers that only need the last few seconds of data can keep it in a
+		:py:class:`rsudp.raspberryshake.RingStream` instead, which does not need this.
+
 	:param obspy.core.stream.Stream orig: The data stream to copy information from
 	:rtype: obspy.core.stream.Stream
 	:return: A low-memory copy of the passed data stream
@@ -668,6 +986,963 @@ def copy(orig):
 	return stream.copy()
 
 
+class _ChannelRing(object):
+	'''
+	Storage for one channel of a :py:class:`rsudp.raspberryshake.RingStream`.
+	Every sample is written twice, at ``i`` and ``i + cap``, so that the
+	most recent ``cap`` samples are always contiguous in memory and can be
+	handed out as a view without copying.
+
+	:param int cap: the number of samples to keep
+	'''
+	__slots__ = ('cap', 'data', 'mask', 'count', 'next', 'gaps', 'resets')
+
+	def __init__(self, cap):
+		self.cap = cap
+		self.data = np.zeros(2 * cap, dtype=np.int32)
+		self.mask = np.zeros(2 * cap, dtype=bool)	# True where a sample was filled in over a gap
+		self.count = 0			# samples written since the last reset
+		self.next = None		# unix epoch time of the next expected sample
+		self.gaps = 0			# number of gaps filled since the ring was created
+		self.resets = 0			# number of times the ring has been emptied
+
+	def reset(self):
+		'''
+		Forgets all samples.
+		'''
+		self.count = 0
+		self.resets += 1
+
+	def write(self, samples, filled=False):
+		'''
+		Writes samples to both halves of the buffer.
+
+		:param numpy.ndarray samples: samples to write
+		:param bool filled: whether these samples are gap fill
+		'''
+		n = len(samples)
+		if n > self.cap:
+			samples = samples[-self.cap:]
+			self.count += n - self.cap
+			n = self.cap
+		i = self.count % self.cap
+		head = min(n, self.cap - i)
+		for off in (0, self.cap):
+			self.data[off+i:off+i+head] = samples[:head]
+			self.data[off:off+n-head] = samples[head:]
+			self.mask[off+i:off+i+head] = filled
+			self.mask[off:off+n-head] = filled
+		self.count += n
+
+	def latest(self):
+		'''
+		The most recently written sample, or 0 if there is none.
+		'''
+		return self.data[(self.count - 1) % self.cap] if self.count else 0
+
+	def window(self, k):
+		'''
+		:param int k: number of samples requested
+		:rtype: slice
+		:return: the buffer slice holding the last ``k`` samples (or fewer if fewer are available)
+		'''
+		k = min(k, self.count, self.cap)
+		end = self.count % self.cap + self.cap
+		return slice(end - k, end)
+
+
+class RingStream(object):
+	'''
+	.. versionadded:: 1.1.2
+
+	A fixed-length, per-channel data buffer for consumers that only ever
+	look at the last few seconds of data.
+	Unlike an :py:class:`obspy.core.stream.Stream` that is kept current with
+	:py:func:`rsudp.raspberryshake.update_stream`, a RingStream allocates its
+	memory once per channel, so appending a packet costs the same no matter
+	how long the window is, and there is no need to
+	:py:func:`rsudp.raspberryshake.copy` it to keep memory use in check.
+
+	Windows of the last ``n`` seconds are returned as read-only views into the
+	buffer. They are only valid until the next call to
+	:py:func:`rsudp.raspberryshake.RingStream.append`, so copy the data if you
+	need to keep it. Use :py:func:`rsudp.raspberryshake.RingStream.to_stream`
+	when you need an ObsPy object (e.g. for deconvolution).
+
+	.. code-block:: python
+
+		>>> import rsudp.raspberryshake as rs
+		>>> rs.initRSlib(dport=8888, rsstn='R3BCF')
+		>>> ring = rs.RingStream(seconds=30, fill_value='latest')
+		>>> ring.append(rs.getDATA())
+		True
+		>>> ring.last('EHZ', 0.1)
+		array([16493, 16451, 16459, 16482, 16467, 16430, 16453, 16494, 16478, 16442], dtype=int32)
+
+	Packets that arrive late are filled according to ``fill_value``, and
+	samples that overlap data already in the buffer are dropped.
+	Gaps longer than the buffer (and large jumps backward in time)
+	empty the channel's buffer before the new data is written.
+
+	:param float seconds: number of seconds of data to keep per channel
+	:type fill_value: str, int, or None
+	:param fill_value: how to fill gaps between packets. ``None`` fills with zeros and masks the filled samples in :py:func:`rsudp.raspberryshake.RingStream.to_stream` output, ``'latest'`` repeats the last sample before the gap, and a number fills with that number.
+	'''
+	def __init__(self, seconds, fill_value=None):
+		self.seconds = seconds
+		self.fill_value = fill_value
+		self.station = _active()	# the station or session being set up
+		self.sps = self.station.sps
+		self.rings = {}
+
+	def _ring(self, chan):
+		'''
+		Gets the buffer for a channel, creating it if necessary.
+
+		:param str chan: channel name
+		:rtype: rsudp.raspberryshake._ChannelRing
+		'''
+		ring = self.rings.get(chan)
+		if ring is None:
+			if not self.sps:
+				self.sps = self.station.sps
+			ring = _ChannelRing(int(round(self.seconds * self.sps)) + 1)
+			self.rings[chan] = ring
+		return ring
+
+	def _fill(self, ring, n):
+		'''
+		Writes ``n`` samples of gap fill to a channel buffer.
+		'''
+		if self.fill_value == 'latest':
+			val = ring.latest()
+		elif self.fill_value is None:
+			val = 0
+		else:
+			val = self.fill_value
+		ring.write(np.full(n, val, dtype=np.int32), filled=True)
+		ring.gaps += 1
+
+	def _samples(self, ring, seconds):
+		'''
+		Like :py:func:`obspy.core.stream.Stream.slice`, a window includes
+		the samples at both its start and its end.
+
+		:param float seconds: window length in seconds, or ``None`` for the whole buffer
+		:rtype: int
+		:return: the number of samples in the requested window
+		'''
+		k = ring.cap if seconds is None else int(round(seconds * self.sps)) + 1
+		return min(k, ring.count, ring.cap)
+
+	def append(self, d):
+		'''
+		Appends a data packet to the buffer for its channel.
+		Queue messages (i.e. ``ALARM`` or ``TERM``) are ignored.
+
+		:param d: The Raspberry Shake UDP data packet (:py:func:`rsudp.raspberryshake.getDATA`)
+		:type d: bytes or rsudp.raspberryshake.Packet
+		:rtype: bool
+		:return: ``True`` if data was added, otherwise ``False``
+		'''
+		if isinstance(d, Message) or not (isinstance(d, Packet) or d[:1] == b'{'):
+			return False
+		p = parse_packet(d)
+		ring = self._ring(p.channel)
+		samples = p.data
+		if ring.next is not None:
+			gap = int(round((p.time - ring.next) * self.sps))
+			if (gap >= ring.cap) or (-gap >= ring.cap):
+				ring.reset()		# nothing in the buffer is contiguous with this packet
+			elif gap > 0:
+				self._fill(ring, gap)
+			elif gap < 0:
+				if -gap >= len(samples):
+					return False	# we already have all of this packet
+				samples = samples[-gap:]
+		ring.write(samples)
+		ring.next = p.time + len(p.data) / self.sps
+		return True
+
+	@property
+	def channels(self):
+		'''
+		:rtype: list
+		:return: sorted list of channels that have data in the buffer
+		'''
+		return sorted(ch for ch in self.rings if self.rings[ch].count)
+
+	def __contains__(self, chan):
+		return chan in self.channels
+
+	def size(self, chan, seconds=None):
+		'''
+		:param str chan: channel name
+		:param float seconds: window length in seconds, or ``None`` for the whole buffer
+		:rtype: int
+		:return: the number of samples available for a channel
+		'''
+		return self._samples(self.rings[chan], seconds)
+
+	def last(self, chan, seconds=None):
+		'''
+		Returns a read-only view of the most recent data on a channel.
+
+		:param str chan: channel name
+		:param float seconds: window length in seconds, or ``None`` for the whole buffer
+		:rtype: numpy.ndarray
+		:return: the data samples (int32) of the last ``seconds`` of data
+		'''
+		ring = self.rings[chan]
+		v = ring.data[ring.window(self._samples(ring, seconds))]
+		v.flags.writeable = False
+		return v
+
+	def since(self, chan, mark=None):
+		'''
+		.. versionadded:: 1.1.2
+
+		Returns a read-only view of the samples written to a channel since ``mark``,
+		for consumers that process each sample once (such as a streaming filter).
+		Pass the ``mark`` returned by one call to the next one.
+		If the samples do not follow on from ``mark`` (on the first call, after a gap that emptied
+		the buffer, or if more than a buffer's worth of samples arrived in between), all
+		samples in the buffer are returned and ``contiguous`` is ``False``.
+
+		.. code-block:: python
+
+			>>> x, mark, contiguous = ring.since('EHZ')
+			>>> ring.append(rs.getDATA())
+			>>> x, mark, contiguous = ring.since('EHZ', mark)
+			>>> len(x), contiguous
+			(25, True)
+
+		:param str chan: channel name
+		:param tuple mark: the mark returned by the last call, or ``None``
+		:rtype: tuple
+		:return: ``(samples, mark, contiguous)``
+		'''
+		ring = self.rings[chan]
+		if (mark is not None) and (mark[0] == ring.resets) and (ring.count - mark[1] <= ring.cap):
+			k, contiguous = ring.count - mark[1], True
+		else:
+			k, contiguous = min(ring.count, ring.cap), False
+		v = ring.data[ring.window(k)]
+		v.flags.writeable = False
+		return v, (ring.resets, ring.count), contiguous
+
+	def align(self, channels, lengths=None):
+		'''
+		.. versionadded:: 1.1.2
+
+		For consumers that combine several channels sample by sample: works out how many
+		samples to skip at the start of each channel's next samples so that all channels
+		start at the same time, the latest of their start times.
+		Each channel's next samples are the last ``lengths`` samples in its buffer
+		(for example, the ones just returned by :py:func:`since`), or, if ``lengths``
+		is not given, the ones that have not arrived yet. Samples that follow on
+		from these stay lined up, so this is only needed after starting again.
+
+		.. code-block:: python
+
+			>>> new = [ring.since(c) for c in ('ENE', 'ENN', 'ENZ')]
+			>>> ring.align(('ENE', 'ENN', 'ENZ'), [len(x) for x, mark, contiguous in new])
+			[1, 0, 1]
+
+		:param list channels: channel names
+		:param list lengths: `(optional)` the number of samples at the end of each channel's buffer to start from
+		:rtype: list
+		:return: the number of samples to skip on each channel
+		'''
+		lengths = lengths if lengths else [0] * len(channels)
+		starts = [self.rings[c].next - n / self.sps for c, n in zip(channels, lengths)]
+		t0 = max(starts)
+		return [max(int(round((t0 - t) * self.sps)), 0) for t in starts]
+
+	def gaps(self, chan, seconds=None):
+		'''
+		Returns a read-only view of the gap mask (``True`` where samples were filled in)
+		that lines up with :py:func:`rsudp.raspberryshake.RingStream.last`.
+
+		:param str chan: channel name
+		:param float seconds: window length in seconds, or ``None`` for the whole buffer
+		:rtype: numpy.ndarray
+		:return: boolean gap mask of the last ``seconds`` of data
+		'''
+		ring = self.rings[chan]
+		v = ring.mask[ring.window(self._samples(ring, seconds))]
+		v.flags.writeable = False
+		return v
+
+	def starttime(self, chan, seconds=None):
+		'''
+		:param str chan: channel name
+		:param float seconds: window length in seconds, or ``None`` for the whole buffer
+		:rtype: obspy.core.utcdatetime.UTCDateTime
+		:return: the time of the first sample of the last ``seconds`` of data
+		'''
+		ring = self.rings[chan]
+		return UTCDateTime(ring.next - self._samples(ring, seconds) / self.sps)
+
+	def endtime(self, chan):
+		'''
+		:param str chan: channel name
+		:rtype: obspy.core.utcdatetime.UTCDateTime
+		:return: the time of the most recent sample on a channel
+		'''
+		return UTCDateTime(self.rings[chan].next - 1 / self.sps)
+
+	def to_stream(self, seconds=None, channels=None, starttime=None, endtime=None):
+		'''
+		Copies buffered data into a new :py:class:`obspy.core.stream.Stream`
+		with one trace per channel, in the same format as
+		:py:func:`rsudp.raspberryshake.update_stream` would produce.
+		Traces carry the instrument response if an inventory is available.
+
+		:param float seconds: window length in seconds, or ``None`` for the whole buffer
+		:param list channels: channels to include (default: all)
+		:type starttime: obspy.core.utcdatetime.UTCDateTime or float
+		:param starttime: if set, only include samples at or after this time
+		:type endtime: obspy.core.utcdatetime.UTCDateTime or float
+		:param endtime: if set, only include samples before this time
+		:rtype: obspy.core.stream.Stream
+		:return: a copy of the buffered data
+		'''
+		stream = Stream()
+		for chan in self.channels:
+			if channels and (chan not in channels):
+				continue
+			ring = self.rings[chan]
+			k = self._samples(ring, seconds)
+			t0 = ring.next - k / self.sps
+			i0, i1 = 0, k
+			if starttime is not None:
+				i0 = max(i0, int(np.ceil((float(starttime) - t0) * self.sps - 1e-6)))
+			if endtime is not None:
+				i1 = min(i1, int(np.ceil((float(endtime) - t0) * self.sps - 1e-6)))
+			if i1 <= i0:
+				continue
+			w = ring.window(k)
+			data = ring.data[w][i0:i1].copy()
+			mask = ring.mask[w][i0:i1]
+			if (self.fill_value is None) and mask.any():
+				data = np.ma.MaskedArray(data, mask=mask.copy())
+			tr = Trace(data=data)
+			_set_stats(tr, chan, t0 + i0 / self.sps, self.station)
+			stream.append(tr)
+		return stream
+
+
+class Station(object):
+	'''
+	.. versionadded:: 1.1.2
+
+	Parameters for one Raspberry Shake: its name, channels, sample rate,
+	inventory, and so on. These are the values this library's module variables
+	(:py:data:`stn`, :py:data:`chns`, :py:data:`sps`, :py:data:`inv`, etc.)
+	are read from. In multi-station mode (see :py:class:`rsudp.p_producer.MultiProducer`)
+	there is one Station per Raspberry Shake.
+	A :py:class:`rsudp.raspberryshake.ShakeSession` is a Station that also
+	owns a socket and the threads that process its data.
+
+	Unlike :py:func:`rsudp.raspberryshake.set_params`, which reads packets
+	off the port until it knows what it needs, a Station learns its channels,
+	transmission frequency, and sample rate passively from packets passed to
+	:py:func:`rsudp.raspberryshake.Station.feed`.
+
+	Consumer modules read station parameters from this library when they
+	are created. To set up consumers for a specific station, create them
+	inside a ``with`` block, which makes this library's module variables
+	refer to the station for the duration of the block (in that thread only):
+
+	.. code-block:: python
+
+		>>> st = rs.Station('R3BCF', port=8888)
+		>>> # ...feed packets until st.ready is True...
+		>>> st.get_inventory()
+		>>> with st:
+		...     alrt = Alert(q=q, cha='EHZ')
+
+	Data packets from the station should carry it in their
+	:py:data:`rsudp.raspberryshake.Packet.station` field
+	(see :py:func:`rsudp.raspberryshake.parse_message`)
+	so that traces get the right station metadata.
+
+	:param str stn: station name
+	:param int port: the local port the station sends data to
+	:param str addr: the IP address the station sends data from (``''`` to accept the first unclaimed sender on the port)
+	:param str net: network code
+	'''
+	def __init__(self, stn='Z0000', port=8888, addr='', net='AM'):
+		self.stn = str(stn).upper()
+		self.net = net
+		self.port = int(port)
+		self.addr = addr
+		self.sender = 'Station %s' % self.stn
+		self.chns = []
+		self.numchns = 0
+		self.tf = None
+		self.tr = None
+		self.sps = None
+		self.inv = False
+		self.region = False
+		self.respcache = ResponseCache()
+		self.invcache = False	# directory to keep a copy of the inventory in (see get_inventory)
+		self.invttl = 86400		# seconds before a cached inventory is downloaded again
+		self._first = {}		# time of the first packet seen on each channel
+		self._all = False		# whether a channel has repeated, i.e. all channels have been seen
+
+	@property
+	def firstaddr(self):
+		return self.addr
+
+	@firstaddr.setter
+	def firstaddr(self, addr):
+		self.addr = addr
+
+	@property
+	def ready(self):
+		'''
+		``True`` once channels, transmission frequency, and sample rate are known.
+		'''
+		return self._all and (self.tf is not None)
+
+	def feed(self, d):
+		'''
+		Learns station parameters from a data packet from this station.
+
+		:param d: The Raspberry Shake UDP data packet (:py:func:`rsudp.raspberryshake.getDATA`)
+		:type d: bytes or rsudp.raspberryshake.Packet
+		:rtype: bool
+		:return: whether the station parameters are now known
+		'''
+		if self.ready or isinstance(d, Message) or not (isinstance(d, Packet) or d[:1] == b'{'):
+			return self.ready
+		chan, t = getCHN(d), getTIME(d)
+		if chan in self._first:
+			self._all = True
+			if self.tf is None:
+				TR = t*1000 - self._first[chan]*1000
+				if TR > 0:
+					self.tf = int(TR)
+					self.tr = int(1000 / TR)
+					self.sps = int((bytes(d).count(b",") - 1) * 1000 / TR)
+		elif not self._all:
+			self._first[chan] = t
+			self.chns.append(chan)
+		if self.ready:
+			self.numchns = len(self.chns)
+		return self.ready
+
+	def get_inventory(self, sender=None):
+		'''
+		Fetches this station's inventory and caches its instrument responses.
+
+		.. versionadded:: 1.1.2
+
+			If :py:data:`invcache` is set to a directory, inventories are kept there
+			(see :py:func:`rsudp.raspberryshake.read_cached_inventory`).
+			A cached inventory younger than :py:data:`invttl` seconds is used without
+			going online. An older one is used right away while a new one is
+			downloaded in the background (see :py:func:`rsudp.raspberryshake.Station.refresh_inventory`),
+			so that a station can start with no network connection at all.
+
+		:param str sender: `(optional)` the name to log messages under
+		:rtype: obspy.core.inventory.inventory.Inventory or bool
+		:return: the inventory, or ``False`` if none could be found
+		'''
+		sender = sender if sender else self.sender
+		inventory, reg, fetched = False, False, 0
+		if self.invcache:
+			inventory, reg, fetched = read_cached_inventory(self.net, self.stn, self.invcache)
+		if inventory:
+			age = time.time() - fetched
+			printM('Using cached inventory for station %s.%s (%s). Station region is %s'
+				   % (self.net, self.stn, '%.1f hours old' % (age / 3600.) if fetched else 'age unknown',
+					  reg), sender)
+			self.inv, self.region = inventory, reg
+			if age > self.invttl:
+				Thread(target=self.refresh_inventory, args=(sender,), daemon=True).start()
+		else:
+			self.refresh_inventory(sender)
+		self.respcache.update(self.inv)
+		return self.inv
+
+	def refresh_inventory(self, sender=None):
+		'''
+		.. versionadded:: 1.1.2
+
+		Downloads this station's inventory, saves it to the inventory cache
+		(if :py:data:`invcache` is set), and swaps it in. If the download fails,
+		the current inventory is kept.
+		Threads that read the inventory meanwhile see either the old or the new
+		inventory, never a mix, and the instrument response cache is rebuilt on its
+		next use (see :py:class:`rsudp.raspberryshake.ResponseCache`).
+		Consumers that read it from their station when they use it
+		(see :py:func:`rsudp.raspberryshake.current_station`) get the new one;
+		Write, Tweeter and Intensity do.
+
+		:param str sender: `(optional)` the name to log messages under
+		:rtype: obspy.core.inventory.inventory.Inventory or bool
+		:return: the inventory, or ``False`` if none could be found
+		'''
+		sender = sender if sender else self.sender
+		inventory, reg = _fetch_inventory(self.net, self.stn, sender)
+		if inventory:
+			if self.invcache:
+				_save_cached_inventory(inventory, reg, self.net, self.stn, self.invcache, sender)
+			self.region = reg
+			self.inv = inventory
+		elif not self.inv:
+			self.region = reg
+			self.inv = inventory
+		return self.inv
+
+	def __enter__(self):
+		# kept per thread, so that sessions set up in different threads do not mix
+		_local.__dict__.setdefault('saved', []).append(_current())
+		_local.station = self
+		return self
+
+	def __exit__(self, *args):
+		_local.station = _local.saved.pop()
+		return False
+
+	def __repr__(self):
+		return 'Station(%s.%s, port=%s, addr=%r)' % (self.net, self.stn, self.port, self.addr)
+
+
+class ShakeSession(Station):
+	'''
+	.. versionadded:: 1.1.2
+
+	An rsudp data pipeline for one Raspberry Shake: the socket its data
+	arrives on, the station parameters detected from that data, the station
+	inventory, and the queues and threads that process it
+	(see :ref:`producer-consumer`).
+
+	This library's module functions (:py:func:`rsudp.raspberryshake.initRSlib`,
+	:py:func:`rsudp.raspberryshake.getDATA`, etc.) and module variables
+	(:py:data:`sock`, :py:data:`sps`, :py:data:`inv`, etc.) act on
+	:py:data:`rsudp.raspberryshake.default`, a session created when the library is imported.
+	Other sessions are independent of that one and of each other,
+	so several pipelines can run in one interpreter (each on its own port),
+	or one per process in a process pool.
+
+	Consumer modules read station parameters from this library when they are created,
+	so create a session's consumers inside a ``with`` block
+	(see :py:class:`rsudp.raspberryshake.Station`):
+
+	.. code-block:: python
+
+		>>> import rsudp.raspberryshake as rs
+		>>> from rsudp.c_alert import Alert
+		>>> sess = rs.ShakeSession(stn='R3BCF', port=18001)
+		>>> sess.init()
+		>>> with sess:
+		...     sess.mk_p(Alert(q=sess.mk_q(), cha='EHZ'))
+		>>> sess.start()
+		>>> sess.join()
+
+	To replay recorded data through a session (for a backtest, for example),
+	point a :py:class:`rsudp.t_testdata.TestData` thread at the session's port.
+
+	:param str stn: station name
+	:param int port: the local port the Raspberry Shake is sending UDP data packets to
+	:param str net: network code
+	:param int timeout: seconds for :py:func:`rsudp.raspberryshake.ShakeSession.set_params` to wait for data (zero for unlimited wait)
+	'''
+	def __init__(self, stn='Z0000', port=8888, net='AM', timeout=10):
+		super().__init__(stn=stn, port=port, net=net)
+		self.sender = 'RS lib'
+		self.to = timeout			# socket test timeout
+		self.initd = False
+		self.sockopen = False
+		self.producer = False		# flag for producer status
+		self.verifying = None		# Station detecting live parameters to check cached ones against
+		self.changed = False		# whether live parameters turned out to differ from the cached ones
+		self.cache = None			# stream parameter cache file
+		self.sock = s.socket(s.AF_INET, s.SOCK_DGRAM)
+		if platform.system() not in 'Windows':
+			self.sock.setsockopt(s.SOL_SOCKET, s.SO_REUSEADDR, 1)
+		self.destinations = []		# sub-consumer queues
+		self.threads = []			# sub-consumer threads
+		self.queue = None			# master queue
+		self.cons = None
+		self.prod = None
+
+	def init(self, dport=None, rsstn=None, timeout=None, rcvbuf=None, cache=None):
+		'''
+		Sets the port, station name, and timeout (if given), then opens the socket
+		(:py:func:`rsudp.raspberryshake.ShakeSession.open`) and reads station
+		parameters from the first data (:py:func:`rsudp.raspberryshake.ShakeSession.set_params`).
+
+		:param int dport: `(optional)` the local port the Raspberry Shake is sending UDP data packets to
+		:param str rsstn: `(optional)` the name of the station (something like :pycode:`'RCB43'` or :pycode:`'S0CDE'`)
+		:param int timeout: `(optional)` seconds to wait for data before an error is raised (zero for unlimited wait)
+		:param int rcvbuf: `(optional)` socket receive buffer size in bytes
+		:param str cache: `(optional)` stream parameter cache file (see :py:func:`rsudp.raspberryshake.set_params`)
+		'''
+		if dport is not None:
+			try:						# set port value first
+				if dport == int(dport):
+					self.port = int(dport)
+				else:
+					self.port = int(dport)
+					printW('Supplied port value was converted to integer. Non-integer port numbers are invalid.')
+			except Exception as e:
+				printE('Details - %s' % e)
+
+		if rsstn is not None:
+			try:						# set station name
+				if len(rsstn) == 5:
+					self.stn = str(rsstn).upper()
+				else:
+					self.stn = str(rsstn).upper()
+					printW('Station name does not follow Raspberry Shake naming convention.')
+			except ValueError as e:
+				printE('Invalid station name supplied. Details: %s' % e)
+				printE('reverting to station name Z0000', announce=False, spaces=True)
+			except Exception as e:
+				printE('Details - %s' % e)
+
+		if timeout is not None:
+			try:						# set timeout value
+				self.to = int(timeout)
+			except ValueError as e:
+				printW('You likely supplied a non-integer as the timeout value. Your value was: %s'
+						% timeout)
+				printW('Continuing with default timeout of %s sec'
+						% (self.to), announce=False, spaces=True)
+				printW('details: %s' % e, announce=False, spaces=True)
+			except Exception as e:
+				printE('Details - %s' % e)
+
+		self.initd = True			# if initialization goes correctly, set initd to true
+		self.open(rcvbuf=rcvbuf)	# open a socket
+		printM('Waiting for UDP data on port %s...' % (self.port), self.sender)
+		self.set_params(cache=cache)	# get data and set parameters
+
+	def open(self, host='', rcvbuf=None):
+		'''
+		Binds this session's socket to its port.
+		Must be done after :py:func:`rsudp.raspberryshake.ShakeSession.init` sets the port
+		and before :py:func:`rsudp.raspberryshake.ShakeSession.set_params`.
+
+		:param str host: self-referential location at which to open a listening port (defaults to :pycode:`''` which resolves to :pycode:`'localhost'`)
+		:param int rcvbuf: `(optional)` size of the socket's receive buffer in bytes (see :py:func:`rsudp.raspberryshake.openSOCK`)
+		:raise IOError: if the session is not initialized
+		:raise OSError: if the program cannot bind to the port
+		'''
+		self.sockopen = False
+		if self.initd:
+			HP = '%s:%s' % ('localhost', self.port)
+			printM("Opening socket on %s (HOST:PORT)"
+					% HP, 'openSOCK')
+			if rcvbuf:
+				try:
+					self.sock.setsockopt(s.SOL_SOCKET, s.SO_RCVBUF, int(rcvbuf))
+				except Exception as e:
+					printW('Could not set socket receive buffer size to %s bytes.' % rcvbuf, 'openSOCK')
+					printW('Detail: %s' % e, 'openSOCK', spaces=True)
+			printM('Socket receive buffer size is %s bytes' % self.sock.getsockopt(s.SOL_SOCKET, s.SO_RCVBUF), 'openSOCK')
+			try:
+				self.sock.bind((host, self.port))
+				self.sockopen = True
+			except Exception as e:
+				printE('Could not bind to port %s. Is another program using it?' % self.port)
+				printE('Detail: %s' % e, announce=False)
+				raise OSError(e)
+		else:
+			raise IOError("Before opening a socket, you must initialize this raspberryshake library by calling initRSlib(dport=XXXXX, rssta='R0E05') first.")
+
+	def close(self):
+		'''
+		Closes this session's socket, freeing its port.
+		'''
+		self.sock.close()
+		self.sockopen = False
+
+	def _nodata(self, ip=ip):
+		'''
+		Reports that no data has arrived on the port.
+
+		:param str ip: the IP of the box this program is running on
+		:raise IOError: always
+		'''
+		printE('No data received in %s seconds; aborting.' % (self.to), sender='Init')
+		printE('Check that the Shake is forwarding data to:', sender='Init', announce=False, spaces=True)
+		printE('IP address: %s    Port: %s' % (ip, self.port), sender='Init', announce=False, spaces=True)
+		printE('and that no firewall exists between the Shake and this computer.', sender='Init', announce=False, spaces=True)
+		raise IOError('No data received')
+
+	def set_params(self, cache=None):
+		'''
+		Reads data packets off the port until the channels, transmission frequency,
+		and sample rate are known, then fetches the station inventory.
+		Waits :py:data:`to` seconds for the first packet before raising a no data exception.
+
+		If ``cache`` has parameters for this station, port, and sender
+		(see :py:func:`rsudp.raspberryshake.set_params`), only the first packet is read,
+		and the cached parameters are checked later by
+		:py:func:`rsudp.raspberryshake.ShakeSession.verify`.
+		Detected parameters are saved to ``cache``.
+
+		:param str cache: `(optional)` path of the stream parameter cache file
+		'''
+		# a socket timeout rather than SIGALRM, which only works in the main thread of one session
+		self.sock.settimeout(self.to if self.to else None)
+		try:
+			data, (self.addr, connport) = self.sock.recvfrom(2048)
+		except s.timeout:
+			self._nodata()
+		finally:
+			self.sock.settimeout(None)
+		self.cache = cache
+		if cache and self._load_params():
+			printM('Using cached stream parameters (%s ms between packets, %s samples per second)'
+				   % (self.tf, self.sps), 'Init')
+			self.verifying = Station(self.stn, port=self.port, addr=self.addr, net=self.net)
+			self.verifying.feed(data)
+		else:
+			self.get_tr(self.get_chns()[0])
+			self.get_sr(self.tf, data)
+			self.get_ttlchn()
+			if cache:
+				self._save_params()
+		printM('Available channels: %s' % self.chns, 'Init')
+		self.get_inventory(sender='get_inventory')
+
+	def _params_key(self):
+		return '%s.%s:%s:%s' % (self.net, self.stn, self.port, self.addr)
+
+	def _load_params(self):
+		'''
+		Loads this session's stream parameters from :py:data:`self.cache`.
+
+		:rtype: bool
+		:return: whether cached parameters were found
+		'''
+		try:
+			with open(self.cache, 'r') as f:
+				p = json.load(f)[self._params_key()]
+			self.tf, self.tr, self.sps = int(p['tf']), int(p['tr']), int(p['sps'])
+			self.chns = list(p['chns'])
+			self.numchns = len(self.chns)
+			return bool(self.numchns and self.tf and self.sps)
+		except (OSError, ValueError, KeyError, TypeError):
+			return False
+
+	def _save_params(self):
+		'''
+		Saves this session's stream parameters to :py:data:`self.cache`,
+		keeping the entries for other stations.
+		'''
+		try:
+			with open(self.cache, 'r') as f:
+				params = json.load(f)
+		except (OSError, ValueError):
+			params = {}
+		params[self._params_key()] = {'tf': self.tf, 'tr': self.tr, 'sps': self.sps, 'chns': self.chns}
+		try:
+			with open(self.cache, 'w') as f:
+				json.dump(params, f, indent=1)
+		except OSError as e:
+			printW('Could not save stream parameters to %s: %s' % (self.cache, e), 'Init')
+
+	def verify(self, d):
+		'''
+		Checks cached stream parameters against a live data packet
+		(see :py:func:`rsudp.raspberryshake.ShakeSession.set_params`).
+		The :py:class:`rsudp.p_producer.Producer` calls this for every packet it
+		receives until the check is done. Once enough packets have arrived to
+		detect the parameters, they are compared to the cached ones.
+		If they differ, this session and the cache are updated with the detected values,
+		and :py:data:`changed` is set so that the caller can set up its consumers again
+		(the Producer stops, and :py:func:`rsudp.client.run` restarts the modules).
+
+		:param d: a data packet from this session's sender
+		:type d: bytes or rsudp.raspberryshake.Packet
+		:rtype: bool
+		:return: ``False`` if the cached parameters turned out to be wrong, otherwise ``True``
+		'''
+		v = self.verifying
+		if (v is None) or (not v.feed(d)):
+			return True
+		self.verifying = None
+		if ((abs(v.tf - self.tf) <= 1) and (v.sps == self.sps)
+			and (sorted(v.chns) == sorted(self.chns))):
+			printM('Cached stream parameters match live data.', 'Init')
+			return True
+		printE('Stream parameters have changed since they were cached (%s channels at %s sps, now %s at %s sps).'
+			   % (self.chns, self.sps, v.chns, v.sps), 'Init')
+		self.tf, self.tr, self.sps = v.tf, v.tr, v.sps
+		self.chns, self.numchns = v.chns, v.numchns
+		self._save_params()
+		self.changed = True
+		printE('The cache has been updated. Starting again with the new parameters.', 'Init', spaces=True)
+		return False
+
+	def get_data(self):
+		'''
+		Reads a data packet off the port (see :py:func:`rsudp.raspberryshake.getDATA`).
+
+		:rtype: bytes
+		:return: Returns a data packet as an encoded bytes object.
+		:raise IOError: if no socket is open
+		'''
+		if self.sockopen:
+			return self.sock.recv(4096)
+		else:
+			if self.initd:
+				raise IOError("No socket is open. Please open a socket using this library's openSOCK() function.")
+			else:
+				raise IOError('No socket is open. Please initialize the library using initRSlib() then open a socket using openSOCK().')
+
+	def get_tr(self, chn):
+		'''
+		Measures the transmission rate from two consecutive packets from the same channel
+		(see :py:func:`rsudp.raspberryshake.getTR`).
+
+		:param str chn: the channel to measure
+		:rtype: int
+		:return: Transmission rate in milliseconds between consecutive packets from a specific channel
+		'''
+		timeP1, timeP2 = 0.0, 0.0
+		done = False
+		while not done:
+			DP = self.get_data()
+			CHAN = getCHN(DP)
+			if CHAN == chn:
+				if timeP1 == 0.0:
+					timeP1 = getTIME(DP)
+				else:
+					timeP2 = getTIME(DP)
+					done = True
+		TR = timeP2*1000 - timeP1*1000
+		self.tf = int(TR)
+		self.tr = int(1000 / TR)
+		return self.tf
+
+	def get_sr(self, TR, DP):
+		'''
+		Calculates the sample rate (see :py:func:`rsudp.raspberryshake.getSR`).
+
+		:param int TR: the transmission frequency in milliseconds between packets
+		:param bytes DP: a data packet
+		:rtype: int
+		:return: The sample rate in samples per second
+		'''
+		self.sps = int((DP.count(b",") - 1) * 1000 / TR)
+		return self.sps
+
+	def get_chns(self):
+		'''
+		Lists the channels sent to the port (see :py:func:`rsudp.raspberryshake.getCHNS`).
+
+		:rtype: list
+		:return: The list of channels being sent to the port
+		'''
+		chdict = {'EHZ': False, 'EHN': False, 'EHE': False,
+				  'ENZ': False, 'ENN': False, 'ENE': False, 'HDF': False}
+		firstCHN = ''
+		done = False
+		sim = 0
+		while not done:
+			DP = self.get_data()
+			if firstCHN == '':
+				firstCHN = getCHN(DP)
+				self.chns.append(firstCHN)
+				continue
+			nextCHN = getCHN(DP)
+			if firstCHN == nextCHN:
+				if sim > 1:
+					done = True
+					continue
+				sim += 1
+			else:
+				self.chns.append(nextCHN)
+		for ch in self.chns:
+			chdict[ch] = True
+		self.chns = []
+		for ch in chdict:
+			if chdict[ch] == True:
+				self.chns.append(ch)
+		return self.chns
+
+	def get_ttlchn(self):
+		'''
+		Counts the channels sent to the port (see :py:func:`rsudp.raspberryshake.getTTLCHN`).
+
+		:rtype: int
+		:return: The number of channels being sent to the port
+		'''
+		self.numchns = len(self.get_chns())
+		return self.numchns
+
+	def mk_q(self):
+		'''
+		Makes a queue for a sub-consumer and adds it to this session's destinations.
+
+		:rtype: queue.Queue
+		:return: Returns the queue to pass to the sub-consumer.
+		'''
+		q = Queue(qsize)
+		self.destinations.append(q)
+		return q
+
+	def mk_p(self, proc):
+		'''
+		Adds a sub-consumer thread to the list of threads this session starts and monitors.
+
+		:param threading.Thread proc: The process thread to append to the list of threads.
+		'''
+		self.threads.append(proc)
+
+	def start(self, parse=False, burst=0, testing=False):
+		'''
+		Starts this session's master consumer, sub-consumer threads, and producer.
+
+		:param bool parse: whether the producer should parse packets (see :py:class:`rsudp.p_producer.Producer`)
+		:param int burst: producer burst size (see :py:class:`rsudp.p_producer.Producer`)
+		:param bool testing: whether the program is in testing mode
+		:rtype: rsudp.p_producer.Producer
+		:return: the running producer
+		'''
+		# imported here because both modules import this one
+		from rsudp.c_consumer import Consumer, DualLaneQueue
+		from rsudp.p_producer import Producer
+		self.queue = DualLaneQueue(qsize)
+		self.cons = Consumer(self.queue, self.destinations, testing=testing, parse=parse)
+		self.cons.start()
+		for thread in self.threads:
+			thread.start()
+		self.prod = Producer(self.queue, self.threads, testing=testing,
+							 parse=parse, burst=burst, session=self)
+		self.prod.start()
+		return self.prod
+
+	def stop(self):
+		'''
+		Tells this session's producer to stop. The producer sends its consumers
+		a ``TERM`` message once it has read the next packet.
+		'''
+		self.producer = False
+
+	def join(self, timeout=None):
+		'''
+		Waits for this session's producer and master consumer to exit.
+
+		:param float timeout: `(optional)` seconds to wait for each
+		'''
+		for t in (self.prod, self.cons):
+			if t is not None:
+				t.join(timeout)
+
+	def __repr__(self):
+		return 'ShakeSession(%s.%s, port=%s)' % (self.net, self.stn, self.port)
+
+
 class ConsumerThread(Thread):
 	'''
 	The default consumer thread setup.
@@ -687,10 +1962,35 @@ class ConsumerThread(Thread):
 		self.alarm_reset = False        # the Producer reads this to set the ``RESET`` state
 		self.alive = True               # this is used to keep the main ``for`` loop running
 
+	.. versionadded:: 1.1.2
+
+		Consumers should tell the Producer about state changes with the
+		thread-safe :py:func:`raise_alarm`, :py:func:`raise_reset` and
+		:py:func:`mark_dead` methods. These hand the event to the Producer
+		straight away (see :py:func:`connect`), so it does not have to check
+		every thread's flags after every packet, and alarms get through even
+		when no data is arriving.
+		Setting ``alarm``, ``alarm_reset`` or ``alive`` still works, and calls these methods.
+		Consumers can also send messages of their own to the other modules
+		with :py:func:`publish`.
+
+		Consumers that only react to one queue item at a time can also define
+		``handle(d)``, which is called with every item except ``TERM``. Under the
+		``"asyncio"`` runtime (see :py:class:`rsudp.p_asyncio.AsyncProducer`), such
+		consumers are driven by the event loop instead of having a thread of their own.
+		``handle`` is run in a worker thread unless ``handle_blocks`` is ``False``.
+
 	For more information on creating your own consumer threads,
 	see :ref:`add_your_own`.
 
 	'''
+	signal = None		# set by the Producer (see connect)
+	handle = None		# optional per-item handler, used by the asyncio runtime
+	handle_blocks = True	# whether handle may block (if so, it is run off the event loop)
+	_alarm = False
+	_alarm_reset = False
+	_alive = True
+
 	def __init__(self):
 		super().__init__()
 		self.sender = 'ConsumerThread'	# used in logging
@@ -698,6 +1998,223 @@ class ConsumerThread(Thread):
 		self.alarm_reset = False		# the producer reads this
 		self.alive = True				# this is used to keep the main for loop running
 
+	def get_batch(self, max_items=None, timeout=None):
+		'''
+		.. versionadded:: 1.1.2
+
+		Waits for data on this thread's queue, then reads everything that has
+		arrived (or up to ``max_items`` items) at once (see :py:func:`rsudp.raspberryshake.get_batch`).
+
+		:param int max_items: the most items to return (``None`` for no limit)
+		:param float timeout: seconds to wait if the queue is empty (``None`` waits forever, ``0`` does not wait)
+		:rtype: list
+		:return: the items, or an empty list if nothing arrived before the timeout
+		'''
+		return get_batch(self.queue, max_items, timeout)
+
+	def connect(self, signal):
+		'''
+		.. versionadded:: 1.1.2
+
+		Sends this thread's events to ``signal`` from now on, starting with any
+		that were raised before it was connected. Called by the Producer.
+
+		:param signal: function to call with ``(thread, event, value)``, where event is ``'ALARM'``, ``'RESET'``, ``'MSG'``, or ``'DEAD'``
+		'''
+		with _signal_lock:
+			self.signal = signal
+			pending = [('ALARM', self._alarm), ('RESET', self._alarm_reset), ('DEAD', not self._alive)]
+			self._alarm, self._alarm_reset = False, False
+		for event, value in pending:
+			if value:
+				signal(self, event, None if event == 'DEAD' else value)
+
+	def _emit(self, event, value):
+		'''
+		Hands an event to the Producer, or if none is connected yet,
+		keeps it in a flag for :py:func:`connect` or the Producer to find.
+		'''
+		with _signal_lock:
+			fn = self.signal
+			if not fn:
+				if event == 'ALARM':
+					self._alarm = value
+				elif event == 'RESET':
+					self._alarm_reset = value
+				return
+		fn(self, event, value)
+
+	def raise_alarm(self, time):
+		'''
+		.. versionadded:: 1.1.2
+
+		Asks the Producer to send an ``ALARM`` message. Safe to call from any thread.
+
+		:param time: the time of the alarm
+		:type time: obspy.core.utcdatetime.UTCDateTime or datetime.datetime
+		'''
+		self._emit('ALARM', time)
+
+	def raise_reset(self, time):
+		'''
+		.. versionadded:: 1.1.2
+
+		Asks the Producer to send a ``RESET`` message. Safe to call from any thread.
+
+		:param time: the time of the reset
+		:type time: obspy.core.utcdatetime.UTCDateTime or datetime.datetime
+		'''
+		self._emit('RESET', time)
+
+	def publish(self, msg):
+		'''
+		.. versionadded:: 1.1.2
+
+		Asks the Producer to pass a message (such as ``INTENSITY``, see
+		:py:func:`rsudp.helpers.msg_intensity`) to the other modules'
+		queues, as if it had arrived on the master queue.
+		Safe to call from any thread. Messages published before the
+		Producer is connected are dropped.
+
+		:param bytes msg: the message
+		'''
+		self._emit('MSG', msg)
+
+	def mark_dead(self):
+		'''
+		.. versionadded:: 1.1.2
+
+		Marks this thread as stopped, which makes the Producer shut rsudp down.
+		Safe to call from any thread.
+		'''
+		self._alive = False
+		self._emit('DEAD', None)
+
+	@property
+	def alarm(self):
+		return self._alarm
+
+	@alarm.setter
+	def alarm(self, value):
+		if value:
+			self.raise_alarm(value)
+		else:
+			self._alarm = False
+
+	@property
+	def alarm_reset(self):
+		return self._alarm_reset
+
+	@alarm_reset.setter
+	def alarm_reset(self, value):
+		if value:
+			self.raise_reset(value)
+		else:
+			self._alarm_reset = False
+
+	@property
+	def alive(self):
+		return self._alive
+
+	@alive.setter
+	def alive(self, value):
+		if value:
+			self._alive = True
+		else:
+			self.mark_dead()
+
+
+_signal_lock = Lock()	# guards ConsumerThread.signal while a thread is being connected
+
+
+def get_batch(q, max_items=None, timeout=None):
+	'''
+	.. versionadded:: 1.1.2
+
+	Waits for data on a queue, then reads everything that has arrived
+	(or up to ``max_items`` items) at once. Queues with a ``get_many``
+	method (see :py:class:`rsudp.c_consumer.DualLaneQueue`) do this with one lock
+	round trip; other queues are read one item at a time without waiting.
+
+	:param q: the queue to read
+	:param int max_items: the most items to return (``None`` for no limit)
+	:param float timeout: seconds to wait if the queue is empty (``None`` waits forever, ``0`` does not wait)
+	:rtype: list
+	:return: the items, or an empty list if nothing arrived before the timeout
+	'''
+	if hasattr(q, 'get_many'):
+		return q.get_many(max_items, timeout)
+	items = []
+	try:
+		items.append(q.get(True, timeout))
+		while (max_items is None) or (len(items) < max_items):
+			items.append(q.get(False))
+	except Empty:
+		pass
+	return items
+
+
+def _current():
+	'''
+	Returns the station entered with ``with`` in this thread
+	(see :py:class:`rsudp.raspberryshake.Station`), or ``None``.
+	'''
+	return getattr(_local, 'station', None)
+
+
+def _active():
+	'''
+	Returns the station that this library's station variables refer to:
+	the one entered with ``with`` in this thread (see :py:class:`rsudp.raspberryshake.Station`),
+	otherwise :py:data:`default`.
+	'''
+	current = _current()
+	return current if current else default
+
+
+def current_station():
+	'''
+	.. versionadded:: 1.1.2
+
+	Returns the :py:class:`rsudp.raspberryshake.Station` (or
+	:py:class:`rsudp.raspberryshake.ShakeSession`) that this library's station
+	variables refer to in this thread: the one entered with ``with``, otherwise
+	:py:data:`default`. A consumer can keep it when it is created and read values
+	that may change while it runs from it, such as an inventory refreshed in the
+	background (see :py:func:`rsudp.raspberryshake.Station.refresh_inventory`).
+
+	:rtype: rsudp.raspberryshake.Station
+	'''
+	return _active()
+
+
+def _station_var(name):
+	return property(lambda mod: getattr(_active(), name),
+					lambda mod, value: setattr(_active(), name, value))
+
+
+def _session_var(name):
+	return property(lambda mod: getattr(default, name),
+					lambda mod, value: setattr(default, name, value))
+
+
+class _Module(types.ModuleType):
+	'''
+	The type of this module. The station and socket variables that
+	used to be module globals are properties that read and write the
+	attributes of :py:data:`default` (or of the station entered with ``with``, for station parameters).
+	'''
+	pass
+
+for _name in ('stn', 'net', 'port', 'firstaddr', 'chns', 'numchns', 'tf', 'tr', 'sps', 'inv', 'region', 'respcache',
+			  'invcache', 'invttl'):
+	setattr(_Module, _name, _station_var(_name))
+for _name in ('sock', 'sockopen', 'initd', 'to', 'producer'):
+	setattr(_Module, _name, _session_var(_name))
+
+default = ShakeSession()
+sys.modules[__name__].__class__ = _Module
+
 
 if __name__ == '__main__':
 	pass
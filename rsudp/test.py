@@ -48,6 +48,8 @@ TEST = {
 	'c_telegramimg':		['Telegram image              ', False],
 	'c_forward':			['forwarding                  ', False],
 	'c_rsam':				['RSAM transmission           ', False],
+	'c_intensity':			['JMA intensity               ', False],
+	'c_match':				['template match              ', False],
 	'c_custom':				['custom code execution       ', False],
 }
 
@@ -86,6 +88,12 @@ def make_test_settings(settings, inet=False):
 	 ``settings['rsam']['enabled']``          ``True``
 	 ``settings['rsam']['debug']``            ``True``
 	 ``settings['rsam']['interval']``         ``10``
+	 ``settings['intensity']['enabled']``     ``True``
+	 ``settings['intensity']['quiet']``       ``False``
+	 ``settings['intensity']['interval']``    ``5``
+	 ``settings['intensity']['sensitivity']`` ``384500``
+	 ``settings['match']['enabled']``         ``True``
+	 ``settings['match']['templates']``       ``rsudp/test/templates``
 	======================================== ===================
 
 	.. note::
@@ -135,6 +143,14 @@ def make_test_settings(settings, inet=False):
 	settings['rsam']['quiet'] = False
 	settings['rsam']['interval'] = 10
 
+	settings['intensity']['enabled'] = True
+	settings['intensity']['quiet'] = False
+	settings['intensity']['interval'] = 5
+	settings['intensity']['sensitivity'] = 384500	# nominal Raspberry Shake accelerometer; used if there is no inventory
+
+	settings['match']['enabled'] = True
+	settings['match']['templates'] = os.path.join(os.path.dirname(__file__), 'test', 'templates')
+
 	return settings
 
 